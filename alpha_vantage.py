@@ -0,0 +1,216 @@
+# alpha_vantage.py
+# Client central Alpha Vantage : une seule session HTTP réutilisée, un registre
+# persistant des appels pour respecter les quotas (par minute et par jour),
+# la fusion des requêtes identiques en cours et un repli sur le cache quand
+# le quota est épuisé.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from cache import CACHE_PATH, get_default_backend, make_key
+from instrumentation import track, track_session
+
+load_dotenv()
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
+BASE_URL = "https://www.alphavantage.co/query"
+
+# Quotas du plan gratuit, ajustables pour un plan payant
+CALLS_PER_MINUTE = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+CALLS_PER_DAY = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_DAY", "25"))
+# En dessous de ce nombre d'appels restants, on ne rafraîchit plus les tickers déjà en cache
+DAILY_RESERVE = int(os.getenv("ALPHA_VANTAGE_DAILY_RESERVE", "5"))
+RESPONSE_TTL = 86400
+REQUEST_TIMEOUT = 15
+# Attente maximale acceptée pour un jeton par minute avant de servir le cache
+MAX_WAIT = 20
+
+LEDGER_PATH = os.path.join(os.path.dirname(CACHE_PATH), "alpha_vantage_quota.sqlite")
+# Seuls ces messages signalent une limite d'appels ; 'Information' couvre aussi les endpoints premium et les clés invalides
+_RATE_LIMIT_RE = re.compile(r"rate limit|call frequency|requests per day", re.I)
+
+
+class AlphaVantageError(Exception):
+    """Erreur d'appel Alpha Vantage (réseau, réponse invalide...)."""
+
+
+class QuotaExceeded(AlphaVantageError):
+    """Le quota Alpha Vantage est épuisé et aucune donnée n'est en cache."""
+
+
+class QuotaLedger:
+    """Registre des appels partagé entre processus, utilisé comme seau à jetons à fenêtre glissante."""
+
+    def __init__(self, path=LEDGER_PATH, per_minute=CALLS_PER_MINUTE, per_day=CALLS_PER_DAY):
+        self.path = path
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS calls (ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls (ts)")
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE verrouille la base en écriture : deux processus ne peuvent pas prendre le même jeton
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def remaining_today(self):
+        with self._transaction() as conn:
+            used = conn.execute("SELECT COUNT(*) FROM calls WHERE ts > ?", (time.time() - 86400,)).fetchone()[0]
+        return max(0, self.per_day - used)
+
+    def try_acquire(self):
+        """
+        Consomme un jeton si possible. Renvoie 0 en cas de succès, sinon le nombre
+        de secondes à attendre avant le prochain jeton par minute.
+        Lève QuotaExceeded si le quota journalier est épuisé.
+        """
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            conn.execute("DELETE FROM calls WHERE ts <= ?", (now - 86400,))
+            used_today = conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+            if used_today >= self.per_day:
+                raise QuotaExceeded("Quota journalier Alpha Vantage atteint.")
+            last_minute = [row[0] for row in conn.execute("SELECT ts FROM calls WHERE ts > ? ORDER BY ts", (now - 60,))]
+            if len(last_minute) >= self.per_minute:
+                return last_minute[0] + 60 - now
+            conn.execute("INSERT INTO calls (ts) VALUES (?)", (now,))
+            return 0
+
+    def acquire(self, max_wait=MAX_WAIT):
+        """Attend un jeton au plus `max_wait` secondes."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            delay = self.try_acquire()
+            if delay <= 0:
+                return
+            if time.monotonic() + delay > deadline:
+                raise QuotaExceeded("Quota par minute Alpha Vantage atteint.")
+            time.sleep(delay)
+
+    def mark_exhausted(self):
+        """Alpha Vantage a signalé une limite : on considère le quota du jour consommé."""
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            used_today = conn.execute("SELECT COUNT(*) FROM calls WHERE ts > ?", (now - 86400,)).fetchone()[0]
+            missing = max(0, self.per_day - used_today)
+            conn.executemany("INSERT INTO calls (ts) VALUES (?)", [(now,)] * missing)
+
+
+class AlphaVantageClient:
+    """Point d'entrée unique vers Alpha Vantage, partagé par toutes les sessions du processus."""
+
+    def __init__(self, api_key=ALPHA_VANTAGE_API_KEY, ledger=None, response_ttl=RESPONSE_TTL):
+        self.api_key = api_key
+        self.ledger = ledger or QuotaLedger()
+        self.response_ttl = response_ttl
+        self.session = track_session(requests.Session(), "alpha_vantage")
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=2))
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+    def query(self, function, symbol):
+        """
+        Renvoie la réponse JSON de `function` pour `symbol`.
+        Les réponses récentes viennent du cache ; les données périmées sont servies
+        plutôt que de consommer les derniers appels du jour ou d'échouer sur un quota épuisé.
+        """
+        store = get_default_backend()
+        key = make_key("alpha_vantage", (function, symbol.upper()), {})
+        cached = store.get(key)
+        if cached is not None:
+            payload, created_at = cached
+            if time.time() - created_at < self.response_ttl:
+                return payload
+            # Les derniers appels du jour sont réservés aux tickers sans aucune donnée en cache
+            if self.ledger.remaining_today() <= DAILY_RESERVE:
+                return payload
+
+        try:
+            payload = self._coalesced_fetch(key, function, symbol.upper())
+        except AlphaVantageError:
+            if cached is not None:
+                return cached[0]
+            raise
+        store.set(key, payload, "alpha_vantage")
+        return payload
+
+    def _coalesced_fetch(self, key, function, symbol):
+        """Les appels identiques simultanés attendent la même requête HTTP."""
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(self._fetch(function, symbol))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+        return future.result()
+
+    def _fetch(self, function, symbol):
+        if not self.api_key:
+            raise AlphaVantageError("Clé ALPHA_VANTAGE_API_KEY manquante.")
+        self.ledger.acquire()
+        try:
+            with track("external", "alpha_vantage"):
+                r = self.session.get(
+                    BASE_URL,
+                    params={"function": function, "symbol": symbol, "apikey": self.api_key},
+                    timeout=REQUEST_TIMEOUT,
+                )
+                r.raise_for_status()
+                payload = r.json()
+        except (requests.RequestException, ValueError) as e:
+            raise AlphaVantageError(f"{function} {symbol} : {e}") from e
+
+        # Alpha Vantage répond 200 avec un message 'Note' ou 'Information' quand la limite est atteinte,
+        # mais aussi pour un endpoint premium ou une clé invalide : seul le premier cas épuise le quota du jour
+        message = payload.get("Note") or payload.get("Information")
+        if message:
+            if _RATE_LIMIT_RE.search(message):
+                self.ledger.mark_exhausted()
+                raise QuotaExceeded(message)
+            raise AlphaVantageError(message)
+        if "Error Message" in payload:
+            raise AlphaVantageError(payload["Error Message"])
+        return payload
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Client unique du processus (session et registre partagés)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AlphaVantageClient()
+        return _client
@@ -1,53 +1,120 @@
 # analysis.py
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def calculate_financial_score(data):
-    """Calcule un score financier simple sur 10 basé sur plusieurs métriques clés."""
+import numpy as np
+import pandas as pd
+
+from cache import get_default_backend, make_key
+from instrumentation import instrumented, track
+
+# Métriques utilisées par le score financier
+SCORE_COLUMNS = ['roe', 'netMargin', 'peRatio', 'debtToEquity', 'revenue', 'dividendYield']
+# Indicateurs techniques (voir indicators.py) pouvant compléter le score
+TECHNICAL_COLUMNS = ['volatility', 'maxDrawdown', 'trend']
+# Durée de conservation d'une analyse IA pour un même jeu de métriques
+AI_CACHE_TTL = 86400
+
+def _technical_points(volatility, max_drawdown, trend):
+    """Points des indicateurs techniques (sur 5) : faible volatilité, drawdown limité, cours au-dessus de la SMA 200."""
+    score = 0
+    if volatility is not None:
+        if volatility < 0.20: score += 2
+        elif volatility < 0.35: score += 1
+    if max_drawdown is not None:
+        if max_drawdown > -0.15: score += 2
+        elif max_drawdown > -0.30: score += 1
+    if trend is not None and trend > 0:
+        score += 1
+    return score
+
+@instrumented("score")
+def calculate_financial_score(data, indicators=None):
+    """
+    Calcule un score financier simple sur 10 basé sur plusieurs métriques clés (`data` : CompanyMetrics).
+    Si `indicators` (dictionnaire de IndicatorState.snapshot) est fourni, la volatilité, le drawdown
+    maximal et la tendance entrent aussi dans le score.
+    """
     score = 0
     max_score = 14
+    if indicators is not None:
+        score += _technical_points(*(indicators.get(c) for c in TECHNICAL_COLUMNS))
+        max_score += 5
     
-    if data.get('roe') is not None:
-        if data['roe'] > 0.20: score += 2
-        elif data['roe'] > 0.10: score += 1
+    if data.roe is not None:
+        if data.roe > 0.20: score += 2
+        elif data.roe > 0.10: score += 1
         
-    if data.get('netMargin') is not None:
-        if data['netMargin'] > 0.15: score += 2
-        elif data['netMargin'] > 0.05: score += 1
+    if data.netMargin is not None:
+        if data.netMargin > 0.15: score += 2
+        elif data.netMargin > 0.05: score += 1
         
-    if data.get('peRatio') is not None:
-        if 0 < data['peRatio'] < 15: score += 3
-        elif data['peRatio'] < 25: score += 2
-        elif data['peRatio'] < 40: score += 1
+    if data.peRatio is not None:
+        if 0 < data.peRatio < 15: score += 3
+        elif data.peRatio < 25: score += 2
+        elif data.peRatio < 40: score += 1
         
-    if data.get('debtToEquity') is not None:
-        if data['debtToEquity'] < 50: score += 3
-        elif data['debtToEquity'] < 100: score += 2
-        elif data['debtToEquity'] < 200: score += 1
+    if data.debtToEquity is not None:
+        if data.debtToEquity < 50: score += 3
+        elif data.debtToEquity < 100: score += 2
+        elif data.debtToEquity < 200: score += 1
         
-    if data.get('revenue') is not None:
-        if data['revenue'] > 100e9: score += 2
-        elif data['revenue'] > 20e9: score += 1
+    if data.revenue is not None:
+        if data.revenue > 100e9: score += 2
+        elif data.revenue > 20e9: score += 1
         
-    if data.get('dividendYield') is not None:
-        if data['dividendYield'] > 0.03: score += 2
-        elif data['dividendYield'] > 0.01: score += 1
+    if data.dividendYield is not None:
+        if data.dividendYield > 0.03: score += 2
+        elif data.dividendYield > 0.01: score += 1
         
     return min(10, (score / max_score) * 10) if max_score > 0 else 0
 
-def generate_ai_analysis(data, model):
-    """Génère une analyse financière brève en utilisant le modèle IA de Google."""
-    if not model:
-        return "Le service d'analyse par IA est désactivé."
-        
-    prompt = f"""
-    En tant qu'analyste financier expert pour des investisseurs particuliers, rédige une analyse très concise (environ 100 mots) de l'entreprise {data.get('name')} ({data.get('symbol')}).
+@instrumented("score")
+def calculate_financial_scores(metrics, technical=False):
+    """
+    Version vectorisée de calculate_financial_score pour un DataFrame (une ligne par ticker).
+    Les seuils sont identiques : le résultat est le même que la fonction scalaire appliquée
+    à chaque ligne, une valeur manquante (NaN) ne rapportant aucun point.
+    Avec `technical=True`, les colonnes TECHNICAL_COLUMNS entrent aussi dans le score.
+    """
+    def column(name):
+        if name not in metrics:
+            return np.full(len(metrics), np.nan)
+        return pd.to_numeric(metrics[name], errors='coerce').to_numpy(dtype='float64')
+
+    roe, net_margin, pe, debt_to_equity, revenue, dividend_yield = (column(c) for c in SCORE_COLUMNS)
+    max_score = 14
+
+    score = (
+        np.select([roe > 0.20, roe > 0.10], [2, 1], 0)
+        + np.select([net_margin > 0.15, net_margin > 0.05], [2, 1], 0)
+        + np.select([(pe > 0) & (pe < 15), pe < 25, pe < 40], [3, 2, 1], 0)
+        + np.select([debt_to_equity < 50, debt_to_equity < 100, debt_to_equity < 200], [3, 2, 1], 0)
+        + np.select([revenue > 100e9, revenue > 20e9], [2, 1], 0)
+        + np.select([dividend_yield > 0.03, dividend_yield > 0.01], [2, 1], 0)
+    )
+    if technical:
+        volatility, max_drawdown, trend = (column(c) for c in TECHNICAL_COLUMNS)
+        score = score + (
+            np.select([volatility < 0.20, volatility < 0.35], [2, 1], 0)
+            + np.select([max_drawdown > -0.15, max_drawdown > -0.30], [2, 1], 0)
+            + (trend > 0)
+        )
+        max_score += 5
+    return pd.Series(np.minimum(10, (score / max_score) * 10), index=metrics.index, name='score')
+
+def build_ai_prompt(data):
+    """Construit le prompt de l'analyse IA à partir des métriques de l'entreprise (CompanyMetrics)."""
+    return f"""
+    En tant qu'analyste financier expert pour des investisseurs particuliers, rédige une analyse très concise (environ 100 mots) de l'entreprise {data.name} ({data.symbol}).
     
     Voici quelques données financières clés :
-    - Prix de l'action : ${data.get('price', 0):.2f}
-    - Ratio Cours/Bénéfice (PER) : {data.get('peRatio', 0):.1f}
-    - Marge nette : {data.get('netMargin', 0) * 100:.1f}%
-    - Ratio Dette/Capitaux propres : {data.get('debtToEquity', 0):.2f}
-    - Chiffre d'affaires (12 derniers mois) : {data.get('revenue', 0) / 1e9:.1f} Mds $
+    - Prix de l'action : ${data.price or 0:.2f}
+    - Ratio Cours/Bénéfice (PER) : {data.peRatio or 0:.1f}
+    - Marge nette : {(data.netMargin or 0) * 100:.1f}%
+    - Ratio Dette/Capitaux propres : {(data.debtToEquity or 0) / 100:.2f}
+    - Chiffre d'affaires (12 derniers mois) : {(data.revenue or 0) / 1e9:.1f} Mds $
 
     Ton analyse doit inclure :
     1. Un résumé rapide du profil de l'entreprise.
@@ -56,8 +123,94 @@ def generate_ai_analysis(data, model):
     
     Adopte un ton neutre et factuel. Ne fournis **aucun conseil d'investissement** explicite ou implicite. Termine par une clause de non-responsabilité.
     """
+
+class AIAnalysisJob:
+    """Analyse IA en cours de génération, lisible au fil de l'eau depuis n'importe quel thread."""
+
+    def __init__(self, text=None):
+        self._chunks = [] if text is None else [text]
+        self._condition = threading.Condition()
+        self._done = text is not None
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def text(self):
+        with self._condition:
+            return "".join(self._chunks).strip()
+
+    def append(self, chunk):
+        with self._condition:
+            self._chunks.append(chunk)
+            self._condition.notify_all()
+
+    def finish(self):
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
+
+    def stream(self):
+        """Renvoie les morceaux de texte au fur et à mesure de leur génération."""
+        position = 0
+        while True:
+            with self._condition:
+                while position == len(self._chunks) and not self._done:
+                    self._condition.wait()
+                chunks = self._chunks[position:]
+                position = len(self._chunks)
+                finished = self._done
+            yield from chunks
+            if finished and position == len(self._chunks):
+                return
+
+    def result(self, timeout=None):
+        """Attend la fin de la génération et renvoie le texte complet."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._done, timeout)
+        return self.text
+
+# Analyses en cours, pour qu'un même prompt ne soit jamais généré deux fois en parallèle
+_ai_jobs = {}
+_ai_jobs_lock = threading.Lock()
+_ai_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-analysis")
+
+def _run_ai_analysis(job, key, prompt, model):
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        with track("external", "gemini"):
+            for chunk in model.generate_content(prompt, stream=True):
+                job.append(chunk.text)
+        get_default_backend().set(key, job.text, "ai_analysis")
     except Exception as e:
-        return f"Une erreur est survenue lors de la génération de l'analyse par IA : {e}"
\ No newline at end of file
+        job.append(f"Une erreur est survenue lors de la génération de l'analyse par IA : {e}")
+    finally:
+        job.finish()
+        with _ai_jobs_lock:
+            _ai_jobs.pop(key, None)
+
+def start_ai_analysis(data, model):
+    """
+    Renvoie l'analyse IA sous forme de job : immédiatement terminé si elle est en cache
+    (clé : prompt et nom du modèle), sinon générée en arrière-plan et diffusée au fil de l'eau.
+    """
+    if not model:
+        return AIAnalysisJob("Le service d'analyse par IA est désactivé.")
+
+    prompt = build_ai_prompt(data)
+    key = make_key("ai_analysis", (getattr(model, "model_name", type(model).__name__), prompt), {})
+    cached = get_default_backend().get(key)
+    if cached is not None and time.time() - cached[1] < AI_CACHE_TTL:
+        return AIAnalysisJob(cached[0])
+
+    with _ai_jobs_lock:
+        job = _ai_jobs.get(key)
+        if job is None:
+            job = AIAnalysisJob()
+            _ai_jobs[key] = job
+            _ai_executor.submit(_run_ai_analysis, job, key, prompt, model)
+    return job
+
+def generate_ai_analysis(data, model):
+    """Génère une analyse financière brève en utilisant le modèle IA de Google."""
+    return start_ai_analysis(data, model).result()
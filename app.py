@@ -2,36 +2,49 @@
 
 import streamlit as st
 import os
-import yfinance as yf
-import pandas as pd
-import plotly.graph_objects as go
+import re
+import sys
+from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # --- IMPORTS DE VOS FICHIERS PROJET (PROPRES) ---
-from analysis import calculate_financial_score, generate_ai_analysis
-from data_fetching import (
-    check_ticker_validity, get_advanced_metrics, get_historical_data,
-    get_dividend_data, get_zonebourse_consensus, get_yfinance_news
-)
-from export import generate_excel_report, generate_professional_pdf
+# Seuls les modules légers sont importés ici : pandas, yfinance, plotly, Gemini, FPDF... sont
+# importés par la page qui s'en sert, au premier affichage de cette page.
+import instrumentation
+import profiling
+
+_run_started = profiling.start_run()
 
 # --- CONFIGURATION (UNE SEULE FOIS) ---
 load_dotenv()
 st.set_page_config(page_title="FinAnalyse Pro", page_icon="📈", layout="wide")
 
-# --- INITIALISATION DES SERVICES (UNE SEULE FOIS) ---
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-model = None
-if GOOGLE_API_KEY:
+# --- INITIALISATION DES SERVICES (UNE SEULE FOIS PAR PROCESSUS) ---
+@st.cache_resource(show_spinner=False)
+def get_gemini_model(api_key):
+    """Modèle Gemini partagé par toutes les sessions et tous les reruns."""
+    with profiling.phase("init Gemini"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel('gemini-1.5-flash')
+
+def get_model():
+    """Modèle Gemini, créé à la première page qui s'en sert ; None sans clé ou en cas d'erreur."""
+    if not GOOGLE_API_KEY:
+        return None
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        return get_gemini_model(GOOGLE_API_KEY)
     except Exception as e:
         st.sidebar.error(f"Erreur d'initialisation de l'IA: {e}")
-else:
+        return None
+
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+if not GOOGLE_API_KEY:
     st.sidebar.warning("Analyse IA désactivée (clé Google API manquante).")
 
+# Endpoint /metrics (Prometheus) et /metrics.json si FINANALYSE_METRICS_PORT est défini
+instrumentation.start_metrics_server()
+
 # ==================================
 # DÉFINITION DES PAGES
 # ==================================
@@ -45,127 +58,422 @@ def render_analysis_page():
         st.session_state.ticker_to_analyse = ticker_input
 
     if 'ticker_to_analyse' in st.session_state:
+        with profiling.phase("import analyse"):
+            from company_metrics import CompanyMetrics
+            from data_fetching import fetch_ticker_sources
+            from indicators import get_indicator_state
         ticker = st.session_state.ticker_to_analyse
-        
-        with st.spinner(f"Analyse de {ticker} en cours..."):
-            is_valid, info = check_ticker_validity(ticker)
-            if not is_valid:
-                st.error(f"Symbole '{ticker}' introuvable ou données insuffisantes.")
-                return
-
-            stock = yf.Ticker(ticker)
-            advanced = get_advanced_metrics(ticker)
-            hist_data = get_historical_data(ticker)
-            dividend_history = get_dividend_data(ticker)
-            zb_consensus = get_zonebourse_consensus(ticker)
-            news = get_yfinance_news(ticker)
-            financials = stock.financials
-            balance_sheet = stock.balance_sheet
-            cash_flow = stock.cashflow
-
-            full_data = {"name": info.get("longName", ticker), "symbol": ticker, **info, **advanced}
-            score = calculate_financial_score(full_data)
-            ai_summary = generate_ai_analysis(full_data, model)
-
-            excel_file = generate_excel_report(financials, balance_sheet, cash_flow, hist_data)
-            pdf_file = generate_professional_pdf(full_data, score, ai_summary)
-
-        st.title(f"{full_data.get('name', ticker)} ({full_data.get('symbol', '')})")
-        
+
+        # La mise en page est créée tout de suite, chaque onglet se remplit dès que ses données arrivent
+        title_slot = st.empty()
         tab1, tab2, tab3, tab4 = st.tabs(["📊 Synthèse", "📈 Graphiques", "📂 Finances", "📝 Profil & Actus"])
-        
         with tab1:
-            st.subheader("Exporter le Rapport Complet")
-            c1, c2 = st.columns(2)
-            c1.download_button("📥 Télécharger en Excel", excel_file, f"rapport_excel_{ticker}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            c2.download_button("📄 Télécharger en PDF", pdf_file, f"rapport_pdf_{ticker}.pdf", "application/pdf")
-            st.divider()
-            
-            st.subheader("Vue d'Ensemble")
-            c1, c2, c3 = st.columns(3)
-            c1.metric("Prix Actuel", f"${full_data.get('price', 0):.2f}")
-            c2.metric("Score", f"{score:.1f}/10")
-            c3.metric("Consensus ZB", zb_consensus)
-            
-            if model:
-                st.subheader("🤖 Analyse par IA")
-                with st.expander("Lire l'analyse de l'IA Gemini", expanded=True):
-                    st.write(ai_summary)
-
+            summary_slot = st.empty()
         with tab2:
-            st.subheader("Historique des Prix (1 an)")
-            fig = go.Figure(data=[go.Candlestick(x=hist_data.index, open=hist_data['Open'], high=hist_data['High'], low=hist_data['Low'], close=hist_data['Close'])])
-            fig.update_layout(xaxis_rangeslider_visible=False, template="plotly_dark")
-            st.plotly_chart(fig, use_container_width=True)
-            st.subheader("Dividendes Annuels")
-            if not dividend_history.empty:
-                st.bar_chart(dividend_history)
-            else:
-                st.info("Aucun dividende trouvé sur les 5 dernières années.")
-
+            charts_slot = st.empty()
         with tab3:
-            st.subheader("Compte de Résultat")
-            st.dataframe(financials)
-            st.subheader("Bilan")
-            st.dataframe(balance_sheet)
-            st.subheader("Flux de Trésorerie")
-            st.dataframe(cash_flow)
-            
+            finances_slot = st.empty()
         with tab4:
-            st.subheader("Description de l'entreprise")
-            st.write(full_data.get("description", "Non disponible."))
-            st.subheader("Dernières Actualités")
-            if news:
-                for article in news[:5]:
-                    title = article.get('title', 'Titre non disponible')
-                    link = article.get('link', '#')
-                    publisher = article.get('publisher', 'Source inconnue')
-                    st.markdown(f"**[{title}]({link})** - _{publisher}_")
-                    st.divider()
-            else:
-                st.info("Aucune actualité récente pour ce titre.")
+            profile_slot = st.empty()
+
+        for slot in (summary_slot, charts_slot, finances_slot, profile_slot):
+            slot.info("Chargement des données...")
+
+        # Chaque rendu attend uniquement les sources dont il a besoin
+        renderers = [
+            (summary_slot, {"metrics", "indicators", "consensus", "history", "dividends", "statements"}, render_summary_tab),
+            (charts_slot, {"history", "dividends", "indicators"}, render_charts_tab),
+            (finances_slot, {"statements"}, render_finances_tab),
+            (profile_slot, {"metrics", "news"}, render_profile_tab),
+        ]
+        results = {"ticker": ticker}
+
+        with st.spinner(f"Analyse de {ticker} en cours..."):
+            for source, value in fetch_ticker_sources(ticker):
+                results[source] = value
+
+                if source == "validity":
+                    is_valid, info = value
+                    if not is_valid:
+                        title_slot.empty()
+                        for slot in (summary_slot, charts_slot, finances_slot, profile_slot):
+                            slot.empty()
+                        st.error(f"Symbole '{ticker}' introuvable ou données insuffisantes.")
+                        return
+                    title_slot.title(f"{info.get('longName', ticker)} ({ticker})")
+
+                # Seuls les champs utiles de `info` et d'Alpha Vantage sont conservés
+                if "metrics" not in results and {"validity", "advanced"} <= results.keys():
+                    results["metrics"] = CompanyMetrics.from_sources(ticker, results.pop("validity")[1], results.pop("advanced"))
+
+                # État partagé des indicateurs : seules les nouvelles barres sont intégrées
+                if "indicators" not in results and {"history", "benchmark"} <= results.keys():
+                    results["indicators"] = get_indicator_state(ticker, results["history"], results.pop("benchmark")).snapshot()
+
+                for renderer in list(renderers):
+                    slot, needed, render = renderer
+                    if needed <= results.keys():
+                        with slot.container():
+                            render(results)
+                        renderers.remove(renderer)
+
+        if "ai_stream" in results:
+            ai_slot, ai_job = results["ai_stream"]
+            with ai_slot.container():
+                st.write_stream(ai_job.stream())
+
+def render_summary_tab(results):
+    """Onglet Synthèse : score, consensus, analyse IA et exports."""
+    with profiling.phase("import synthèse"):
+        from analysis import calculate_financial_score, start_ai_analysis
+        from export import lazy_excel_report, lazy_professional_pdf
+    ticker = results["ticker"]
+    metrics = results["metrics"]
+    financials, balance_sheet, cash_flow = results["statements"]
+    hist_data = results["history"]
+
+    model = get_model()
+    use_technical = st.toggle("Inclure les indicateurs techniques dans le score", key="technical_score")
+    score = calculate_financial_score(metrics, results["indicators"] if use_technical else None)
+    # L'analyse IA est générée en arrière-plan (ou lue en cache) : elle ne bloque pas l'affichage
+    ai_job = start_ai_analysis(metrics, model)
+    # Les exports ne sont générés que si l'utilisateur clique sur un bouton de téléchargement
+    excel_file = lazy_excel_report(financials, balance_sheet, cash_flow, hist_data)
+    pdf_file = lazy_professional_pdf(metrics, score, ai_job.result, hist_data, results["dividends"], results["statements"])
+
+    st.subheader("Exporter le Rapport Complet")
+    c1, c2 = st.columns(2)
+    c1.download_button("📥 Télécharger en Excel", excel_file, f"rapport_excel_{ticker}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    c2.download_button("📄 Télécharger en PDF", pdf_file, f"rapport_pdf_{ticker}.pdf", "application/pdf")
+    st.divider()
+
+    st.subheader("Vue d'Ensemble")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Prix Actuel", f"${metrics.price or 0:.2f}")
+    c2.metric("Score", f"{score:.1f}/10")
+    c3.metric("Consensus ZB", results["consensus"])
+
+    if model:
+        st.subheader("🤖 Analyse par IA")
+        with st.expander("Lire l'analyse de l'IA Gemini", expanded=True):
+            ai_slot = st.empty()
+        if ai_job.done:
+            ai_slot.write(ai_job.result())
+        else:
+            ai_slot.info("Analyse en cours de rédaction...")
+            # Le texte sera diffusé une fois tous les onglets affichés
+            results["ai_stream"] = (ai_slot, ai_job)
+
+def render_charts_tab(results):
+    """Onglet Graphiques : chandeliers sur 1 an et dividendes annuels."""
+    with profiling.phase("import graphiques"):
+        import plotly.graph_objects as go
+        from data_fetching import BENCHMARK_TICKER
+        from indicators import SMA_WINDOWS, compute_indicators
+    hist_data = results["history"]
+    dividend_history = results["dividends"]
+
+    st.subheader("Historique des Prix (1 an)")
+    if not hist_data.empty:
+        series = compute_indicators(hist_data)
+        fig = go.Figure(data=[go.Candlestick(x=hist_data.index, open=hist_data['Open'], high=hist_data['High'], low=hist_data['Low'], close=hist_data['Close'], name="Cours")])
+        for window in SMA_WINDOWS:
+            fig.add_trace(go.Scatter(x=hist_data.index, y=series[f"SMA {window}"], name=f"SMA {window}", line=dict(width=1)))
+        fig.update_layout(xaxis_rangeslider_visible=False, template="plotly_dark")
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("Indicateurs Techniques")
+        indicators = results["indicators"]
+        def fmt(value, spec):
+            return spec.format(value) if value is not None else "N/A"
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("RSI (14 j)", fmt(indicators["rsi"], "{:.1f}"))
+        c2.metric("Volatilité (20 j, annualisée)", fmt(indicators["volatility"] and indicators["volatility"] * 100, "{:.1f}%"))
+        c3.metric("Drawdown maximal", fmt(indicators["maxDrawdown"] and indicators["maxDrawdown"] * 100, "{:.1f}%"))
+        c4.metric(f"Bêta vs {BENCHMARK_TICKER}", fmt(indicators["beta"], "{:.2f}"))
+        c1, c2 = st.columns(2)
+        c1.caption("RSI")
+        c1.line_chart(series["RSI"], height=200)
+        c2.caption("Drawdown")
+        c2.area_chart(series["Drawdown"], height=200)
+    else:
+        st.info("Historique des prix indisponible.")
+    st.subheader("Dividendes Annuels")
+    if not dividend_history.empty:
+        st.bar_chart(dividend_history)
+    else:
+        st.info("Aucun dividende trouvé sur les 5 dernières années.")
+
+def render_finances_tab(results):
+    """Onglet Finances : états financiers annuels."""
+    financials, balance_sheet, cash_flow = results["statements"]
+    st.subheader("Compte de Résultat")
+    st.dataframe(financials)
+    st.subheader("Bilan")
+    st.dataframe(balance_sheet)
+    st.subheader("Flux de Trésorerie")
+    st.dataframe(cash_flow)
+
+def render_profile_tab(results):
+    """Onglet Profil & Actus : description et dernières actualités."""
+    from news import normalize_article
+    st.subheader("Description de l'entreprise")
+    st.write(results["metrics"].description or "Non disponible.")
+    st.subheader("Dernières Actualités")
+    news = results["news"]
+    if news:
+        for article in map(normalize_article, news[:5]):
+            st.markdown(f"**[{article['title']}]({article['link']})** - _{article['publisher']}_")
+            st.divider()
+    else:
+        st.info("Aucune actualité récente pour ce titre.")
 
 def render_chat_page():
     """Affiche la page de Chat avec l'IA."""
     st.header("Chat avec FinAnalyse AI")
-    if not model:
+    if not get_model():
         st.error("Service de Chat IA indisponible. Configurez votre GOOGLE_API_KEY.")
         return
+    from chat import ChatEngine
+    if "chat_engine" not in st.session_state:
+        st.session_state.chat_engine = ChatEngine(get_model())
+    engine = st.session_state.chat_engine
+
+    # L'historique est dessiné hors du fragment, une fois par exécution complète du script
+    history = st.container()
+    with history:
+        if engine.hidden_count:
+            st.caption(f"{engine.hidden_count} message(s) plus ancien(s) masqué(s), résumé(s) dans le contexte de l'IA.")
+        for message in engine.display:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+    render_chat_fragment(engine, history)
 
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-
-    if prompt := st.chat_input("Posez une question financière..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-        
-        with st.chat_message("assistant"):
-            with st.spinner("Réflexion..."):
-                response = model.generate_content(prompt).text
-                st.markdown(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
+@st.fragment
+def render_chat_fragment(engine, history):
+    """
+    Saisie : seul ce fragment est ré-exécuté à chaque nouveau message. Le nouvel échange est ajouté
+    au conteneur de l'historique (extérieur au fragment, donc conservé d'un message à l'autre) :
+    les messages précédents ne sont pas redessinés.
+    """
+    with profiling.measure_run("Chat AI", fragment=True):
+        if prompt := st.chat_input("Posez une question financière..."):
+            with history:
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+                with st.chat_message("assistant"):
+                    st.write_stream(engine.stream_reply(prompt))
 
 def render_news_page():
-    """Affiche les actualités générales du marché."""
-    st.header("Dernières Actualités des Marchés (S&P 500)")
-    articles = get_yfinance_news('SPY') # On utilise un ticker général comme le S&P 500
+    """Affiche les actualités des marchés depuis la base locale alimentée en arrière-plan."""
+    st.header("Dernières Actualités des Marchés")
+    with profiling.phase("import actualités"):
+        from news import NEWS_TICKERS, ensure_poller, get_news_store, poll
+    news_store = get_news_store()
+    if news_store.is_empty():
+        with st.spinner("Premier chargement des actualités..."):
+            poll(news_store)
+    ensure_poller()
+
+    selected = st.multiselect("Filtrer par ticker", NEWS_TICKERS)
+    articles = news_store.query(tickers=selected, limit=20)
     if not articles:
         st.warning("Aucun article n'a pu être chargé.")
         return
 
-    for article in articles[:10]:
-        title = article.get('title', 'Titre non disponible')
-        link = article.get('link', '#')
-        publisher = article.get('publisher', 'Source inconnue')
-        st.subheader(f"[{title}]({link})")
-        st.write(f"_{publisher}_")
+    for article in articles:
+        published = datetime.fromtimestamp(article['published_at']).strftime('%d/%m/%Y %H:%M') if article['published_at'] else ""
+        st.subheader(f"[{article['title']}]({article['link']})")
+        st.write(f"_{article['publisher']}_ · {published} · {article['tickers'].replace(',', ', ')}")
         st.divider()
 
+def render_screener_page():
+    """Classe un univers de tickers par score financier."""
+    st.header("Screener")
+    with profiling.phase("import screener"):
+        import pandas as pd
+        from indicators import load_indicators
+        from screener import SCORE_COLUMNS, TECHNICAL_COLUMNS, load_metrics, screen
+    tickers_text = st.text_area("Symboles (séparés par des virgules ou des retours à la ligne)", "AAPL, MSFT, GOOGL, META, TTE")
+    uploaded = st.file_uploader("...ou un fichier CSV de métriques (une ligne par ticker, colonnes du score)", type="csv")
+    technical = st.checkbox("Inclure les indicateurs techniques (volatilité, drawdown, tendance) dans le score")
+
+    if st.button("Lancer le screening", key="screener_btn"):
+        with st.spinner("Chargement des métriques..."):
+            if uploaded is not None:
+                metrics = pd.read_csv(uploaded, index_col=0)
+            else:
+                tickers = [t for t in re.split(r"[,\s]+", tickers_text.upper()) if t]
+                metrics = load_metrics(tickers)
+                if technical:
+                    metrics = metrics.join(load_indicators(tickers))
+        st.session_state.screener_metrics = metrics
+
+    if 'screener_metrics' in st.session_state:
+        metrics = st.session_state.screener_metrics
+        c1, c2 = st.columns(2)
+        min_score = c1.slider("Score minimum", 0.0, 10.0, 0.0, 0.5)
+        sort_by = c2.selectbox("Trier par", ["score"] + [c for c in SCORE_COLUMNS if c in metrics])
+        filters = {}
+        if 'sector' in metrics:
+            sectors = st.multiselect("Secteurs", sorted(metrics['sector'].dropna().unique()))
+            if sectors:
+                filters['sector'] = sectors
+
+        use_technical = technical and all(c in metrics for c in TECHNICAL_COLUMNS)
+        results = screen(metrics, min_score=min_score, filters=filters, sort_by=sort_by, technical=use_technical)
+        st.caption(f"{len(results)} / {len(metrics)} tickers retenus")
+        st.dataframe(results, use_container_width=True)
+
+def render_portfolio_page():
+    """Risque d'un portefeuille : corrélations, volatilité, VaR et rendement du dividende."""
+    st.header("Portefeuille")
+    with profiling.phase("import portefeuille"):
+        import pandas as pd
+        import plotly.graph_objects as go
+        from portfolio import get_portfolio_model, parse_holdings
+    holdings_text = st.text_area("Positions : une ligne « TICKER poids » (poids optionnel, équipondéré sinon)", "AAPL 30\nMSFT 25\nTTE 20\nORA.PA 15\nJPM 10")
+    c1, c2 = st.columns(2)
+    value = c1.number_input("Valeur du portefeuille ($)", min_value=0.0, value=100_000.0, step=10_000.0)
+    confidence = c2.selectbox("Niveau de confiance de la VaR", [0.95, 0.99], format_func=lambda c: f"{c:.0%}")
+
+    if st.button("Analyser le portefeuille", key="portfolio_btn"):
+        st.session_state.portfolio_holdings = parse_holdings(holdings_text)
+
+    holdings = st.session_state.get("portfolio_holdings")
+    if not holdings:
+        return
+    with st.spinner("Chargement des historiques..."):
+        model = get_portfolio_model(list(holdings))
+    if model.excluded:
+        st.warning(f"Historique insuffisant, titres écartés : {', '.join(model.excluded)}")
+    if len(model.tickers) < 2 or model.days < 3:
+        st.error("Il faut au moins deux titres avec un historique exploitable.")
+        return
+
+    risk = model.risk(holdings, confidence=confidence, value=value)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Volatilité annualisée", f"{risk['volatility']:.1%}")
+    c2.metric(f"VaR historique 1 j ({confidence:.0%})", f"${risk['historical_var']:,.0f}")
+    c3.metric(f"VaR paramétrique 1 j ({confidence:.0%})", f"${risk['parametric_var']:,.0f}")
+    c4.metric("Rendement du dividende", f"{risk['dividend_yield']:.2%}")
+    st.caption(f"{len(model.tickers)} titres, {model.days} séances du {model.dates[0]:%d/%m/%Y} au {model.dates[-1]:%d/%m/%Y}")
+
+    # La carte de chaleur n'est reconstruite que si le portefeuille ou ses données ont changé
+    view_key = (tuple(model.tickers), model.version)
+    cached = st.session_state.get("portfolio_heatmap")
+    if cached is None or cached[0] != view_key:
+        corr = model.correlation()
+        fig = go.Figure(go.Heatmap(z=corr.to_numpy(), x=corr.columns, y=corr.index, zmin=-1, zmax=1, colorscale="RdBu_r"))
+        fig.update_layout(template="plotly_dark", height=max(400, 18 * len(corr)))
+        cached = (view_key, fig)
+        st.session_state.portfolio_heatmap = cached
+    st.subheader("Corrélation des rendements quotidiens")
+    st.plotly_chart(cached[1], use_container_width=True)
+
+    weights = model.weight_vector(holdings)
+    st.subheader("Positions")
+    st.dataframe(pd.DataFrame({
+        "Poids": weights,
+        "Volatilité annualisée": model.volatilities(),
+        "Rendement du dividende": model.dividend_yields,
+    }, index=pd.Index(model.tickers, name="Ticker")).style.format("{:.2%}"), use_container_width=True)
+
+def render_watchlist_page():
+    """Cotations d'une liste de titres, rafraîchies automatiquement."""
+    st.header("Liste de suivi")
+    with profiling.phase("import liste de suivi"):
+        from watchlist import WATCHLIST_REFRESH_SECONDS
+    tickers_text = st.text_area("Symboles (séparés par des virgules ou des retours à la ligne)", "AAPL, MSFT, GOOGL, META, NVDA, JPM, TTE, ORA.PA", key="watchlist_tickers")
+    tickers = tuple(dict.fromkeys(t for t in re.split(r"[,\s]+", tickers_text.upper()) if t))
+    if not tickers:
+        st.info("Saisissez au moins un symbole.")
+        return
+    # Fragment déclaré ici : la période de rafraîchissement vient de watchlist, importé à la demande
+    st.fragment(run_every=WATCHLIST_REFRESH_SECONDS)(render_watchlist_table)(tickers)
+
+def render_watchlist_table(tickers):
+    """Tableau des cotations : seul ce fragment est ré-exécuté à chaque rafraîchissement."""
+    with profiling.measure_run("Liste de suivi", fragment=True):
+        from watchlist import WATCHLIST_REFRESH_SECONDS, get_watchlist
+        with st.spinner("Chargement des cours..."):
+            watchlist = get_watchlist(tickers)
+        if st.button("Rafraîchir maintenant", key="watchlist_refresh_btn"):
+            watchlist.refresh(force=True)
+
+        quotes = watchlist.quotes()
+        missing = quotes.index[quotes["price"].isna()]
+        if len(missing):
+            st.warning(f"Aucun cours pour : {', '.join(missing)}")
+        st.caption(
+            f"{len(quotes) - len(missing)} titres · mis à jour à {datetime.fromtimestamp(watchlist.refreshed_at):%H:%M:%S} "
+            f"· rafraîchissement toutes les {WATCHLIST_REFRESH_SECONDS} s"
+        )
+        st.dataframe(
+            quotes,
+            use_container_width=True,
+            column_config={
+                "price": st.column_config.NumberColumn("Cours", format="%.2f"),
+                "change": st.column_config.NumberColumn("Variation", format="%+.2f"),
+                "changePct": st.column_config.NumberColumn("Variation (%)", format="percent"),
+                "low52": st.column_config.NumberColumn("Plus bas 52 s.", format="%.2f"),
+                "high52": st.column_config.NumberColumn("Plus haut 52 s.", format="%.2f"),
+                "position52": st.column_config.ProgressColumn("Position 52 s.", min_value=0.0, max_value=1.0, format="percent"),
+                "date": st.column_config.DateColumn("Séance", format="DD/MM/YYYY"),
+            },
+        )
+
+def render_admin_panel():
+    """Mesures du processus : démarrage, appels, latences, erreurs, octets et taux de succès des caches."""
+    with st.expander("🔧 Administration", expanded=False):
+        # Les tableaux ne sont construits que sur demande : ils n'alourdissent pas chaque rerun
+        if not st.toggle("Afficher les mesures", key="admin_metrics"):
+            return
+        with profiling.phase("import administration"):
+            import pandas as pd
+        startup = profiling.report()
+        if startup["cold_start_ms"] is not None:
+            st.markdown(f"**Démarrage** : {startup['cold_start_ms']:,.0f} ms jusqu'au premier affichage")
+        if startup["phases"]:
+            st.dataframe(
+                pd.DataFrame(startup["phases"]).rename(columns={"phase": "import / initialisation"}),
+                hide_index=True, use_container_width=True,
+            )
+        if startup["runs"]:
+            st.markdown("**Exécutions du script**")
+            st.dataframe(
+                pd.DataFrame(startup["runs"]).replace({"type": {"first_paint": "premier affichage", "rerun": "rerun", "fragment": "fragment"}})
+                .rename(columns={"runs": "exécutions", "last_ms": "dernière (ms)"}),
+                hide_index=True, use_container_width=True,
+            )
+
+        metrics = instrumentation.snapshot()
+        if not metrics["calls"]:
+            st.caption("Aucune mesure pour le moment.")
+            return
+        calls = pd.DataFrame(metrics["calls"])
+        calls["moy. (ms)"] = calls["seconds"] / calls["calls"] * 1000
+        st.markdown("**Appels**")
+        st.dataframe(
+            calls[["kind", "name", "calls", "errors", "moy. (ms)", "bytes"]]
+            .rename(columns={"kind": "type", "name": "nom", "calls": "appels", "errors": "erreurs", "bytes": "octets"}),
+            hide_index=True, use_container_width=True,
+        )
+        if metrics["cache"]:
+            cache = pd.DataFrame(metrics["cache"]).rename(columns={"namespace": "cache", "hit_ratio": "taux de succès"})
+            st.markdown("**Caches**")
+            st.dataframe(cache, hide_index=True, use_container_width=True)
+        # Le routeur n'est importé qu'avec la page d'analyse : rien à afficher avant
+        if "providers" not in sys.modules:
+            return
+        providers = pd.DataFrame(sys.modules["providers"].get_router().stats())
+        st.markdown("**Fournisseurs**")
+        st.dataframe(
+            providers.rename(columns={"provider": "fournisseur", "enabled": "actif", "state": "disjoncteur", "calls": "appels",
+                                      "errors": "erreurs", "error_rate": "taux d'erreur"}),
+            hide_index=True, use_container_width=True,
+        )
+
 # ==================================
 # NAVIGATION PRINCIPALE
 # ==================================
@@ -174,14 +482,28 @@ with st.sidebar:
     st.title("📈 FinAnalyse Pro")
     page = st.radio(
         "Navigation",
-        ["Analyse d'entreprise", "Chat AI", "Actualités"],
+        ["Analyse d'entreprise", "Liste de suivi", "Screener", "Portefeuille", "Chat AI", "Actualités"],
         key="navigation_radio"
     )
 
 # --- Routage des pages ---
-if page == "Analyse d'entreprise":
-    render_analysis_page()
-elif page == "Chat AI":
-    render_chat_page()
-elif page == "Actualités":
-    render_news_page()
\ No newline at end of file
+# La mesure couvre aussi une exécution interrompue (st.stop, st.rerun, exception)
+_first_in_session = "profiling_seen" not in st.session_state
+st.session_state.profiling_seen = True
+with profiling.measure_run(page, _run_started, first_in_session=_first_in_session):
+    if page == "Analyse d'entreprise":
+        render_analysis_page()
+    elif page == "Liste de suivi":
+        render_watchlist_page()
+    elif page == "Screener":
+        render_screener_page()
+    elif page == "Portefeuille":
+        render_portfolio_page()
+    elif page == "Chat AI":
+        render_chat_page()
+    elif page == "Actualités":
+        render_news_page()
+
+    with st.sidebar:
+        render_admin_panel()
+
@@ -0,0 +1,203 @@
+# batch_reports.py
+# Génération des rapports Excel et PDF en ligne de commande, sans passer par Streamlit.
+#
+# Exemple :
+#   python batch_reports.py AAPL MSFT TTE --output-dir rapports
+#   python batch_reports.py --file sp500.txt --output-dir rapports --processes 8
+#   python batch_reports.py --file sp500.txt --workbook sp500.xlsx --layout long --period max
+#
+# Les données sont récupérées en parallèle (threads, appels réseau) et les fichiers
+# sont produits dans un pool de processus (WeasyPrint et openpyxl sont limités par le GIL) ;
+# chaque processus prépare le moteur de rapports une fois puis le réutilise. Les processus
+# sont lancés en mode « spawn » : le processus parent a déjà des threads (récupération,
+# routeur de fournisseurs, cache) et des connexions SQLite qu'un fork copierait dans un
+# état incohérent (verrou tenu, connexion partagée).
+# Un ticker dont les deux rapports existent déjà est ignoré : relancer la même
+# commande après une interruption reprend là où elle s'était arrêtée.
+# Avec --workbook, les états financiers et les cours de tous les tickers sont écrits
+# en flux dans un classeur unique (mémoire bornée, quel que soit le nombre de tickers).
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from analysis import calculate_financial_score, generate_ai_analysis
+from company_metrics import CompanyMetrics
+from data_fetching import fetch_ticker_sources, get_financial_statements, get_historical_data, prefetch_zonebourse_consensus
+from export import generate_excel_report, generate_professional_pdf, write_multi_ticker_workbook
+
+
+def report_paths(output_dir, ticker):
+    return (
+        os.path.join(output_dir, f"rapport_excel_{ticker}.xlsx"),
+        os.path.join(output_dir, f"rapport_pdf_{ticker}.pdf"),
+    )
+
+
+def _write_atomically(path, content):
+    # Écriture dans un fichier temporaire puis renommage : un fichier présent est toujours complet
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def fetch_report_inputs(ticker, model=None):
+    """Récupère les données d'un ticker et calcule le score et l'analyse IA. Renvoie None si le ticker est invalide."""
+    results = dict(fetch_ticker_sources(ticker))
+    is_valid, info = results["validity"]
+    if not is_valid:
+        return None
+    metrics = CompanyMetrics.from_sources(ticker, info, results["advanced"])
+    score = calculate_financial_score(metrics)
+    ai_summary = generate_ai_analysis(metrics, model)
+    return metrics, score, ai_summary, results["statements"], results["history"], results["dividends"]
+
+
+def render_reports(ticker, metrics, score, ai_summary, statements, hist_data, dividends, output_dir):
+    """Exécuté dans un processus séparé : produit et écrit les deux rapports d'un ticker."""
+    excel_path, pdf_path = report_paths(output_dir, ticker)
+    financials, balance_sheet, cash_flow = statements
+    _write_atomically(excel_path, generate_excel_report(financials, balance_sheet, cash_flow, hist_data))
+    _write_atomically(pdf_path, generate_professional_pdf(metrics, score, ai_summary, hist_data, dividends, statements))
+    return ticker
+
+
+def load_model(use_ai):
+    if not use_ai:
+        return None
+    import google.generativeai as genai
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("GOOGLE_API_KEY manquante : rapports générés sans analyse IA.")
+        return None
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+
+def run_batch(tickers, output_dir, fetch_workers=8, processes=None, use_ai=False, force=False):
+    """Génère les rapports de tous les tickers et renvoie un résumé de l'exécution."""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    todo = [t for t in tickers if force or not all(os.path.exists(p) for p in report_paths(output_dir, t))]
+    skipped = len(tickers) - len(todo)
+    model = load_model(use_ai)
+    done, invalid, failed = [], [], []
+    # Consensus Zone Bourse de tout le lot en une passe : chaque ticker le trouve ensuite en cache
+    prefetch_zonebourse_consensus(todo, max_workers=fetch_workers)
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    ) as renderers:
+        fetches = {fetchers.submit(fetch_report_inputs, t, model): t for t in todo}
+        renders = {}
+        # Chaque ticker part au rendu dès que ses données sont arrivées
+        for future in as_completed(fetches):
+            ticker = fetches[future]
+            try:
+                inputs = future.result()
+            except Exception as e:
+                print(f"[Erreur] {ticker} : récupération impossible ({e})")
+                failed.append(ticker)
+                continue
+            if inputs is None:
+                print(f"[Ignoré] {ticker} : symbole introuvable ou données insuffisantes.")
+                invalid.append(ticker)
+                continue
+            renders[renderers.submit(render_reports, ticker, *inputs, output_dir)] = ticker
+
+        for future in as_completed(renders):
+            ticker = renders[future]
+            try:
+                future.result()
+                done.append(ticker)
+                print(f"[OK] {ticker}")
+            except Exception as e:
+                print(f"[Erreur] {ticker} : génération impossible ({e})")
+                failed.append(ticker)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "generated": done,
+        "skipped": skipped,
+        "invalid": invalid,
+        "failed": failed,
+        "elapsed": elapsed,
+        "throughput": len(done) / elapsed * 60 if elapsed > 0 else 0,
+    }
+
+
+def iter_workbook_entries(tickers, period="5y", interval="1d", fetch_workers=8):
+    """
+    (ticker, états financiers, historique) de chaque ticker, dans l'ordre. Les tickers sont
+    récupérés par fenêtres de `fetch_workers` : au plus une fenêtre est en mémoire à la fois.
+    """
+    def fetch(ticker):
+        try:
+            return ticker, get_financial_statements(ticker), get_historical_data(ticker, period=period, interval=interval)
+        except Exception as e:
+            print(f"[Erreur] {ticker} : récupération impossible ({e})")
+            return None
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers:
+        for start in range(0, len(tickers), fetch_workers):
+            for entry in fetchers.map(fetch, tickers[start:start + fetch_workers]):
+                if entry is None:
+                    continue
+                ticker, statements, history = entry
+                if history.empty and all(s.empty for s in statements):
+                    print(f"[Ignoré] {ticker} : aucune donnée.")
+                    continue
+                yield entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère en lot les rapports Excel et PDF de FinAnalyse Pro.")
+    parser.add_argument("tickers", nargs="*", help="Symboles à traiter (ex: AAPL MSFT ORA.PA)")
+    parser.add_argument("--file", help="Fichier texte contenant un symbole par ligne")
+    parser.add_argument("--output-dir", default="rapports", help="Dossier de sortie (défaut : rapports)")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Tickers récupérés en parallèle")
+    parser.add_argument("--processes", type=int, default=None, help="Processus de rendu (défaut : nombre de CPU)")
+    parser.add_argument("--ai", action="store_true", help="Inclure l'analyse Gemini dans les PDF")
+    parser.add_argument("--force", action="store_true", help="Régénérer les rapports déjà présents")
+    parser.add_argument("--workbook", help="Écrire un classeur Excel unique pour tous les tickers (au lieu des rapports individuels)")
+    parser.add_argument("--layout", choices=["sheets", "long"], default="sheets",
+                        help="Classeur unique : feuilles par ticker ou format long (défaut : sheets)")
+    parser.add_argument("--period", default="5y", help="Classeur unique : période de l'historique (défaut : 5y)")
+    parser.add_argument("--interval", default="1d", help="Classeur unique : intervalle des cours (défaut : 1d)")
+    args = parser.parse_args(argv)
+
+    tickers = [t.upper() for t in args.tickers]
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            tickers += [line.strip().upper() for line in f if line.strip() and not line.startswith("#")]
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        parser.error("aucun symbole fourni")
+
+    load_dotenv()
+    if args.workbook:
+        started = time.perf_counter()
+        entries = iter_workbook_entries(tickers, args.period, args.interval, args.fetch_workers)
+        written = write_multi_ticker_workbook(args.workbook, entries, layout=args.layout)
+        print(f"\nClasseur {args.workbook} : {len(written)}/{len(tickers)} tickers en {time.perf_counter() - started:.1f} s")
+        return 0 if written else 1
+
+    summary = run_batch(tickers, args.output_dir, args.fetch_workers, args.processes, args.ai, args.force)
+
+    print("\n--- Résumé ---")
+    print(f"Rapports générés : {len(summary['generated'])}")
+    print(f"Déjà présents (reprise) : {summary['skipped']}")
+    print(f"Symboles invalides : {len(summary['invalid'])}")
+    print(f"Échecs : {len(summary['failed'])}")
+    print(f"Durée : {summary['elapsed']:.1f} s ({summary['throughput']:.1f} tickers/min)")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
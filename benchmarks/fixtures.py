@@ -0,0 +1,288 @@
+# benchmarks/fixtures.py
+# Données rejouées par les benchmarks, sans aucun accès réseau.
+#
+# Pour chaque ticker, on utilise l'enregistrement benchmarks/fixtures/<TICKER>.pkl
+# s'il existe (voir `record`), sinon des données synthétiques déterministes de même
+# forme que les réponses de yfinance, Alpha Vantage, Zone Bourse et Gemini.
+# `install` remplace les points d'accès réseau du projet par ces données.
+
+import functools
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+AI_TEXT = (
+    "L'entreprise présente une rentabilité solide et un endettement maîtrisé. "
+    "Point de vigilance : une valorisation supérieure à la moyenne du secteur. "
+    "Ceci ne constitue pas un conseil d'investissement."
+)
+
+
+def _rng(ticker):
+    return np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+
+
+def synthetic_fixture(ticker, years=5):
+    """Jeu de réponses plausible et reproductible pour un ticker."""
+    rng = _rng(ticker)
+    index = pd.bdate_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=252 * years, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+    history = pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.003, len(index))),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1e6, 5e7, len(index)).astype("float64"),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=index)
+    history.iloc[::63, history.columns.get_loc("Dividends")] = round(float(rng.uniform(0.1, 1.0)), 2)
+
+    periods = pd.to_datetime([f"{y}-12-31" for y in range(2024, 2020, -1)])
+    def statement(lines):
+        return pd.DataFrame(rng.uniform(1e9, 1e11, (len(lines), len(periods))), index=lines, columns=periods)
+
+    revenue = float(rng.uniform(5e9, 3e11))
+    return {
+        "info": {
+            "longName": f"{ticker} Corporation",
+            "currentPrice": float(close[-1]),
+            "beta": float(rng.uniform(0.5, 1.8)),
+            "returnOnEquity": float(rng.uniform(-0.05, 0.4)),
+            "profitMargins": float(rng.uniform(-0.05, 0.3)),
+            "trailingPE": float(rng.uniform(5, 60)),
+            "debtToEquity": float(rng.uniform(0, 250)),
+            "totalRevenue": revenue,
+            "dividendYield": float(rng.uniform(0, 5)),  # en pourcentage, comme yfinance
+            "sector": ["Technology", "Energy", "Healthcare", "Financial Services"][int(rng.integers(4))],
+            "longBusinessSummary": f"{ticker} est une entreprise fictive utilisée pour les benchmarks.",
+        },
+        "history": history,
+        "financials": statement(["Total Revenue", "Gross Profit", "Operating Income", "Net Income"]),
+        "balance_sheet": statement(["Total Assets", "Total Liabilities Net Minority Interest", "Stockholders Equity", "Total Debt"]),
+        "cashflow": statement(["Operating Cash Flow", "Capital Expenditure", "Free Cash Flow"]),
+        "news": [
+            {"title": f"{ticker} : actualité {i}", "link": f"https://example.com/{ticker}/{i}",
+             "publisher": "Benchmark", "providerPublishTime": 1_700_000_000 + i * 3600}
+            for i in range(10)
+        ],
+        "alpha_vantage": {
+            "OVERVIEW": {
+                "Symbol": ticker, "MarketCapitalization": str(revenue * 5), "EBITDA": str(revenue * 0.3),
+                "PERatio": str(rng.uniform(5, 60)), "ForwardPE": str(rng.uniform(5, 50)), "Beta": "1.1",
+                "DividendYield": str(rng.uniform(0, 0.05)), "RevenueTTM": str(revenue),
+                "ReturnOnEquityTTM": str(rng.uniform(0, 0.4)), "ReturnOnAssetsTTM": str(rng.uniform(0, 0.2)),
+                "QuarterlyRevenueGrowthYOY": "0.05", "QuarterlyEarningsGrowthYOY": "0.08",
+                "PriceToBookRatio": "4.2", "FullTimeEmployees": "12000", "NetIncomeTTM": str(revenue * 0.1),
+                "Description": f"{ticker} (Alpha Vantage)", "Sector": "TECHNOLOGY", "Country": "USA",
+            },
+            "BALANCE_SHEET": {"annualReports": [{"fiscalDateEnding": "2024-12-31", "longTermDebt": "2e10", "shortTermDebt": "5e9", "totalShareholderEquity": "6e10"}]},
+            "CASH_FLOW": {"annualReports": [{"fiscalDateEnding": "2024-12-31", "operatingCashflow": "3e10", "capitalExpenditures": "8e9"}]},
+        },
+        "zonebourse_html": (
+            "<html><body>" + "<p>contenu</p>" * 2000
+            + '<div class="c-face-instrument__rating-text txt-bold">Accumuler</div>'
+            + "<p>suite</p>" * 8000 + "</body></html>"
+        ).encode("utf-8"),
+        "ai_text": AI_TEXT,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def load_fixture(ticker):
+    """Fixture du ticker (partagée : ne pas la modifier)."""
+    path = os.path.join(FIXTURES_DIR, f"{ticker.upper()}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return synthetic_fixture(ticker.upper())
+
+
+def record(ticker):
+    """Enregistre les vraies réponses d'un ticker (nécessite le réseau et les clés d'API)."""
+    import requests
+    import yfinance as yf
+    from alpha_vantage import get_client
+    from zonebourse import QUOTE_URL, get_index
+
+    ticker = ticker.upper()
+    stock = yf.Ticker(ticker)
+    fixture = {
+        "info": stock.info,
+        "history": stock.history(period="5y"),
+        "financials": stock.financials,
+        "balance_sheet": stock.balance_sheet,
+        "cashflow": stock.cashflow,
+        "quarterly_financials": stock.quarterly_financials,
+        "quarterly_balance_sheet": stock.quarterly_balance_sheet,
+        "quarterly_cashflow": stock.quarterly_cashflow,
+        "news": stock.news,
+        "alpha_vantage": {f: get_client().query(f, ticker) for f in ("OVERVIEW", "BALANCE_SHEET", "CASH_FLOW")},
+        "zonebourse_html": b"",
+        "ai_text": AI_TEXT,
+    }
+    url_name = get_index().resolve(ticker)
+    if url_name:
+        fixture["zonebourse_html"] = requests.get(QUOTE_URL.format(url_name=url_name), headers={"User-Agent": "Mozilla/5.0"}, timeout=10).content
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(os.path.join(FIXTURES_DIR, f"{ticker}.pkl"), "wb") as f:
+        pickle.dump(fixture, f)
+    return fixture
+
+
+# --- Substituts des clients réseau ---
+
+class FixtureTicker:
+    """Remplace yf.Ticker à partir d'une fixture."""
+
+    def __init__(self, ticker):
+        self._fixture = load_fixture(ticker)
+        self.info = self._fixture["info"]
+        self.news = self._fixture["news"]
+        self.financials = self._fixture["financials"]
+        self.balance_sheet = self._fixture["balance_sheet"]
+        self.cashflow = self._fixture["cashflow"]
+        # Les fixtures synthétiques n'ont pas d'états trimestriels
+        self.quarterly_financials = self._fixture.get("quarterly_financials", pd.DataFrame())
+        self.quarterly_balance_sheet = self._fixture.get("quarterly_balance_sheet", pd.DataFrame())
+        self.quarterly_cashflow = self._fixture.get("quarterly_cashflow", pd.DataFrame())
+
+    def history(self, period=None, start=None, end=None, interval="1d"):
+        history = self._fixture["history"]
+        if period == "1d":
+            return history.iloc[-1:]
+        if start is not None:
+            history = history[history.index >= pd.Timestamp(start).tz_convert(history.index.tz)]
+        if end is not None:
+            history = history[history.index < pd.Timestamp(end).tz_convert(history.index.tz)]
+        return history.copy()
+
+
+def fixture_download(tickers, period="1mo", interval="1d", **kwargs):
+    """Remplace yf.download : colonnes (champ, ticker), dates sans fuseau comme pour les barres journalières."""
+    frames = {}
+    for ticker in tickers:
+        history = load_fixture(ticker)["history"]
+        history = history.set_axis(history.index.tz_localize(None).normalize())
+        if period.endswith("d"):
+            history = history.iloc[-int(period[:-1]):]
+        elif period.endswith("y"):
+            history = history[history.index > history.index[-1] - pd.DateOffset(years=int(period[:-1]))]
+        frames[ticker] = history
+    return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+
+class FixtureResponse:
+    def __init__(self, content):
+        self.content = content
+        self.status_code = 200
+        self.headers = {}
+        self.encoding = "utf-8"
+        self.text = content.decode("utf-8", "replace")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=16384):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+class FixtureSession:
+    """Remplace la session Zone Bourse : renvoie la page enregistrée du ticker."""
+
+    def __init__(self):
+        self.headers = {}
+
+    def mount(self, *args):
+        pass
+
+    def get(self, url, params=None, **kwargs):
+        if params and "q" in params:
+            ticker = params["q"].upper()
+            return FixtureResponse(
+                f'<table><tr><td><a href="/cours/action/{ticker}-FIXTURE-1/">{ticker}</a></td><td>{ticker}</td></tr></table>'.encode()
+            )
+        ticker = url.rstrip("/").rsplit("/", 1)[-1].split("-FIXTURE")[0]
+        return FixtureResponse(load_fixture(ticker)["zonebourse_html"])
+
+
+class StandInProvider:
+    """
+    Fournisseur de métriques simulé pour le routeur de providers.py : latence `latency`
+    (± 20 %), un appel sur `slow_every` dure `slow_latency` ; `failing` le fait toujours échouer.
+    """
+
+    def __init__(self, name, latency, slow_latency=None, slow_every=0, failing=False, seed=0):
+        self.name = name
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_every = slow_every
+        self.failing = failing
+        self.calls = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def available(self):
+        return True
+
+    def fetch(self, ticker):
+        with self._lock:
+            self.calls += 1
+            slow = self.slow_every and self.calls % self.slow_every == 0
+            latency = self.slow_latency if slow else self.latency * self._rng.uniform(0.8, 1.2)
+        time.sleep(latency)
+        if self.failing:
+            raise RuntimeError(f"{self.name} indisponible")
+        return {"marketCap": 1e9, "peRatio": 20.0, "sector": "Technology"}
+
+
+class FixtureChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FixtureModel:
+    """Remplace le modèle Gemini : renvoie le texte enregistré, découpé comme un flux."""
+
+    model_name = "models/fixture"
+
+    def generate_content(self, prompt, stream=False):
+        words = [w + " " for w in AI_TEXT.split()]
+        if stream:
+            return iter(FixtureChunk(w) for w in words)
+        return FixtureChunk("".join(words))
+
+
+def install():
+    """Branche les substituts sur les modules du projet."""
+    import alpha_vantage
+    import ticker_snapshot
+    import watchlist
+    import zonebourse
+
+    ticker_snapshot.yf.Ticker = FixtureTicker
+    watchlist.yf.download = fixture_download
+    alpha_vantage.AlphaVantageClient._fetch = lambda self, function, symbol: load_fixture(symbol)["alpha_vantage"][function]
+    # Le fournisseur Alpha Vantage n'est activé qu'avec une clé
+    client = alpha_vantage.get_client()
+    client.api_key = client.api_key or "fixture"
+    zonebourse._session = FixtureSession()
+    zonebourse.get_index()._entries.clear()
+    # Les threads de récupération tournent ici hors de toute session Streamlit : avertissement sans objet
+    for name in ("streamlit.runtime.scriptrunner_utils", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).setLevel(logging.ERROR)
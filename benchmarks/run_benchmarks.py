@@ -0,0 +1,281 @@
+# benchmarks/run_benchmarks.py
+# Benchmarks hors ligne du parcours d'analyse complet.
+#
+#   python benchmarks/run_benchmarks.py                       # scénarios par défaut
+#   python benchmarks/run_benchmarks.py --iterations 50 --batch-size 200 --json resultats.json
+#   python benchmarks/run_benchmarks.py --record AAPL MSFT    # enregistre de vraies réponses (réseau requis)
+#
+# Toutes les réponses externes sont rejouées depuis benchmarks/fixtures (voir fixtures.py)
+# et les caches sont placés dans un dossier temporaire : deux exécutions sur la même
+# machine sont comparables. Chaque étape est chronométrée séparément (percentiles).
+# Le pic mémoire est mesuré avec tracemalloc pendant une seule itération de chaque scénario :
+# la dernière, exclue des durées, pour les scénarios mono-ticker ; l'unique passe, chronométrée
+# sous tracemalloc, pour le lot et le routeur.
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+# Caches isolés : à définir avant d'importer les modules du projet
+_WORKDIR = tempfile.mkdtemp(prefix="finanalyse-bench-")
+os.environ["FINANALYSE_CACHE_PATH"] = os.path.join(_WORKDIR, "cache.sqlite")
+os.environ.setdefault("ALPHA_VANTAGE_CALLS_PER_MINUTE", "1000000")
+os.environ.setdefault("ALPHA_VANTAGE_CALLS_PER_DAY", "1000000")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import plotly.graph_objects as go
+
+import fixtures
+from analysis import SCORE_COLUMNS, calculate_financial_score, calculate_financial_scores, generate_ai_analysis
+from cache import get_default_backend
+from company_metrics import CompanyMetrics
+from data_fetching import fetch_ticker_sources
+from export import generate_basic_pdf, generate_excel_report, generate_professional_pdf
+import price_store
+import providers
+import report_engine
+import ticker_snapshot
+
+DEFAULT_TICKERS = ["AAPL", "MSFT", "GOOGL", "META", "TTE", "ORA.PA", "NVDA", "JPM"]
+
+
+def reset_caches():
+    """Repart d'un état « démarrage à froid » : caches disque, magasin de prix et instantanés vidés."""
+    get_default_backend().clear()
+    shutil.rmtree(price_store.get_price_store().root, ignore_errors=True)
+    ticker_snapshot._snapshots.clear()
+    report_engine._charts.clear()
+
+
+def build_chart(hist_data):
+    fig = go.Figure(data=[go.Candlestick(x=hist_data.index, open=hist_data['Open'], high=hist_data['High'], low=hist_data['Low'], close=hist_data['Close'])])
+    fig.update_layout(xaxis_rangeslider_visible=False, template="plotly_dark")
+    return fig.to_plotly_json()
+
+
+def analyse_ticker(ticker, timings, model):
+    """Parcours complet d'une analyse, chaque étape étant ajoutée à `timings`."""
+    def timed(stage, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+        return result
+
+    results = timed("fetch", lambda: dict(fetch_ticker_sources(ticker)))
+    _, info = results["validity"]
+    metrics = CompanyMetrics.from_sources(ticker, info, results["advanced"])
+    score = timed("calculate_financial_score", calculate_financial_score, metrics)
+    ai_summary = timed("ai_analysis", generate_ai_analysis, metrics, model)
+    financials, balance_sheet, cash_flow = results["statements"]
+    timed("generate_excel_report", generate_excel_report, financials, balance_sheet, cash_flow, results["history"])
+    timed("generate_professional_pdf", generate_professional_pdf, metrics, score, ai_summary,
+          results["history"], results["dividends"], results["statements"])
+    timed("build_chart", build_chart, results["history"])
+
+
+class PeakMemory:
+    """Pic mémoire (Mo) des allocations Python d'un bloc, mesuré avec tracemalloc."""
+
+    mb = 0.0
+
+    def __enter__(self):
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        return False
+
+
+def scenario_single(tickers, iterations, model, warm, memory):
+    timings = {}
+    for i in range(iterations):
+        if not warm:
+            reset_caches()
+        # Dernière itération sous tracemalloc, hors durées (sauf s'il n'y en a qu'une)
+        traced = i == iterations - 1
+        stage_timings = {} if traced and iterations > 1 else timings
+        with memory if traced else nullcontext():
+            started = time.perf_counter()
+            analyse_ticker(tickers[i % len(tickers)], stage_timings, model)
+            stage_timings.setdefault("total", []).append(time.perf_counter() - started)
+    return timings
+
+
+def scenario_batch(tickers, batch_size, model, memory, workers=8):
+    timings = {}
+    universe = [tickers[i % len(tickers)] if i < len(tickers) else f"T{i:04d}" for i in range(batch_size)]
+    reset_caches()
+    with memory:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(lambda t: dict(fetch_ticker_sources(t))["validity"][1], universe))
+        timings["fetch"] = [time.perf_counter() - started]
+
+        metrics = pd.DataFrame([CompanyMetrics.from_yfinance(t, r).to_dict(SCORE_COLUMNS) for t, r in zip(universe, rows)], index=universe)
+        started = time.perf_counter()
+        calculate_financial_scores(metrics)
+        timings["calculate_financial_scores"] = [time.perf_counter() - started]
+    timings["total"] = [sum(v[0] for v in timings.values())]
+    return timings
+
+
+def scenario_pdf(tickers, iterations, memory):
+    """
+    Rapport PDF complet avec WeasyPrint : moteur (gabarit, feuille de style, polices) et graphiques
+    recréés pour chaque rapport, comme avant report_engine, puis moteur partagé et graphiques en
+    cache ; le PDF simple FPDF sert de référence.
+    """
+    timings = {}
+    reports = []
+    for ticker in tickers[:max(1, iterations)]:
+        results = dict(fetch_ticker_sources(ticker))
+        metrics = CompanyMetrics.from_sources(ticker, results["validity"][1], results["advanced"])
+        reports.append((metrics, calculate_financial_score(metrics), fixtures.AI_TEXT,
+                        results["history"], results["dividends"], results["statements"]))
+
+    def timed(stage, func, *args):
+        started = time.perf_counter()
+        func(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+    with memory:
+        for i in range(iterations):
+            report = reports[i % len(reports)]
+            report_engine._charts.clear()
+            timed("moteur recréé", lambda: report_engine.ReportEngine().render_pdf(*report))
+            timed("moteur partagé", lambda: report_engine.get_report_engine().render_pdf(*report))
+            timed("PDF simple (FPDF)", generate_basic_pdf, *report[:3])
+    return timings
+
+
+def scenario_router(iterations, memory, warmup=20):
+    """
+    Routeur de fournisseurs avec des substituts : un fournisseur prioritaire dont un appel sur 16
+    durent 3 s, appelé seul puis doublé par un second fournisseur ; enfin un fournisseur en panne,
+    dont le disjoncteur doit s'ouvrir puis se rouvrir après un appel d'essai raté.
+    """
+    with memory:
+        return _router_timings(max(iterations, 50), warmup)
+
+
+def _router_timings(calls, warmup):
+    timings = {}
+
+    def timed(stage, func):
+        started = time.perf_counter()
+        func("BENCH")
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+    primary = fixtures.StandInProvider("primaire", 0.1, slow_latency=3.0, slow_every=16, seed=1)
+    for _ in range(calls):
+        timed("primaire seul", primary.fetch)
+
+    primary = fixtures.StandInProvider("primaire", 0.1, slow_latency=3.0, slow_every=16, seed=1)
+    router = providers.ProviderRouter([primary, fixtures.StandInProvider("secours", 0.03, seed=2)])
+    for _ in range(warmup):
+        router.fetch("BENCH")
+    for _ in range(calls):
+        timed("routeur (secours)", router.fetch)
+
+    failing = fixtures.StandInProvider("en panne", 0.01, failing=True)
+    router = providers.ProviderRouter([failing, fixtures.StandInProvider("secours", 0.03, seed=2)])
+    for _ in range(providers.FAILURE_THRESHOLD):
+        timed("routeur (primaire en panne)", router.fetch)
+    health = router.health["en panne"]
+    opened = health.state()
+    # Fin de coupure simulée : l'appel suivant est l'essai, qui échoue
+    health.opened_until = time.monotonic()
+    timed("routeur (primaire en panne)", router.fetch)
+    print(f"[routeur] disjoncteur après {providers.FAILURE_THRESHOLD} échecs : {opened} ; "
+          f"après l'essai raté : {health.state()} pour {health.open_seconds} s")
+    return timings
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def print_report(report):
+    for name, scenario in report["scenarios"].items():
+        print(f"\n=== {name} (pic mémoire : {scenario['peak_memory_mb']:.1f} Mo) ===")
+        print(f"{'étape':<28}{'n':>5}{'moy.':>10}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for stage, stats in scenario["stages"].items():
+            print(f"{stage:<28}{stats['n']:>5}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}"
+                  f"{stats['p90_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+    print("\n(durées en millisecondes)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne de FinAnalyse Pro.")
+    parser.add_argument("--tickers", nargs="+", default=DEFAULT_TICKERS)
+    parser.add_argument("--iterations", type=int, default=20, help="Analyses par scénario mono-ticker")
+    parser.add_argument("--batch-size", type=int, default=100, help="Tickers du scénario par lot")
+    parser.add_argument("--json", help="Écrit aussi les résultats dans ce fichier JSON")
+    parser.add_argument("--record", nargs="+", metavar="TICKER", help="Enregistre les vraies réponses de ces tickers puis quitte")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        for ticker in args.record:
+            fixtures.record(ticker)
+            print(f"[OK] fixture enregistrée pour {ticker.upper()}")
+        return 0
+
+    fixtures.install()
+    model = fixtures.FixtureModel()
+    for ticker in args.tickers:
+        fixtures.load_fixture(ticker)
+
+    scenarios = {
+        "mono-ticker (cache froid)": lambda memory: scenario_single(args.tickers, args.iterations, model, False, memory),
+        "mono-ticker (cache chaud)": lambda memory: scenario_single(args.tickers, args.iterations, model, True, memory),
+        f"lot de {args.batch_size} tickers": lambda memory: scenario_batch(args.tickers, args.batch_size, model, memory),
+        "routeur de fournisseurs": lambda memory: scenario_router(args.iterations, memory),
+    }
+    # Le chemin WeasyPrint n'est mesuré que là où ses bibliothèques système (Pango) sont installées
+    if report_engine.get_report_engine() is not None:
+        scenarios["rapport PDF (WeasyPrint)"] = lambda memory: scenario_pdf(args.tickers, args.iterations, memory)
+    else:
+        print("[benchmarks] WeasyPrint indisponible : scénario « rapport PDF (WeasyPrint) » ignoré")
+    report = {"python": sys.version.split()[0], "scenarios": {}}
+    try:
+        for name, run in scenarios.items():
+            memory = PeakMemory()
+            timings = run(memory)
+            report["scenarios"][name] = {
+                "stages": {stage: percentiles(samples) for stage, samples in timings.items()},
+                "peak_memory_mb": memory.mb,
+            }
+    finally:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# cache.py
+# Cache persistant partagé entre processus, en remplacement de @st.cache_data.
+# Les valeurs sont stockées compressées dans une base SQLite sur disque : elles
+# survivent aux redémarrages et sont partagées par tous les workers du serveur.
+
+import abc
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from instrumentation import record_cache
+
+CACHE_PATH = os.getenv(
+    "FINANALYSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "finanalyse_cache.sqlite"),
+)
+CACHE_MAX_BYTES = int(float(os.getenv("FINANALYSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+class CacheBackend(abc.ABC):
+    """Interface d'un backend de cache. `get` renvoie (valeur, date de création) ou None."""
+
+    @abc.abstractmethod
+    def get(self, key):
+        ...
+
+    @abc.abstractmethod
+    def set(self, key, value, namespace):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key):
+        ...
+
+    @abc.abstractmethod
+    def clear(self, namespace=None):
+        ...
+
+
+class SQLiteCache(CacheBackend):
+    """Backend SQLite avec compression zlib et éviction LRU bornée en taille."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, compress_level=6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload BLOB NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_namespace ON entries (namespace)")
+
+    def _connection(self):
+        # Une connexion par thread ; le mode WAL permet des lectures concurrentes entre processus
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute("SELECT payload, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            value = pickle.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            print(f"[Cache] Entrée illisible ignorée : {e}")
+            return None
+        with conn:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return value, row[1]
+
+    def set(self, key, value, namespace):
+        try:
+            payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), self.compress_level)
+        except Exception as e:
+            print(f"[Cache] Valeur non sérialisable pour {namespace} : {e}")
+            return
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, created_at, accessed_at, size, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, now, now, len(payload), sqlite3.Binary(payload)),
+            )
+            self._evict(conn)
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            to_delete.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def clear(self, namespace=None):
+        with self._connection() as conn:
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+
+_default_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_default_backend():
+    """Backend partagé par tout le processus, créé à la première utilisation."""
+    global _default_backend
+    with _backend_lock:
+        if _default_backend is None:
+            _default_backend = SQLiteCache()
+        return _default_backend
+
+
+def set_default_backend(backend):
+    """Permet de brancher un autre backend (tests, stockage réseau...)."""
+    global _default_backend
+    with _backend_lock:
+        _default_backend = backend
+
+
+def make_key(namespace, args, kwargs):
+    raw = repr((namespace, args, sorted(kwargs.items())))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_in_background(store, key, namespace, func, args, kwargs, cache_if=None):
+    """Recalcule une entrée périmée sans bloquer l'appelant (une seule fois par clé)."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    # Le fetcher peut appeler st.* (avertissements, st.cache_data) : le thread reprend le contexte de la session
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    def refresh():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            value = func(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                store.set(key, value, namespace)
+        except Exception as e:
+            print(f"[Cache] Échec du rafraîchissement de {namespace} : {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def persistent_cache(ttl, stale_ttl=None, backend=None, cache_if=None):
+    """
+    Décorateur équivalent à @st.cache_data(ttl=...) mais persistant sur disque.
+    Une entrée plus vieille que `ttl` mais de moins de `ttl + stale_ttl` secondes est
+    servie immédiatement pendant qu'elle est recalculée en arrière-plan.
+    Par défaut, stale_ttl vaut ttl. Si `cache_if` est fourni, seules les valeurs pour
+    lesquelles il renvoie vrai sont enregistrées (les autres sont recalculées à chaque appel).
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+
+    def decorator(func):
+        namespace = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = backend or get_default_backend()
+            key = make_key(namespace, args, kwargs)
+            entry = store.get(key)
+            if entry is not None:
+                value, created_at = entry
+                age = time.time() - created_at
+                if age < ttl:
+                    record_cache(namespace, "hit")
+                    return value
+                if age < ttl + stale_ttl:
+                    record_cache(namespace, "stale")
+                    _refresh_in_background(store, key, namespace, func, args, kwargs, cache_if)
+                    return value
+            record_cache(namespace, "miss")
+            value = func(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                store.set(key, value, namespace)
+            return value
+
+        def is_fresh(*args, **kwargs):
+            """Vrai si une entrée de moins de `ttl` secondes existe pour ces arguments."""
+            entry = (backend or get_default_backend()).get(make_key(namespace, args, kwargs))
+            return entry is not None and time.time() - entry[1] < ttl
+
+        def prime(value, *args, **kwargs):
+            """Enregistre une valeur obtenue autrement (appel groupé...) comme résultat de ces arguments."""
+            if cache_if is None or cache_if(value):
+                (backend or get_default_backend()).set(make_key(namespace, args, kwargs), value, namespace)
+
+        wrapper.clear = lambda: (backend or get_default_backend()).clear(namespace)
+        wrapper.is_fresh = is_fresh
+        wrapper.prime = prime
+        return wrapper
+
+    return decorator
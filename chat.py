@@ -0,0 +1,123 @@
+# chat.py
+# Moteur de conversation du Chat AI : réponses diffusées au fil de l'eau, contexte
+# borné (les anciens échanges sont résumés), cache des questions répétées et
+# historique d'affichage de taille fixe.
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_default_backend, make_key
+from instrumentation import track
+
+# Nombre de messages récents envoyés tels quels au modèle
+MAX_RECENT_MESSAGES = 10
+# Nombre de messages conservés pour l'affichage dans la session
+DISPLAY_LIMIT = 50
+# Au-delà de cette taille (en caractères), le résumé est lui-même condensé
+MAX_SUMMARY_CHARS = 2000
+RESPONSE_CACHE_TTL = 86400
+
+SYSTEM_PROMPT = (
+    "Tu es FinAnalyse AI, un assistant spécialisé en finance pour des investisseurs particuliers. "
+    "Réponds en français, de façon claire et factuelle, sans donner de conseil d'investissement."
+)
+
+_summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+
+
+def _normalize(question):
+    return " ".join(question.lower().split())
+
+
+class ChatEngine:
+    """Conversation avec le modèle Gemini, à mémoire bornée quelle que soit sa longueur."""
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.summary = ""
+        self.recent = []
+        self.display = deque(maxlen=DISPLAY_LIMIT)
+        self.hidden_count = 0
+        self._lock = threading.Lock()
+
+    def _contents(self, prompt):
+        """Messages envoyés au modèle : consigne, résumé des anciens échanges, échanges récents, question."""
+        # Copie sous verrou : le résumé en arrière-plan réécrit `summary` et `recent`
+        with self._lock:
+            summary, recent = self.summary, list(self.recent)
+        preamble = SYSTEM_PROMPT
+        if summary:
+            preamble += f"\n\nRésumé de la conversation jusqu'ici :\n{summary}"
+        contents = [
+            {"role": "user", "parts": [preamble]},
+            {"role": "model", "parts": ["Compris."]},
+        ]
+        contents += [{"role": m["role"], "parts": [m["content"]]} for m in recent]
+        contents.append({"role": "user", "parts": [prompt]})
+        return contents
+
+    def _cache_key(self, prompt):
+        return make_key("chat", (self.model_name, _normalize(prompt)), {})
+
+    def add_message(self, role, content):
+        """Ajoute un message à l'historique affiché (les plus anciens sont retirés)."""
+        if len(self.display) == self.display.maxlen:
+            self.hidden_count += 1
+        self.display.append({"role": role, "content": content})
+
+    def stream_reply(self, prompt):
+        """Diffuse la réponse morceau par morceau, puis l'enregistre dans le contexte."""
+        self.add_message("user", prompt)
+        # Une question posée en début de conversation ne dépend d'aucun contexte : sa réponse est réutilisable
+        with self._lock:
+            context_free = not self.recent and not self.summary
+        store = get_default_backend()
+        cached = store.get(self._cache_key(prompt)) if context_free else None
+
+        if cached is not None and time.time() - cached[1] < RESPONSE_CACHE_TTL:
+            reply = cached[0]
+            yield reply
+        else:
+            chunks = []
+            try:
+                contents = self._contents(prompt)
+                with track("external", "gemini"):
+                    for chunk in self.model.generate_content(contents, stream=True):
+                        chunks.append(chunk.text)
+                        yield chunk.text
+                reply = "".join(chunks)
+                if context_free:
+                    store.set(self._cache_key(prompt), reply, "chat")
+            except Exception as e:
+                reply = "".join(chunks) + f"\n\nUne erreur est survenue : {e}"
+                yield f"\n\nUne erreur est survenue : {e}"
+
+        self.add_message("assistant", reply)
+        with self._lock:
+            self.recent += [{"role": "user", "content": prompt}, {"role": "model", "content": reply}]
+            overflow = len(self.recent) - MAX_RECENT_MESSAGES
+            if overflow > 0:
+                old, self.recent = self.recent[:overflow], self.recent[overflow:]
+                _summarizer.submit(self._fold_into_summary, old)
+
+    def _fold_into_summary(self, messages):
+        """Intègre des échanges sortis de la fenêtre de contexte dans le résumé (en arrière-plan)."""
+        transcript = "\n".join(f"{'Utilisateur' if m['role'] == 'user' else 'Assistant'} : {m['content']}" for m in messages)
+        with self._lock:
+            previous = self.summary
+        prompt = (
+            f"Mets à jour ce résumé de conversation en moins de {MAX_SUMMARY_CHARS // 2} caractères, "
+            f"en gardant les faits, chiffres et tickers mentionnés.\n\nRésumé actuel :\n{previous or '(vide)'}"
+            f"\n\nNouveaux échanges :\n{transcript}"
+        )
+        try:
+            with track("external", "gemini"):
+                summary = self.model.generate_content(prompt).text.strip()
+        except Exception as e:
+            print(f"[Chat] Échec du résumé : {e}")
+            summary = f"{previous}\n{transcript}"
+        with self._lock:
+            self.summary = summary[-MAX_SUMMARY_CHARS:]
@@ -0,0 +1,101 @@
+# company_metrics.py
+# Fiche compacte des métriques d'une entreprise, utilisée par le score, l'analyse IA et les exports.
+#
+# Plutôt que de fusionner tout le dictionnaire `info` de yfinance (souvent plus de 150 clés)
+# avec les données d'Alpha Vantage, on ne garde que les champs dont l'application se sert,
+# avec une correspondance explicite pour chaque fournisseur et des unités homogènes :
+#   - roe, netMargin, dividendYield : fractions (0.25 = 25 %) ;
+#   - debtToEquity : en pourcentage, comme yfinance (150 = dette égale à 1,5 fois les capitaux propres).
+
+import math
+from dataclasses import dataclass, fields
+
+
+def _number(value, zero_is_missing=False):
+    """Convertit une valeur de fournisseur en float ; None pour une valeur absente ou invalide."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(number) or math.isinf(number) or (zero_is_missing and number == 0):
+        return None
+    return number
+
+
+@dataclass(slots=True)
+class CompanyMetrics:
+    symbol: str
+    name: str | None = None
+    price: float | None = None
+    marketCap: float | None = None
+    peRatio: float | None = None
+    roe: float | None = None
+    netMargin: float | None = None
+    debtToEquity: float | None = None
+    revenue: float | None = None
+    dividendYield: float | None = None
+    beta: float | None = None
+    sector: str | None = None
+    country: str | None = None
+    description: str | None = None
+
+    @classmethod
+    def from_yfinance(cls, symbol, info):
+        """Correspondance depuis le dictionnaire `info` de yfinance."""
+        info = info or {}
+        dividend_yield = _number(info.get("dividendYield"))
+        return cls(
+            symbol=symbol,
+            name=info.get("longName") or info.get("shortName"),
+            price=_number(info.get("currentPrice") or info.get("regularMarketPrice") or info.get("previousClose")),
+            marketCap=_number(info.get("marketCap")),
+            peRatio=_number(info.get("trailingPE")),
+            roe=_number(info.get("returnOnEquity")),
+            netMargin=_number(info.get("profitMargins")),
+            debtToEquity=_number(info.get("debtToEquity")),
+            revenue=_number(info.get("totalRevenue")),
+            # yfinance renvoie désormais le rendement en pourcentage (0.45 pour 0,45 %)
+            dividendYield=dividend_yield / 100 if dividend_yield is not None else None,
+            beta=_number(info.get("beta")),
+            sector=info.get("sector"),
+            country=info.get("country"),
+            description=info.get("longBusinessSummary"),
+        )
+
+    @classmethod
+    def from_alpha_vantage(cls, symbol, advanced):
+        """Correspondance depuis le résultat de `get_advanced_metrics` (0 y signifie « non renseigné »)."""
+        advanced = advanced or {}
+        debt_to_equity = _number(advanced.get("debtToEquity"), zero_is_missing=True)
+        return cls(
+            symbol=symbol,
+            marketCap=_number(advanced.get("marketCap"), zero_is_missing=True),
+            peRatio=_number(advanced.get("peRatio"), zero_is_missing=True),
+            roe=_number(advanced.get("returnOnEquity"), zero_is_missing=True),
+            # Alpha Vantage donne un ratio (1.5), ramené en pourcentage comme yfinance
+            debtToEquity=debt_to_equity * 100 if debt_to_equity is not None else None,
+            revenue=_number(advanced.get("revenue"), zero_is_missing=True),
+            dividendYield=_number(advanced.get("dividendYield"), zero_is_missing=True),
+            beta=_number(advanced.get("beta")),
+            sector=advanced.get("sector") or None,
+            country=advanced.get("country") or None,
+            description=advanced.get("description") or None,
+        )
+
+    @classmethod
+    def from_sources(cls, symbol, info, advanced):
+        """Fiche complète : les valeurs d'Alpha Vantage priment, yfinance complète les champs manquants."""
+        metrics = cls.from_yfinance(symbol, info)
+        overlay = cls.from_alpha_vantage(symbol, advanced)
+        for name in cls.__slots__:
+            value = getattr(overlay, name)
+            if value is not None:
+                setattr(metrics, name, value)
+        if metrics.name is None:
+            metrics.name = symbol
+        return metrics
+
+    def to_dict(self, names=None):
+        return {name: getattr(self, name) for name in (names or [f.name for f in fields(self)])}
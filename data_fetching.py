@@ -1,183 +1,65 @@
-import yfinance as yf
-import pandas as pd
-import requests
-import streamlit as st
-from datetime import datetime
-import re
-from bs4 import BeautifulSoup
-import requests
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-FMP_API_KEY = os.getenv("FMP_API_KEY")
-ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-
-
-# Paste this new function where the old ones were
 # data_fetching.py
+# Points d'accès aux données d'un ticker (yfinance, Alpha Vantage, Zone Bourse) et
+# récupération parallèle de toutes ses sources.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-# --- IMPORTS NÉCESSAIRES AU DÉBUT DU FICHIER ---
-import yfinance as yf
 import pandas as pd
-import requests
 import streamlit as st
-from datetime import datetime
-import re
-from bs4 import BeautifulSoup
-import os
+from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from cache import persistent_cache
+from instrumentation import instrumented
+from price_store import get_price_store, period_start
+from providers import get_router
+from statements_store import get_statements_store
+from ticker_snapshot import get_snapshot
+import zonebourse
 
-# --- Assurez-vous que les clés sont chargées ---
 load_dotenv()
 FMP_API_KEY = os.getenv("FMP_API_KEY")
-# NOUVELLE LIGNE : Charger la clé Alpha Vantage
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
+# Indice de référence pour le bêta et la comparaison des performances
+BENCHMARK_TICKER = os.getenv("BENCHMARK_TICKER", "^GSPC")
 
 
-# NOUVELLE VERSION AMÉLIORÉE - À COLLER DANS data_fetching.py
-
-@st.cache_data(ttl=3600)
+@instrumented("fetch")
+@persistent_cache(ttl=3600, cache_if=lambda data: get_router().is_complete(data))
 def get_advanced_metrics(ticker):
     """
-    Récupère des métriques financières avancées depuis Alpha Vantage et yfinance,
-    et calcule le ROI.
+    Récupère les métriques financières avancées via le routeur de fournisseurs
+    (Alpha Vantage en priorité, puis yfinance et FMP) : un fournisseur lent est doublé
+    par le suivant, un fournisseur en échec est écarté, et les champs sont fusionnés.
+    Seul un enregistrement contenant la réponse du fournisseur prioritaire est mis en cache.
     ATTENTION : Le plan gratuit d'Alpha Vantage est limité à 25 appels par jour.
     """
-    data = {}
-    
-    # --- 1. Données fondamentales d'Alpha Vantage ---
-    try:
-        # Appel 1: Vue d'ensemble de l'entreprise
-        overview_url = f'https://www.alphavantage.co/query?function=OVERVIEW&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}'
-        r = requests.get(overview_url)
-        overview_data = r.json()
-        
-        net_income = 0 # Initialisation pour le calcul du ROI plus tard
-
-        if overview_data and 'Note' not in overview_data:
-            net_income = float(overview_data.get('NetIncomeTTM', 0)) # *** NOUVEAU : On stocke le Net Income
-            data.update({
-                "marketCap": float(overview_data.get('MarketCapitalization', 0)),
-                "ebitda": float(overview_data.get('EBITDA', 0)),
-                "peRatio": float(overview_data.get('PERatio', 0)) if overview_data.get('PERatio') != 'None' else 0,
-                "forwardPE": float(overview_data.get('ForwardPE', 0)) if overview_data.get('ForwardPE') != 'None' else 0,
-                "beta": float(overview_data.get('Beta', 0)) if overview_data.get('Beta') != 'None' else None,
-                "dividendYield": float(overview_data.get('DividendYield', 0)),
-                "revenue": float(overview_data.get('RevenueTTM', 0)),
-                "returnOnEquity": float(overview_data.get('ReturnOnEquityTTM', 0)),
-                "returnOnAssets": float(overview_data.get('ReturnOnAssetsTTM', 0)),
-                "revenueGrowth": float(overview_data.get('QuarterlyRevenueGrowthYOY', 0)),
-                "earningsGrowth": float(overview_data.get('QuarterlyEarningsGrowthYOY', 0)),
-                "priceToBook": float(overview_data.get('PriceToBookRatio', 0)) if overview_data.get('PriceToBookRatio') != 'None' else None,
-                "fullTimeEmployees": int(overview_data.get('FullTimeEmployees', 0)) if overview_data.get('FullTimeEmployees', 0) != 'None' else 0,
-                "description": overview_data.get('Description'),
-                "sector": overview_data.get('Sector'),
-                "country": overview_data.get('Country'),
-            })
-
-        # Appel 2: Bilan pour la dette et les capitaux propres
-        balance_url = f'https://www.alphavantage.co/query?function=BALANCE_SHEET&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}'
-        r = requests.get(balance_url)
-        balance_data = r.json()
-        
-        cost_of_investment = 0 # Initialisation
-
-        if balance_data and 'annualReports' in balance_data and balance_data['annualReports']:
-            latest_report = balance_data['annualReports'][0]
-            total_debt = float(latest_report.get('longTermDebt', 0)) + float(latest_report.get('shortTermDebt', 0))
-            equity = float(latest_report.get('totalShareholderEquity', 1)) 
-            data['totalDebt'] = total_debt
-            data['debtToEquity'] = (total_debt / equity) if equity != 0 else 0
-            
-            # *** NOUVEAU : On calcule le coût de l'investissement pour le ROI
-            cost_of_investment = total_debt + equity
-
-        # *** NOUVEAU : Calcul et ajout du ROI au dictionnaire de données
-        if cost_of_investment > 0:
-            roi = net_income / cost_of_investment
-            data['returnOnInvestment'] = roi # On ajoute le ROI ici
-        else:
-            data['returnOnInvestment'] = 0
-
-
-        # Appel 3: Flux de trésorerie
-        cashflow_url = f'https://www.alphavantage.co/query?function=CASH_FLOW&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}'
-        r = requests.get(cashflow_url)
-        cashflow_data = r.json()
-
-        if cashflow_data and 'annualReports' in cashflow_data and cashflow_data['annualReports']:
-            latest_report = cashflow_data['annualReports'][0]
-            data['operatingCashFlow'] = float(latest_report.get('operatingCashflow', 0))
-            fcf = float(latest_report.get('operatingCashflow', 0)) - float(latest_report.get('capitalExpenditures', 0))
-            data['freeCashFlow'] = fcf
+    data = get_router().fetch(ticker)
+    if not data:
+        st.warning("Les données fondamentales n'ont pu être chargées depuis aucun fournisseur.")
+    return data
 
-    except Exception as e:
-        print(f"[Erreur Alpha Vantage] : {e}")
-        st.warning("Certaines données n'ont pas pu être chargées depuis Alpha Vantage. Limite d'API atteinte ?")
 
-    # --- 2. Complément avec yfinance (au cas où) ---
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        if 'beta' not in data or data['beta'] is None:
-            data['beta'] = info.get('beta')
-    except Exception as e:
-        print(f"[Erreur yfinance] : {e}")
-
-    return data
-# def get_advanced_metrics(ticker):
-#     try:
-#         url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={FMP_API_KEY}"
-#         response = requests.get(url)
-
-#         if response.status_code != 200:
-#             return {}
-
-#         profile_data = response.json()
-#         if not profile_data or not isinstance(profile_data, list):
-#             return {}
-
-#         data = profile_data[0]  # ✅ ici on définit "data"
-
-#         return {
-#             "operatingCashFlow": data.get("operatingCashFlow"),
-#             "freeCashFlow": data.get("freeCashFlow"),
-#             "totalDebt": data.get("totalDebt"),
-#             "debtToEquity": data.get("debtToEquity"),
-#             "revenueGrowth": data.get("revenueGrowth"),
-#             "earningsGrowth": data.get("earningsGrowth"),
-#             "returnOnAssets": data.get("returnOnAssets"),
-#             "returnOnEquity": data.get("returnOnEquity"),
-#             "returnOnInvestment": data.get("returnOnInvestment"),
-#             "ebitda": data.get("ebitda"),
-#             "fullTimeEmployees": data.get("fullTimeEmployees"),
-#             "sector": data.get("sector"),
-#             "country": data.get("country"),
-#             "description": data.get("description") or data.get("longBusinessSummary"),
-#         }
-
-#     except Exception as e:
-#         print(f"[Erreur] get_advanced_metrics : {e}")
-#         return {}
-
-
-@st.cache_data(ttl=3600)
+@instrumented("fetch")
+@persistent_cache(ttl=3600)
 def check_ticker_validity(ticker):
     """Vérifie si un ticker est valide et retourne ses informations de base."""
-    stock = yf.Ticker(ticker)
-    if stock.history(period="1d").empty:
+    snapshot = get_snapshot(ticker)
+    if snapshot.last_day.empty:
         return False, None
-    info = stock.info
+    info = snapshot.info
     if 'currentPrice' not in info or info['currentPrice'] is None:
         return False, None
     return True, info
 
-@st.cache_data(ttl=3600)
+@instrumented("fetch")
+@persistent_cache(ttl=3600)
 def get_stock_info(ticker):
     """Récupère les informations générales d'un ticker."""
-    return yf.Ticker(ticker.upper()).info
-
-@st.cache_data(ttl=3600)
+    return get_snapshot(ticker).info
 
 # def get_advanced_metrics(ticker):
 #     """Récupère des métriques financières avancées."""
@@ -200,50 +82,143 @@ def get_stock_info(ticker):
 # }
         
     
-@st.cache_data(ttl=86400)
-def get_historical_data(ticker):
-    """Récupère l'historique des prix sur 1 an."""
-    return yf.Ticker(ticker.upper()).history(period="1y")
+@instrumented("fetch")
+def get_historical_data(ticker, period="1y", interval="1d"):
+    """
+    Récupère l'historique des prix (1 an par défaut) depuis le magasin local,
+    qui ne télécharge que les barres manquantes depuis la dernière mise à jour.
+    """
+    return get_price_store().get(ticker, period=period, interval=interval)
 
-@st.cache_data(ttl=86400)
+@instrumented("fetch")
 def get_dividend_data(ticker):
     """Récupère les dividendes des 5 dernières années et les somme par an."""
-    dividends = yf.Ticker(ticker.upper()).dividends.last('5Y')
+    return annual_dividends(get_historical_data(ticker, period="5y"))
+
+def annual_dividends(history):
+    """Somme par an des dividendes d'un historique de prix."""
+    if history.empty or 'Dividends' not in history:
+        return pd.Series(dtype='float64')
+    dividends = history['Dividends']
+    dividends = dividends[dividends > 0]
     return dividends.resample('YE').sum() if not dividends.empty else pd.Series(dtype='float64')
 
-TICKER_TO_ZB_URL_NAME = {
-    "AAPL": "APPLE-INC-4849", "MSFT": "MICROSOFT-CORPORATION-4835",
-    "GOOGL": "ALPHABET-INC-62394", "META": "META-PLATFORMS-INC-10547341",
-    "LVMH": "LVMH-MOET-HENNESSY-LOUIS-4669",
-    "TTE": "TOTALENERGIES-SE-4716"  # <-- Ajout de la nouvelle valeur
-}
-
-@st.cache_data(ttl=86400)
+@instrumented("fetch")
+@persistent_cache(ttl=86400)
 def get_zonebourse_consensus(ticker):
     """Récupère le consensus des analystes sur Zone Bourse via web scraping."""
-    url_name = TICKER_TO_ZB_URL_NAME.get(ticker.upper())
-    if not url_name:
-        return "N/A"
-    url = f"https://www.zonebourse.com/cours/action/{url_name}/"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        consensus_element = soup.find("div", class_=re.compile(r'c-face-instrument__rating-text'))
-        return consensus_element.get_text(strip=True) if consensus_element else "Non trouvé"
-    except Exception:
-        return "Erreur"
+    return zonebourse.get_consensus(ticker)
+
+def prefetch_zonebourse_consensus(tickers, max_workers=8):
+    """
+    Consensus de plusieurs tickers récupérés en un lot (session partagée, concurrence bornée),
+    puis placés dans le cache de get_zonebourse_consensus. Seuls les tickers absents du cache sont demandés.
+    """
+    missing = [t for t in dict.fromkeys(tickers) if not get_zonebourse_consensus.is_fresh(t)]
+    if not missing:
+        return 0
+    consensus = zonebourse.get_consensus_batch(missing, max_workers=max_workers)
+    primed = 0
+    for ticker in missing:
+        value = consensus.get(ticker.upper())
+        if value is not None and value != "Erreur":
+            get_zonebourse_consensus.prime(value, ticker)
+            primed += 1
+    return primed
 
 # --- LA FONCTION QUE VOUS DEVEZ AVOIR ---
-@st.cache_data(ttl=1800) # Cache de 30 minutes
+@instrumented("fetch")
+@persistent_cache(ttl=1800) # Cache de 30 minutes
 def get_yfinance_news(ticker):
     """Récupère les actualités pour un ticker donné via yfinance."""
     try:
-        stock = yf.Ticker(ticker)
         # La méthode .news retourne une liste de dictionnaires
-        news = stock.news
+        news = get_snapshot(ticker).news
         return news if news else []
     except Exception as e:
         print(f"Erreur lors de la récupération des actualités yfinance : {e}")
-        return []
\ No newline at end of file
+        return []
+
+@instrumented("fetch")
+def get_financial_statements(ticker):
+    """
+    Compte de résultat, bilan et flux de trésorerie annuels, lus dans la base locale
+    (yfinance n'est interrogé que lorsqu'un nouvel exercice peut avoir été publié).
+    """
+    return get_statements_store().statements(ticker)
+
+# --- RÉCUPÉRATION PARALLÈLE DE TOUTES LES SOURCES D'UN TICKER ---
+# Délai maximal (en secondes) accordé à chaque source avant d'utiliser sa valeur par défaut
+SOURCE_TIMEOUTS = {
+    "validity": 15,
+    "advanced": 30,
+    "history": 20,
+    "dividends": 20,
+    "consensus": 15,
+    "news": 15,
+    "statements": 30,
+    "benchmark": 20,
+}
+
+def last_year(history):
+    """Dernière année d'un historique de prix."""
+    if history.empty:
+        return history
+    return history[history.index >= period_start("1y", pd.Timestamp.now(tz="UTC"))]
+
+def fetch_ticker_sources(ticker, timeouts=None):
+    """
+    Lance en parallèle tous les appels réseau indépendants d'un ticker et
+    renvoie les couples (source, résultat) au fur et à mesure de leur arrivée.
+    Une source en erreur ou qui dépasse son délai renvoie sa valeur par défaut,
+    la latence totale est donc bornée par la source la plus lente.
+    """
+    timeouts = {**SOURCE_TIMEOUTS, **(timeouts or {})}
+    empty_statements = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+    sources = {
+        "validity": (check_ticker_validity, (False, None)),
+        "advanced": (get_advanced_metrics, {}),
+        "history": (lambda _: last_year(prices.result()), pd.DataFrame()),
+        "dividends": (lambda _: annual_dividends(prices.result()), pd.Series(dtype='float64')),
+        "consensus": (get_zonebourse_consensus, "N/A"),
+        "news": (get_yfinance_news, []),
+        "statements": (get_financial_statements, empty_statements),
+        "benchmark": (lambda _: get_historical_data(BENCHMARK_TICKER), pd.DataFrame()),
+    }
+
+    # Les threads doivent partager le contexte Streamlit de la session (cache, st.warning...)
+    ctx = get_script_run_ctx()
+
+    def run(fetcher):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fetcher(ticker)
+
+    executor = ThreadPoolExecutor(max_workers=len(sources) + 1)
+    started = time.monotonic()
+    # Historique (1 an) et dividendes (5 ans) viennent d'une seule lecture du magasin de prix :
+    # deux lectures concurrentes du même ticker s'attendraient sur son verrou
+    prices = executor.submit(run, lambda t: get_historical_data(t, period="5y"))
+    pending = {executor.submit(run, fetcher): name for name, (fetcher, _) in sources.items()}
+    try:
+        while pending:
+            next_deadline = min(started + timeouts[name] for name in pending.values())
+            done, _ = wait(pending, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    yield name, future.result()
+                except Exception as e:
+                    print(f"[Erreur {name}] {ticker} : {e}")
+                    yield name, sources[name][1]
+
+            elapsed = time.monotonic() - started
+            for future, name in list(pending.items()):
+                if elapsed >= timeouts[name]:
+                    del pending[future]
+                    future.cancel()
+                    print(f"[Délai dépassé] {name} pour {ticker} après {timeouts[name]}s")
+                    yield name, sources[name][1]
+    finally:
+        # On n'attend pas les sources trop lentes : la page s'affiche sans elles
+        executor.shutdown(wait=False, cancel_futures=True)
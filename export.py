@@ -1,27 +1,161 @@
 # export.py (Version finale avec correction de l'encodage)
 
 import pandas as pd
+import hashlib
+import re
+import threading
+from collections import OrderedDict
 from io import BytesIO
 from datetime import date
 from fpdf import FPDF
+from openpyxl import Workbook
 
-# --- Fonction Excel (ne change pas) ---
+from instrumentation import instrumented
+from report_engine import get_report_engine
+
+# Nombre maximal de rapports gardés en mémoire (les plus anciens sont évincés)
+EXPORT_CACHE_SIZE = 32
+
+# --- Export Excel en flux ---
+# Les classeurs sont écrits ligne par ligne (openpyxl en mode write_only) : les DataFrames ne
+# sont jamais copiés, seules EXCEL_CHUNK_ROWS lignes à la fois sont converties en valeurs Python.
+EXCEL_CHUNK_ROWS = 10_000
+# Limite d'Excel : au-delà, les lignes continuent sur une feuille « (2) », « (3) »...
+EXCEL_MAX_ROWS = 1_048_576
+STATEMENT_SHEETS = ('Compte de Résultat', 'Bilan', 'Flux de Trésorerie')
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+def _sheet_title(title):
+    return re.sub(r'[\[\]:*?/\\]', '-', title)[:31]
+
+def _excel_values(values):
+    """Tableau NumPy -> valeurs Python, les NaN / NaT devenant des cellules vides."""
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[us]')
+    return [None if v != v else v for v in values.tolist()]
+
+def _excel_labels(index):
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.to_pydatetime()
+    return index.tolist()
+
+def _header_value(label):
+    return label.to_pydatetime().replace(tzinfo=None) if isinstance(label, pd.Timestamp) else label
+
+def _data_rows(frame, columns=None, prefix=(), chunk_rows=EXCEL_CHUNK_ROWS):
+    """Lignes (préfixe, index, colonnes...) d'un DataFrame, converties par blocs de `chunk_rows`."""
+    columns = list(frame.columns) if columns is None else columns
+    positions = [frame.columns.get_loc(c) if c in frame.columns else None for c in columns]
+    for start in range(0, len(frame), chunk_rows):
+        stop = min(start + chunk_rows, len(frame))
+        values = [
+            _excel_values(frame.iloc[start:stop, p].to_numpy()) if p is not None else [None] * (stop - start)
+            for p in positions
+        ]
+        for row in zip(_excel_labels(frame.index[start:stop]), *values):
+            yield [*prefix, *row]
+
+class _SheetWriter:
+    """Feuille write_only qui se prolonge sur une nouvelle feuille quand la limite d'Excel est atteinte."""
+
+    def __init__(self, workbook, title, header):
+        self.workbook, self.title, self.header = workbook, title, header
+        self.parts = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.parts += 1
+        suffix = f" ({self.parts})" if self.parts > 1 else ""
+        self.sheet = self.workbook.create_sheet(_sheet_title(self.title[:31 - len(suffix)] + suffix))
+        self.rows = 0
+        if self.header:
+            self.append(self.header)
+
+    def append(self, row):
+        if self.rows == EXCEL_MAX_ROWS:
+            self._new_sheet()
+        self.sheet.append(row)
+        self.rows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+def _frame_header(frame, index_label):
+    return [frame.index.name or index_label] + [_header_value(c) for c in frame.columns]
+
+def _save_workbook(workbook, target):
+    if not workbook.worksheets:
+        workbook.create_sheet('Rapport')
+    workbook.save(target)
+
+def write_excel_report(target, financials, balance_sheet, cash_flow, hist_data):
+    """Écrit le rapport d'un ticker (chemin ou fichier ouvert en binaire) sans copier les DataFrames."""
+    workbook = Workbook(write_only=True)
+    for title, statement in zip(STATEMENT_SHEETS, (financials, balance_sheet, cash_flow)):
+        if not statement.empty:
+            statement = statement.iloc[::-1]
+            _SheetWriter(workbook, title, _frame_header(statement, '')).extend(_data_rows(statement))
+    if not hist_data.empty:
+        _SheetWriter(workbook, 'Historique des Prix', _frame_header(hist_data, 'Date')).extend(_data_rows(hist_data))
+    _save_workbook(workbook, target)
+
+@instrumented("export")
 def generate_excel_report(financials, balance_sheet, cash_flow, hist_data):
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        if not financials.empty:
-            financials.iloc[::-1].to_excel(writer, sheet_name='Compte de Résultat')
-        if not balance_sheet.empty:
-            balance_sheet.iloc[::-1].to_excel(writer, sheet_name='Bilan')
-        if not cash_flow.empty:
-            cash_flow.iloc[::-1].to_excel(writer, sheet_name='Flux de Trésorerie')
-        if not hist_data.empty:
-            hist_data_local = hist_data.copy()
-            if hasattr(hist_data_local.index, 'tz') and hist_data_local.index.tz is not None:
-                hist_data_local.index = hist_data_local.index.tz_localize(None)
-            hist_data_local.to_excel(writer, sheet_name='Historique des Prix')
+    write_excel_report(output, financials, balance_sheet, cash_flow, hist_data)
     return output.getvalue()
 
+@instrumented("export")
+def write_multi_ticker_workbook(target, entries, layout='sheets'):
+    """
+    Classeur unique pour plusieurs tickers. `entries` est un itérable de
+    (ticker, (financials, balance_sheet, cash_flow), hist_data), consommé au fil de l'eau :
+    un générateur ne garde en mémoire que le ticker en cours d'écriture.
+    - layout 'sheets' : une feuille d'états financiers et une feuille de prix par ticker ;
+    - layout 'long' : deux feuilles au format long, (ticker, état, poste, période, valeur)
+      et (ticker, date, cours...), faciles à filtrer ou à charger dans un tableau croisé.
+    Renvoie la liste des tickers écrits.
+    """
+    if layout not in ('sheets', 'long'):
+        raise ValueError(f"Format de classeur inconnu : {layout}")
+    workbook = Workbook(write_only=True)
+    if layout == 'long':
+        statements_sheet = _SheetWriter(workbook, 'États financiers', ['Ticker', 'État', 'Poste', 'Période', 'Valeur'])
+        prices_sheet = _SheetWriter(workbook, 'Historique des Prix', ['Ticker', 'Date'] + PRICE_COLUMNS)
+
+    written = []
+    for ticker, statements, hist_data in entries:
+        if layout == 'long':
+            for title, statement in zip(STATEMENT_SHEETS, statements):
+                periods = [_header_value(c) for c in statement.columns]
+                for item, *values in _data_rows(statement.iloc[::-1]):
+                    statements_sheet.extend(
+                        [ticker, title, item, period, value]
+                        for period, value in zip(periods, values) if value is not None
+                    )
+            prices_sheet.extend(_data_rows(hist_data, columns=PRICE_COLUMNS, prefix=(ticker,)))
+        else:
+            statements_sheet = None
+            for title, statement in zip(STATEMENT_SHEETS, statements):
+                if statement.empty:
+                    continue
+                statement = statement.iloc[::-1]
+                if statements_sheet is None:
+                    statements_sheet = _SheetWriter(workbook, f"{ticker} - États", [])
+                else:
+                    statements_sheet.append([])
+                statements_sheet.append([title])
+                statements_sheet.append(_frame_header(statement, ''))
+                statements_sheet.extend(_data_rows(statement))
+            if not hist_data.empty:
+                _SheetWriter(workbook, f"{ticker} - Prix", _frame_header(hist_data, 'Date')).extend(_data_rows(hist_data))
+        written.append(ticker)
+    _save_workbook(workbook, target)
+    return written
+
 
 # --- Classe PDF (ne change pas) ---
 class PDF(FPDF):
@@ -55,29 +189,88 @@ class PDF(FPDF):
         self.cell(0, 8, str(value), border=1)
         self.ln()
 
-def generate_professional_pdf(full_data, score, ai_summary):
+@instrumented("export")
+def generate_professional_pdf(metrics, score, ai_summary, hist_data=None, dividends=None, statements=None):
+    """
+    Rapport PDF complet (gabarit HTML, graphiques des cours et des dividendes, états financiers).
+    Sans WeasyPrint utilisable, le rapport simple FPDF est produit à la place.
+    """
+    engine = get_report_engine()
+    if engine is not None:
+        return engine.render_pdf(metrics, score, ai_summary, hist_data, dividends, statements)
+    return generate_basic_pdf(metrics, score, ai_summary)
+
+def generate_basic_pdf(metrics, score, ai_summary):
     pdf = PDF()
     pdf.add_page()
     pdf.set_font('Helvetica', 'B', 20)
-    pdf.cell(0, 10, full_data.get('name', 'N/A'), 0, 1)
+    pdf.cell(0, 10, metrics.name or 'N/A', 0, 1)
     pdf.set_font('Helvetica', 'I', 14)
-    pdf.cell(0, 8, f"{full_data.get('symbol', 'N/A')} - Rapport du {date.today().strftime('%d/%m/%Y')}", 0, 1)
+    pdf.cell(0, 8, f"{metrics.symbol} - Rapport du {date.today().strftime('%d/%m/%Y')}", 0, 1)
     pdf.ln(10)
 
     pdf.chapter_title('Synthèse des Métriques Clés')
-    pdf.metric_box('Prix Actuel', f"${full_data.get('price', 0):.2f}")
+    pdf.metric_box('Prix Actuel', f"${metrics.price or 0:.2f}")
     pdf.metric_box('Score Financier', f"{score:.1f}/10")
-    pdf.metric_box('Capitalisation', f"${full_data.get('marketCap', 0) / 1e9:.2f} Mds")
-    pdf.metric_box('Ratio C/B (PE)', f"{full_data.get('peRatio', 0):.2f}")
-    pdf.metric_box('ROE', f"{full_data.get('returnOnEquity', 0) * 100:.2f}%")
+    pdf.metric_box('Capitalisation', f"${(metrics.marketCap or 0) / 1e9:.2f} Mds")
+    pdf.metric_box('Ratio C/B (PE)', f"{metrics.peRatio or 0:.2f}")
+    pdf.metric_box('ROE', f"{(metrics.roe or 0) * 100:.2f}%")
     pdf.ln(5)
 
     pdf.chapter_title("Analyse par l'IA (Gemini)")
     pdf.chapter_body(ai_summary)
 
     pdf.chapter_title("Description de l'entreprise")
-    pdf.chapter_body(full_data.get('description', 'Non disponible.'))
+    pdf.chapter_body(metrics.description or 'Non disponible.')
     
     # --- DÉBUT DE LA CORRECTION ---
     # On convertit explicitement le bytearray en bytes, le format attendu par Streamlit.
-    return bytes(pdf.output(dest='S'))
\ No newline at end of file
+    return bytes(pdf.output(dest='S'))
+
+# --- Génération paresseuse et mise en cache par contenu ---
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+def _fingerprint(*inputs):
+    """Empreinte SHA-256 des entrées d'un export (DataFrames, Series, valeurs simples)."""
+    digest = hashlib.sha256()
+    for value in inputs:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(repr((value.shape, columns)).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+def _cached_export(kind, inputs, build):
+    key = f"{kind}:{_fingerprint(*inputs)}"
+    with _export_cache_lock:
+        if key in _export_cache:
+            _export_cache.move_to_end(key)
+            return _export_cache[key]
+    content = build()
+    with _export_cache_lock:
+        _export_cache[key] = content
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return content
+
+def lazy_excel_report(financials, balance_sheet, cash_flow, hist_data):
+    """Renvoie une fonction sans argument qui ne génère le rapport Excel qu'au moment du téléchargement."""
+    inputs = (financials, balance_sheet, cash_flow, hist_data)
+    return lambda: _cached_export('excel', inputs, lambda: generate_excel_report(*inputs))
+
+def lazy_professional_pdf(metrics, score, ai_summary, hist_data=None, dividends=None, statements=None):
+    """
+    Renvoie une fonction sans argument qui ne génère le PDF qu'au moment du téléchargement.
+    `ai_summary` peut être un texte ou une fonction qui le renvoie (analyse encore en cours).
+    """
+    def build():
+        summary = ai_summary() if callable(ai_summary) else ai_summary
+        return _cached_export(
+            'pdf', (metrics, score, summary, hist_data, dividends, *(statements or ())),
+            lambda: generate_professional_pdf(metrics, score, summary, hist_data, dividends, statements),
+        )
+    return build
@@ -0,0 +1,328 @@
+# indicators.py
+# Indicateurs techniques calculés avec NumPy sur l'historique OHLCV : moyennes mobiles,
+# RSI, volatilité réalisée, drawdown maximal et bêta par rapport à un indice.
+#
+# - `compute_indicators` : séries complètes d'un ticker (graphiques) ;
+# - `latest_indicators` : dernières valeurs de nombreux tickers à la fois (tableaux 2D) ;
+# - `IndicatorState` : état glissant mis à jour en O(1) à chaque nouvelle barre ;
+# - `get_indicator_state` : états partagés du processus, complétés uniquement avec les
+#   barres ajoutées depuis leur dernière mise à jour.
+
+import copy
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_fetching import BENCHMARK_TICKER, get_historical_data
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_PERIOD = 14
+VOLATILITY_WINDOW = 20
+BETA_WINDOW = 252
+# Le drawdown maximal porte sur la dernière année de barres, dans le calcul par lot comme dans l'état glissant
+DRAWDOWN_WINDOW = 252
+TRADING_DAYS = 252
+# Colonnes produites par `latest_indicators` et `IndicatorState.snapshot`
+INDICATOR_COLUMNS = [f"sma{w}" for w in SMA_WINDOWS] + ["rsi", "volatility", "maxDrawdown", "beta", "trend"]
+MAX_STATES = 512
+
+
+# --- Calculs vectorisés (axe 0 = temps ; une colonne par ticker pour les tableaux 2D) ---
+
+def rolling_mean(values, window):
+    """Moyenne glissante par sommes cumulées ; NaN tant que la fenêtre n'est pas pleine."""
+    values = np.asarray(values, dtype="float64")
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(values, axis=0)
+        out[window - 1] = csum[window - 1]
+        out[window:] = csum[window:] - csum[:-window]
+        out[window - 1:] /= window
+    return out
+
+
+def rolling_std(values, window):
+    """Écart type glissant (ddof=1) à partir des sommes cumulées des valeurs et de leurs carrés."""
+    values = np.asarray(values, dtype="float64")
+    mean = rolling_mean(values, window)
+    mean_sq = rolling_mean(values * values, window)
+    return np.sqrt(np.clip(mean_sq - mean * mean, 0, None) * window / (window - 1))
+
+
+def _rsi_value(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def rsi(close, period=RSI_PERIOD):
+    """RSI de Wilder. Le lissage est récursif : la boucle porte sur le temps, chaque pas traite tous les tickers."""
+    close = np.asarray(close, dtype="float64")
+    out = np.full(close.shape, np.nan)
+    if len(close) <= period:
+        return out
+    delta = np.nan_to_num(np.diff(close, axis=0))
+    gain, loss = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+    avg_gain, avg_loss = gain[:period].mean(axis=0), loss[:period].mean(axis=0)
+    out[period] = _rsi_value(avg_gain, avg_loss)
+    for i in range(period, len(delta)):
+        avg_gain = (avg_gain * (period - 1) + gain[i]) / period
+        avg_loss = (avg_loss * (period - 1) + loss[i]) / period
+        out[i + 1] = _rsi_value(avg_gain, avg_loss)
+    return out
+
+
+def log_returns(close):
+    close = np.asarray(close, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(close), axis=0)
+
+
+def drawdown(close):
+    """Baisse depuis le plus haut atteint jusque-là (0 au plus haut, -0.3 pour une baisse de 30 %)."""
+    close = np.asarray(close, dtype="float64")
+    return close / np.fmax.accumulate(close, axis=0) - 1
+
+
+def beta(returns, index_returns):
+    """Bêta de chaque colonne de `returns` par rapport à `index_returns` (paires incomplètes ignorées)."""
+    returns = np.asarray(returns, dtype="float64")
+    market = np.asarray(index_returns, dtype="float64").reshape(len(index_returns), *([1] * (returns.ndim - 1)))
+    valid = ~np.isnan(returns) & ~np.isnan(market)
+    count = valid.sum(axis=0)
+    r, m = np.where(valid, returns, 0), np.where(valid, market, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_r, mean_m = r.sum(axis=0) / count, m.sum(axis=0) / count
+        cov = (r * m).sum(axis=0) / count - mean_r * mean_m
+        var = (m * m).sum(axis=0) / count - mean_m * mean_m
+        return np.where((count > 2) & (var > 0), cov / var, np.nan)
+
+
+def _dates(index):
+    """Dates calendaires sans fuseau : aligne un ticker européen sur un indice américain."""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def _aligned_index_close(hist, index_hist):
+    if index_hist is None or index_hist.empty:
+        return None
+    index_close = pd.Series(index_hist["Close"].to_numpy(), index=_dates(index_hist.index))
+    index_close = index_close[~index_close.index.duplicated(keep="last")]
+    return index_close.reindex(_dates(hist.index)).to_numpy()
+
+
+def compute_indicators(hist):
+    """Séries des indicateurs d'un ticker, alignées sur l'index de `hist` (une colonne par indicateur)."""
+    close = hist["Close"].to_numpy(dtype="float64")
+    columns = {f"SMA {w}": rolling_mean(close, w) for w in SMA_WINDOWS}
+    columns["RSI"] = rsi(close)
+    volatility = rolling_std(log_returns(close), VOLATILITY_WINDOW) * np.sqrt(TRADING_DAYS)
+    columns["Volatilité"] = np.concatenate([[np.nan], volatility])
+    columns["Drawdown"] = drawdown(close)
+    return pd.DataFrame(columns, index=hist.index)
+
+
+def latest_indicators(closes, index_close=None):
+    """
+    Dernières valeurs des indicateurs pour un DataFrame de clôtures (dates x tickers), sans boucle
+    sur les tickers. `index_close` (Series sur les mêmes dates) sert au calcul du bêta.
+    """
+    close = closes.ffill().to_numpy(dtype="float64")
+    out = {}
+    for w in SMA_WINDOWS:
+        tail = close[-w:]
+        full = (len(tail) == w) & ~np.isnan(tail).any(axis=0)
+        out[f"sma{w}"] = np.where(full, np.nanmean(tail, axis=0) if len(tail) else np.nan, np.nan)
+    out["rsi"] = rsi(close)[-1] if len(close) else np.full(close.shape[1], np.nan)
+
+    returns = log_returns(close)
+    tail = returns[-VOLATILITY_WINDOW:]
+    with np.errstate(invalid="ignore"):
+        out["volatility"] = np.nanstd(tail, axis=0, ddof=1) * np.sqrt(TRADING_DAYS) if len(tail) > 1 else np.nan
+    with np.errstate(invalid="ignore"):
+        out["maxDrawdown"] = np.nanmin(drawdown(close[-DRAWDOWN_WINDOW:]), axis=0) if len(close) else np.nan
+    if index_close is not None:
+        market = log_returns(index_close.reindex(closes.index).ffill().to_numpy(dtype="float64"))
+        out["beta"] = beta(returns[-BETA_WINDOW:], market[-BETA_WINDOW:])
+    else:
+        out["beta"] = np.nan
+    out["trend"] = close[-1] / out["sma200"] - 1 if len(close) else np.nan
+    return pd.DataFrame(out, index=closes.columns)[INDICATOR_COLUMNS]
+
+
+class IndicatorState:
+    """
+    État glissant des indicateurs d'un ticker. `update` intègre une nouvelle barre en O(1) :
+    sommes glissantes des moyennes, de la volatilité et du bêta, moyennes de Wilder du RSI.
+    Le drawdown maximal porte sur les DRAWDOWN_WINDOW dernières clôtures (calculé à la lecture).
+    """
+
+    def __init__(self):
+        self.closes = deque(maxlen=max(SMA_WINDOWS) + 1)
+        self.sums = dict.fromkeys(SMA_WINDOWS, 0.0)
+        self.last_close = None
+        self.last_index_close = None
+        self.bars = 0
+        # RSI
+        self.avg_gain = self.avg_loss = 0.0
+        # Volatilité
+        self.returns = deque(maxlen=VOLATILITY_WINDOW)
+        self.ret_sum = self.ret_sq_sum = 0.0
+        # Drawdown
+        self.window_closes = deque(maxlen=DRAWDOWN_WINDOW)
+        # Bêta
+        self.pairs = deque(maxlen=BETA_WINDOW)
+        self.beta_sums = np.zeros(5)  # r, m, r*m, m*m, r*r
+
+    def update(self, close, index_close=None):
+        close = float(close)
+        if close != close:
+            return
+        # Moyennes mobiles : on ajoute la nouvelle valeur et on retire celle qui sort de chaque fenêtre
+        self.closes.append(close)
+        for w in SMA_WINDOWS:
+            self.sums[w] += close
+            if len(self.closes) > w:
+                self.sums[w] -= self.closes[-w - 1]
+
+        if self.last_close is not None:
+            delta = close - self.last_close
+            self.bars += 1
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.bars <= RSI_PERIOD:
+                # Amorçage : moyenne simple des RSI_PERIOD premières variations
+                self.avg_gain += gain / RSI_PERIOD
+                self.avg_loss += loss / RSI_PERIOD
+            else:
+                self.avg_gain = (self.avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+                self.avg_loss = (self.avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+
+            ret = np.log(close / self.last_close)
+            if len(self.returns) == self.returns.maxlen:
+                old = self.returns[0]
+                self.ret_sum -= old
+                self.ret_sq_sum -= old * old
+            self.returns.append(ret)
+            self.ret_sum += ret
+            self.ret_sq_sum += ret * ret
+
+            if index_close is not None and index_close == index_close and self.last_index_close is not None:
+                market = np.log(index_close / self.last_index_close)
+                if len(self.pairs) == self.pairs.maxlen:
+                    self.beta_sums -= self._pair_terms(*self.pairs[0])
+                self.pairs.append((ret, market))
+                self.beta_sums += self._pair_terms(ret, market)
+
+        if index_close is not None and index_close == index_close:
+            self.last_index_close = float(index_close)
+        self.last_close = close
+        self.window_closes.append(close)
+
+    @staticmethod
+    def _pair_terms(r, m):
+        return np.array([r, m, r * m, m * m, r * r])
+
+    def snapshot(self):
+        """Dernières valeurs des indicateurs (None tant qu'il n'y a pas assez de barres)."""
+        values = {}
+        for w in SMA_WINDOWS:
+            values[f"sma{w}"] = self.sums[w] / w if len(self.closes) >= w else None
+        values["rsi"] = float(_rsi_value(self.avg_gain, self.avg_loss)) if self.bars >= RSI_PERIOD else None
+        n = len(self.returns)
+        if n > 1:
+            variance = max(0.0, (self.ret_sq_sum - self.ret_sum ** 2 / n) / (n - 1))
+            values["volatility"] = float(np.sqrt(variance * TRADING_DAYS))
+        else:
+            values["volatility"] = None
+        if self.window_closes:
+            window = np.fromiter(self.window_closes, dtype="float64")
+            values["maxDrawdown"] = float((window / np.maximum.accumulate(window) - 1).min())
+        else:
+            values["maxDrawdown"] = None
+        n = len(self.pairs)
+        sum_r, sum_m, sum_rm, sum_mm, _ = self.beta_sums
+        variance = sum_mm / n - (sum_m / n) ** 2 if n > 2 else 0
+        values["beta"] = float((sum_rm / n - sum_r * sum_m / n ** 2) / variance) if variance > 0 else None
+        sma200 = values[f"sma{max(SMA_WINDOWS)}"]
+        values["trend"] = self.last_close / sma200 - 1 if sma200 else None
+        return values
+
+
+_states = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def get_indicator_state(ticker, hist, index_hist=None):
+    """
+    État des indicateurs du ticker, partagé par tout le processus. Seules les barres de `hist`
+    à partir de la dernière barre intégrée sont traitées. Cette dernière barre peut être partielle
+    (séance en cours) : l'état d'avant cette barre est conservé et elle est réappliquée dès que sa
+    clôture change. Si l'historique ne prolonge pas l'état (première fois, données réécrites),
+    l'état est reconstruit depuis `hist`.
+    """
+    key = ticker.upper()
+    if not len(hist):
+        return IndicatorState()
+    last_close = float(hist["Close"].iloc[-1])
+    last_index = _aligned_index_close(hist.iloc[-1:], index_hist)
+    last_index = None if last_index is None else float(last_index[0])
+    with _states_lock:
+        entry = _states.get(key)
+        if entry is not None and entry["last"] in hist.index:
+            position = hist.index.get_loc(entry["last"])
+            if position == len(hist) - 1 and _same(entry["close"], last_close) and _same(entry["index_close"], last_index):
+                _states.move_to_end(key)
+                return entry["state"]
+            base, new = copy.deepcopy(entry["base"]), hist.iloc[position:]
+        else:
+            base, new = IndicatorState(), hist
+
+        index_close = _aligned_index_close(new, index_hist)
+        closes = new["Close"].to_numpy(dtype="float64")
+        for i, close in enumerate(closes[:-1]):
+            base.update(close, None if index_close is None else index_close[i])
+        state = copy.deepcopy(base)
+        state.update(closes[-1], None if index_close is None else index_close[-1])
+
+        _states[key] = {"base": base, "state": state, "last": hist.index[-1], "close": last_close, "index_close": last_index}
+        _states.move_to_end(key)
+        while len(_states) > MAX_STATES:
+            _states.popitem(last=False)
+        return state
+
+
+def _same(a, b):
+    """Égalité de deux clôtures, NaN et None compris."""
+    if a is None or b is None:
+        return a is None and b is None
+    return a == b or (a != a and b != b)
+
+
+def load_indicators(tickers, period="1y", max_workers=16):
+    """Dernières valeurs des indicateurs de plusieurs tickers (une ligne par ticker), calculées en un lot."""
+    tickers = [t.upper() for t in tickers]
+
+    def fetch(ticker):
+        try:
+            return get_historical_data(ticker, period=period)
+        except Exception as e:
+            print(f"[Erreur indicateurs] {ticker} : {e}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        histories = list(executor.map(fetch, tickers + [BENCHMARK_TICKER]))
+    index_hist = histories.pop()
+    closes = pd.DataFrame({
+        ticker: pd.Series(hist["Close"].to_numpy(), index=_dates(hist.index)).groupby(level=0).last()
+        for ticker, hist in zip(tickers, histories) if not hist.empty
+    }).reindex(columns=tickers).sort_index()
+    index_close = None
+    if not index_hist.empty:
+        index_close = pd.Series(index_hist["Close"].to_numpy(), index=_dates(index_hist.index)).groupby(level=0).last()
+    result = latest_indicators(closes, index_close)
+    result.index.name = "ticker"
+    return result
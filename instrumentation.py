@@ -0,0 +1,204 @@
+# instrumentation.py
+# Mesures de fonctionnement du processus : nombre d'appels, histogramme des latences,
+# erreurs, octets transférés et taux de succès des caches.
+# Les fonctions du projet sont enveloppées avec @instrumented ou `track` ; les mesures
+# sont affichées dans le panneau d'administration de la barre latérale et exposées au
+# format Prometheus (texte) ou JSON par un petit serveur HTTP optionnel.
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bornes supérieures (en secondes) des intervalles de l'histogramme des latences
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+METRICS_PORT = os.getenv("FINANALYSE_METRICS_PORT")
+
+
+class CallStats:
+    """Statistiques cumulées d'une opération."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds, error):
+        self.calls += 1
+        self.seconds += seconds
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+_calls = {}
+_cache = {}
+_lock = threading.Lock()
+
+
+def record_call(kind, name, seconds, error=False):
+    with _lock:
+        _calls.setdefault((kind, name), CallStats()).observe(seconds, error)
+
+
+def record_bytes(kind, name, nbytes):
+    with _lock:
+        _calls.setdefault((kind, name), CallStats()).bytes += nbytes
+
+
+def record_cache(namespace, outcome):
+    """`outcome` vaut 'hit', 'stale' (servi pendant le rafraîchissement) ou 'miss'."""
+    with _lock:
+        counts = _cache.setdefault(namespace, {"hit": 0, "stale": 0, "miss": 0})
+        counts[outcome] += 1
+
+
+@contextmanager
+def track(kind, name):
+    """
+    Chronomètre un bloc de code ; une exception est comptée comme erreur puis propagée.
+    Un générateur fermé avant la fin (GeneratorExit) ou une interruption n'en sont pas.
+    """
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_call(kind, name, time.perf_counter() - started, error)
+
+
+def instrumented(kind, name=None):
+    """Décorateur : mesure chaque appel de la fonction sous `kind` / `name` (nom de la fonction par défaut)."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_session(session, name):
+    """
+    Compte les octets reçus par une session requests. Une réponse en flux peut n'être lue
+    qu'en partie : c'est au code qui la lit d'appeler record_bytes avec les octets lus.
+    """
+    def on_response(response, *args, **kwargs):
+        if not kwargs.get("stream"):
+            record_bytes("external", name, len(response.content))
+        return response
+
+    session.hooks["response"].append(on_response)
+    return session
+
+
+def snapshot():
+    """Toutes les mesures sous forme de dictionnaire sérialisable en JSON."""
+    with _lock:
+        calls = [
+            {
+                "kind": kind,
+                "name": name,
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "seconds": stats.seconds,
+                "bytes": stats.bytes,
+                "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], stats.buckets)),
+            }
+            for (kind, name), stats in sorted(_calls.items())
+        ]
+        cache = [
+            {"namespace": ns, **counts, "hit_ratio": (counts["hit"] + counts["stale"]) / max(1, sum(counts.values()))}
+            for ns, counts in sorted(_cache.items())
+        ]
+    return {"calls": calls, "cache": cache}
+
+
+def render_prometheus():
+    """Mesures au format texte d'exposition Prometheus."""
+    data = snapshot()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        # Un bloc par famille : HELP et TYPE suivis de tous ses échantillons, sans entrelacement
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    def labels(c):
+        return f'kind="{c["kind"]}",name="{c["name"]}"'
+
+    def latency_samples(c):
+        cumulative = 0
+        for bound, count in c["buckets"].items():
+            cumulative += count
+            le = "+Inf" if bound == "inf" else bound
+            yield f'finanalyse_latency_seconds_bucket{{{labels(c)},le="{le}"}} {cumulative}'
+        yield f"finanalyse_latency_seconds_sum{{{labels(c)}}} {c['seconds']}"
+        yield f"finanalyse_latency_seconds_count{{{labels(c)}}} {c['calls']}"
+
+    calls = data["calls"]
+    family("finanalyse_calls_total", "counter", "Appels aux sources externes et aux étapes instrumentées.",
+           [f"finanalyse_calls_total{{{labels(c)}}} {c['calls']}" for c in calls])
+    family("finanalyse_errors_total", "counter", "Appels terminés par une exception.",
+           [f"finanalyse_errors_total{{{labels(c)}}} {c['errors']}" for c in calls])
+    family("finanalyse_bytes_total", "counter", "Octets reçus des sources externes.",
+           [f"finanalyse_bytes_total{{{labels(c)}}} {c['bytes']}" for c in calls])
+    family("finanalyse_latency_seconds", "histogram", "Durée des appels en secondes.",
+           [line for c in calls for line in latency_samples(c)])
+    family("finanalyse_cache_requests_total", "counter", "Consultations du cache persistant par résultat.",
+           [f'finanalyse_cache_requests_total{{namespace="{c["namespace"]}",outcome="{outcome}"}} {c[outcome]}'
+            for c in data["cache"] for outcome in ("hit", "stale", "miss")])
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Démarre (une fois par processus) le serveur /metrics et /metrics.json si un port est configuré."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                print(f"[Instrumentation] Serveur de métriques indisponible sur le port {port} : {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,190 @@
+# news.py
+# Agrégateur d'actualités multi-tickers.
+# Les tickers suivis sont interrogés en parallèle par un thread de fond ; la liste d'actualités
+# est retéléchargée dans l'instantané partagé de ticker_snapshot (la page d'analyse en profite).
+# Chaque ticker a un curseur (date du dernier article vu) : seuls les articles publiés après
+# ce curseur, moins une marge CURSOR_OVERLAP pour ceux qui apparaissent en retard, ainsi que
+# les articles sans date, sont traités ; la base écarte ceux déjà connus (clé sur l'identifiant).
+# Les reprises d'une même dépêche sur plusieurs tickers sont fusionnées, et le tout est conservé
+# dans une base SQLite indexée par ticker et par date.
+# La page Actualités lit cette base : aucun appel réseau au moment de l'affichage.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cache import CACHE_PATH
+from ticker_snapshot import get_snapshot
+
+NEWS_DB_PATH = os.path.join(os.path.dirname(CACHE_PATH), "news.sqlite")
+NEWS_TICKERS = [t.strip().upper() for t in os.getenv("NEWS_TICKERS", "SPY,QQQ,DIA,^FCHI,AAPL,MSFT").split(",") if t.strip()]
+POLL_INTERVAL = int(os.getenv("NEWS_POLL_INTERVAL", "600"))
+# Marge sous le curseur : un article daté avant le dernier vu mais publié sur le flux après lui est conservé
+CURSOR_OVERLAP = 86400
+
+
+def normalize_article(raw):
+    """Ramène un article yfinance (ancien ou nouveau format) à title/link/publisher/published_at."""
+    content = raw.get("content") or {}
+    if content:
+        published = content.get("pubDate") or content.get("displayTime")
+        try:
+            published_at = datetime.fromisoformat(published.replace("Z", "+00:00")).timestamp() if published else 0
+        except ValueError:
+            published_at = 0
+        return {
+            "title": content.get("title") or "Titre non disponible",
+            "link": ((content.get("canonicalUrl") or {}).get("url") or (content.get("clickThroughUrl") or {}).get("url") or "#"),
+            "publisher": (content.get("provider") or {}).get("displayName") or "Source inconnue",
+            "published_at": float(published_at),
+        }
+    return {
+        "title": raw.get("title") or "Titre non disponible",
+        "link": raw.get("link") or "#",
+        "publisher": raw.get("publisher") or "Source inconnue",
+        "published_at": float(raw.get("providerPublishTime") or 0),
+    }
+
+
+def article_id(article):
+    """Identifiant de déduplication : une même dépêche reprise sur plusieurs tickers garde le même titre."""
+    key = " ".join(article["title"].lower().split()) or article["link"]
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class NewsStore:
+    """Base locale des articles, interrogeable par ticker et par date."""
+
+    def __init__(self, path=NEWS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    publisher TEXT,
+                    published_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_at);
+                CREATE TABLE IF NOT EXISTS article_tickers (
+                    article_id TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    PRIMARY KEY (ticker, article_id)
+                );
+                CREATE TABLE IF NOT EXISTS cursors (
+                    source TEXT PRIMARY KEY,
+                    last_seen REAL NOT NULL
+                );
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def cursor(self, source):
+        with self._connect() as conn:
+            row = conn.execute("SELECT last_seen FROM cursors WHERE source = ?", (source,)).fetchone()
+        return row["last_seen"] if row else 0.0
+
+    def add(self, source, articles):
+        """Enregistre les nouveaux articles d'une source et avance son curseur. Renvoie le nombre d'articles inédits."""
+        if not articles:
+            return 0
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO articles (id, title, link, publisher, published_at) VALUES (?, ?, ?, ?, ?)",
+                [(article_id(a), a["title"], a["link"], a["publisher"], a["published_at"]) for a in articles],
+            )
+            inserted = conn.total_changes - before
+            conn.executemany(
+                "INSERT OR IGNORE INTO article_tickers (article_id, ticker) VALUES (?, ?)",
+                [(article_id(a), source) for a in articles],
+            )
+            conn.execute(
+                "INSERT INTO cursors (source, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)",
+                (source, max(a["published_at"] for a in articles)),
+            )
+        return inserted
+
+    def query(self, tickers=None, since=None, limit=50):
+        """Articles les plus récents, éventuellement filtrés par tickers et par date."""
+        sql = "SELECT a.*, GROUP_CONCAT(t.ticker) AS tickers FROM articles a JOIN article_tickers t ON t.article_id = a.id"
+        conditions, params = [], []
+        if tickers:
+            conditions.append(f"a.id IN (SELECT article_id FROM article_tickers WHERE ticker IN ({','.join('?' * len(tickers))}))")
+            params += [t.upper() for t in tickers]
+        if since is not None:
+            conditions.append("a.published_at >= ?")
+            params.append(since)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " GROUP BY a.id ORDER BY a.published_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def is_empty(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM articles LIMIT 1").fetchone() is None
+
+
+def poll_ticker(store, ticker):
+    """Récupère les actualités d'un ticker et n'enregistre que celles postérieures à son curseur (marge comprise)."""
+    try:
+        # Rechargement forcé : l'instantané peut dater de plus d'un intervalle de sondage
+        raw_articles = get_snapshot(ticker).reload("news") or []
+    except Exception as e:
+        print(f"[Actualités] {ticker} : {e}")
+        return 0
+    since = store.cursor(ticker) - CURSOR_OVERLAP
+    fresh = [a for a in map(normalize_article, raw_articles) if not a["published_at"] or a["published_at"] > since]
+    return store.add(ticker, fresh)
+
+
+def poll(store, tickers=None, max_workers=8):
+    """Interroge tous les tickers suivis en parallèle. Renvoie le nombre d'articles inédits."""
+    tickers = tickers or NEWS_TICKERS
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(lambda t: poll_ticker(store, t), tickers))
+
+
+_store = None
+_poller = None
+_lock = threading.Lock()
+
+
+def get_news_store():
+    global _store
+    with _lock:
+        if _store is None:
+            _store = NewsStore()
+        return _store
+
+
+def ensure_poller(tickers=None, interval=POLL_INTERVAL):
+    """Démarre (une seule fois par processus) le thread qui rafraîchit la base toutes les `interval` secondes."""
+    global _poller
+    store = get_news_store()
+    with _lock:
+        if _poller is not None and _poller.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    poll(store, tickers)
+                except Exception as e:
+                    print(f"[Actualités] Échec du rafraîchissement : {e}")
+
+        _poller = threading.Thread(target=run, name="news-poller", daemon=True)
+        _poller.start()
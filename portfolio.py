@@ -0,0 +1,236 @@
+# portfolio.py
+# Analyse de risque d'un portefeuille de plusieurs dizaines à plusieurs centaines de lignes.
+#
+# Les rendements quotidiens de tous les titres sont alignés dans une seule matrice float32
+# (jours x tickers). La covariance est tenue à jour à partir de sommes glissantes
+# (somme des rendements et produit R'R, en float64) : quand de nouveaux jours arrivent,
+# on ajoute leurs lignes et on retire les plus anciennes, sans recalculer toute la fenêtre.
+# Les modèles sont partagés par le processus : un rerun de Streamlit ne refait aucun calcul.
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data_fetching import get_dividend_data, get_historical_data
+
+TRADING_DAYS = 252
+# Un titre couvert sur moins de cette fraction de la fenêtre est écarté du portefeuille
+MIN_COVERAGE = 0.8
+# Délai minimal (en secondes) entre deux recherches de nouveaux jours pour un même portefeuille
+REFRESH_INTERVAL = 900
+MAX_PORTFOLIOS = 16
+
+
+def parse_holdings(text):
+    """
+    Lit des lignes « TICKER [poids] » (ou une liste séparée par des virgules).
+    Sans poids, les lignes sont équipondérées. Renvoie un dict ticker -> poids normalisé.
+    """
+    holdings = {}
+    for line in text.replace(",", "\n").replace(";", "\n").splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            weight = float(parts[1]) if len(parts) > 1 else 1.0
+        except ValueError:
+            weight = 1.0
+        holdings[parts[0].upper()] = holdings.get(parts[0].upper(), 0.0) + weight
+    total = sum(holdings.values())
+    return {t: w / total for t, w in holdings.items()} if total > 0 else {}
+
+
+def _date_index(index):
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def load_closes(tickers, period="1y", max_workers=16):
+    """Clôtures alignées (dates x tickers, float64), jours fériés propres à une place comblés par la veille."""
+    def fetch(ticker):
+        try:
+            hist = get_historical_data(ticker, period=period)
+        except Exception as e:
+            print(f"[Erreur portefeuille] {ticker} : {e}")
+            return None
+        if hist.empty:
+            return None
+        return pd.Series(hist["Close"].to_numpy(), index=_date_index(hist.index)).groupby(level=0).last()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        series = dict(zip(tickers, executor.map(fetch, tickers)))
+    closes = pd.DataFrame({t: s for t, s in series.items() if s is not None})
+    return closes.reindex(columns=[t for t in tickers if t in closes]).sort_index().ffill()
+
+
+def _trailing_dividend(dividends, year):
+    """Dividendes de la dernière année civile complète (à défaut, de la plus récente)."""
+    if dividends is None or dividends.empty:
+        return 0.0
+    complete = dividends[dividends.index.year < year]
+    return float(complete.iloc[-1] if not complete.empty else dividends.iloc[-1])
+
+
+class PortfolioModel:
+    """Matrice des rendements et sommes glissantes d'un ensemble de tickers."""
+
+    def __init__(self, tickers, period="1y"):
+        self.period = period
+        self._lock = threading.Lock()
+        self.version = 0
+        closes = load_closes(list(tickers), period)
+        coverage = closes.notna().mean()
+        closes = closes.loc[:, coverage >= MIN_COVERAGE]
+        self.tickers = list(closes.columns)
+        self.excluded = [t for t in tickers if t not in self.tickers]
+        self._build(closes)
+
+    def _build(self, closes):
+        values = closes.to_numpy(dtype="float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = values[1:] / values[:-1] - 1
+        self.returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+        self.dates = closes.index[1:]
+        self.last_close = values[-1] if len(values) else np.full(len(self.tickers), np.nan)
+        self._prev_close = values[-2] if len(values) > 1 else self.last_close
+
+        wide = self.returns.astype(np.float64)
+        self._sum = wide.sum(axis=0)
+        self._cross = wide.T @ wide
+        self.refreshed_at = time.time()
+        self.dividend_yields = self._load_dividend_yields()
+
+    @property
+    def days(self):
+        return len(self.returns)
+
+    def _load_dividend_yields(self):
+        year = pd.Timestamp.now().year
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            dividends = list(executor.map(self._safe_dividends, self.tickers))
+        annual = np.array([_trailing_dividend(d, year) for d in dividends])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nan_to_num(annual / self.last_close)
+
+    @staticmethod
+    def _safe_dividends(ticker):
+        try:
+            return get_dividend_data(ticker)
+        except Exception as e:
+            print(f"[Erreur portefeuille] dividendes {ticker} : {e}")
+            return None
+
+    def refresh(self, force=False):
+        """
+        Intègre les jours apparus depuis la dernière mise à jour et retire autant de jours anciens.
+        La dernière séance déjà intégrée est recalculée : une place a pu clôturer depuis
+        (cours comblé par la veille lors de la mise à jour précédente).
+        Renvoie True si les matrices ont changé.
+        """
+        with self._lock:
+            if not force and time.time() - self.refreshed_at < REFRESH_INTERVAL:
+                return False
+            self.refreshed_at = time.time()
+            if not self.tickers:
+                return False
+            all_closes = load_closes(self.tickers, self.period).reindex(columns=self.tickers)
+            closes = all_closes[all_closes.index >= self.dates[-1]] if self.days else all_closes
+            if closes.empty or closes.index[0] != self.dates[-1] or len(closes) > self.days:
+                # Historique réécrit ou fenêtre entièrement renouvelée : on reconstruit tout
+                self._build(all_closes)
+                self.version += 1
+                return True
+
+            values = np.vstack([self._prev_close, closes.to_numpy(dtype="float64")])
+            values = pd.DataFrame(values).ffill().to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                new = np.nan_to_num(values[1:] / values[:-1] - 1, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+            if len(new) == 1 and np.array_equal(new[0], self.returns[-1]):
+                return False
+
+            # Sommes calculées sur les valeurs float32 stockées : les retirer plus tard les annule exactement
+            extra = len(new) - 1
+            added = new.astype(np.float64)
+            removed = np.concatenate([self.returns[:extra], self.returns[-1:]]).astype(np.float64)
+            self._sum += added.sum(axis=0) - removed.sum(axis=0)
+            self._cross += added.T @ added - removed.T @ removed
+            self.returns = np.concatenate([self.returns[extra:-1], new])
+            self.dates = self.dates[extra:-1].append(closes.index)
+            self._prev_close = values[-2]
+            self.last_close = values[-1]
+            self.dividend_yields = self._load_dividend_yields()
+            self.version += 1
+            return True
+
+    def covariance(self):
+        """Matrice de covariance des rendements quotidiens (ddof=1)."""
+        n = self.days
+        mean = self._sum / n
+        return (self._cross - n * np.outer(mean, mean)) / (n - 1)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.tickers, columns=self.tickers)
+
+    def volatilities(self):
+        """Volatilité annualisée de chaque titre."""
+        return np.sqrt(np.clip(np.diag(self.covariance()), 0, None) * TRADING_DAYS)
+
+    def weight_vector(self, weights):
+        """Poids alignés sur les tickers du modèle, renormalisés sur les titres conservés."""
+        w = np.array([weights.get(t, 0.0) for t in self.tickers], dtype="float64")
+        total = w.sum()
+        return w / total if total > 0 else w
+
+    def risk(self, weights, confidence=0.95, horizon=1, value=1.0):
+        """
+        Risque du portefeuille pour un dict ticker -> poids : volatilité annualisée, VaR historique
+        (quantile des rendements quotidiens du portefeuille) et VaR paramétrique (loi normale),
+        toutes deux exprimées en perte positive pour `value` et mises à l'échelle de `horizon` jours.
+        """
+        w = self.weight_vector(weights)
+        portfolio_returns = self.returns @ w.astype(np.float32)
+        mean = float(self._sum @ w / self.days)
+        sigma = float(np.sqrt(max(0.0, w @ self.covariance() @ w)))
+        z = NormalDist().inv_cdf(1 - confidence)
+        scale = np.sqrt(horizon)
+        historical = -float(np.quantile(portfolio_returns, 1 - confidence)) * scale
+        parametric = -(mean * horizon + z * sigma * scale)
+        return {
+            "volatility": sigma * np.sqrt(TRADING_DAYS),
+            "historical_var": historical * value,
+            "parametric_var": parametric * value,
+            "dividend_yield": float(self.dividend_yields @ w),
+        }
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def get_portfolio_model(tickers, period="1y"):
+    """Modèle partagé pour cet ensemble de tickers, mis à jour au plus tous les REFRESH_INTERVAL."""
+    key = (tuple(sorted(t.upper() for t in tickers)), period)
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+    if model is None:
+        model = PortfolioModel(list(key[0]), period)
+        with _models_lock:
+            _models[key] = model
+            while len(_models) > MAX_PORTFOLIOS:
+                _models.popitem(last=False)
+    else:
+        model.refresh()
+    return model
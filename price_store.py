@@ -0,0 +1,236 @@
+# price_store.py
+# Stockage local et incrémental des historiques de prix (un fichier par ticker et par intervalle).
+#
+# Chaque série est conservée sous forme de tableaux NumPy sur disque :
+#   - <intervalle>.<version>.index.npy  : horodatages UTC en nanosecondes (int64)
+#   - <intervalle>.<version>.values.npy : matrice float64 (une colonne par champ OHLCV, dividendes...)
+#   - <intervalle>.json : version courante, colonnes, fuseau horaire et date de dernière vérification
+# Les fichiers sont ouverts en mémoire mappée : une tranche de graphique est une vue,
+# sans copie des données. Seules les barres manquantes depuis la dernière date connue
+# sont téléchargées depuis yfinance.
+# Une mise à jour écrit une nouvelle version puis bascule le pointeur du fichier JSON : un
+# fichier mappé n'est jamais remplacé (impossible sous Windows). Les anciennes versions sont
+# supprimées dès qu'elles ne sont plus ouvertes.
+# Les cours sont ajustés par yfinance (dividendes, divisions) : quand de nouvelles barres
+# apportent un dividende ou une division, toute la série est retéléchargée pour que les
+# anciennes barres soient ajustées sur la même base que les nouvelles.
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_PATH
+from instrumentation import instrumented
+from ticker_snapshot import get_snapshot
+
+PRICE_STORE_DIR = os.getenv("FINANALYSE_PRICE_STORE", os.path.join(os.path.dirname(CACHE_PATH), "prices"))
+
+# Délai minimal entre deux vérifications de nouvelles barres, selon l'intervalle
+REFRESH_AFTER = {"1d": 6 * 3600, "5d": 6 * 3600, "1wk": 86400, "1mo": 86400, "3mo": 86400}
+DEFAULT_REFRESH_AFTER = 15 * 60
+# Colonnes d'événements : une valeur absente signifie « aucun événement »
+ACTION_COLUMNS = ("Dividends", "Stock Splits", "Capital Gains")
+
+_PERIOD_RE = re.compile(r"(\d+)(d|wk|mo|y)")
+
+
+def period_start(period, now):
+    """Convertit une période yfinance ('1y', '6mo', 'ytd', 'max'...) en date de début (None pour 'max')."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+    match = _PERIOD_RE.fullmatch(period)
+    if not match:
+        raise ValueError(f"Période non reconnue : {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    offset = {
+        "d": pd.DateOffset(days=n),
+        "wk": pd.DateOffset(weeks=n),
+        "mo": pd.DateOffset(months=n),
+        "y": pd.DateOffset(years=n),
+    }[unit]
+    return now - offset
+
+
+class PriceSeries:
+    """Série stockée : index et valeurs en mémoire mappée, plus ses métadonnées."""
+
+    def __init__(self, index, values, meta):
+        self.index = index
+        self.values = values
+        self.meta = meta
+
+    def to_frame(self, start=None, end=None):
+        """Renvoie la tranche [start, end] sous forme de DataFrame adossé aux tableaux mappés (sans copie)."""
+        lo = 0 if start is None else int(np.searchsorted(self.index, start.value, side="left"))
+        hi = len(self.index) if end is None else int(np.searchsorted(self.index, end.value, side="right"))
+        index = pd.DatetimeIndex(self.index[lo:hi].view("datetime64[ns]"), name="Date").tz_localize("UTC")
+        if self.meta.get("tz"):
+            index = index.tz_convert(self.meta["tz"])
+        return pd.DataFrame(self.values[lo:hi], index=index, columns=self.meta["columns"], copy=False)
+
+
+def has_new_actions(series, bars):
+    """Vrai si `bars` contient un dividende ou une division absent (ou différent) des barres stockées."""
+    columns = [c for c in ACTION_COLUMNS if c in bars]
+    if bars.empty or not columns:
+        return False
+    events = bars[columns].fillna(0.0)
+    events = events[(events != 0).any(axis=1)]
+    if events.empty:
+        return False
+    stored = series.to_frame()
+    if stored.index.tz is not None and events.index.tz is not None:
+        events = events.tz_convert(stored.index.tz)
+    known = stored.reindex(index=events.index, columns=columns).fillna(0.0)
+    return not np.allclose(known.to_numpy(dtype="float64"), events.to_numpy(dtype="float64"))
+
+
+class PriceStore:
+    """Historique de prix local, mis à jour de façon incrémentale."""
+
+    def __init__(self, root=PRICE_STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, ticker, interval):
+        with self._locks_guard:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    def _paths(self, ticker, interval, version=None):
+        folder = os.path.join(self.root, re.sub(r"[^A-Za-z0-9._^-]", "_", ticker))
+        base = os.path.join(folder, interval)
+        if version is None:
+            # Séries écrites avant l'introduction des versions
+            return folder, f"{base}.index.npy", f"{base}.values.npy", f"{base}.json"
+        return folder, f"{base}.{version}.index.npy", f"{base}.{version}.values.npy", f"{base}.json"
+
+    def _load(self, ticker, interval):
+        meta_path = self._paths(ticker, interval)[3]
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["rows"] == 0:
+            return PriceSeries(np.empty(0, dtype="int64"), np.empty((0, len(meta["columns"]))), meta)
+        _, index_path, values_path, _ = self._paths(ticker, interval, meta.get("version"))
+        index = np.load(index_path, mmap_mode="r")
+        values = np.load(values_path, mmap_mode="r")
+        return PriceSeries(index, values, meta)
+
+    def _save(self, ticker, interval, frame, meta):
+        version = meta.get("version", 0) + 1
+        folder, index_path, values_path, meta_path = self._paths(ticker, interval, version)
+        os.makedirs(folder, exist_ok=True)
+        index = frame.index.tz_convert("UTC") if frame.index.tz is not None else frame.index.tz_localize("UTC")
+        meta = {**meta, "version": version, "columns": list(frame.columns), "rows": len(frame)}
+        # Nouvelle version dans ses propres fichiers, puis bascule du pointeur : un lecteur ne voit jamais de série partielle
+        for path, array in ((index_path, index.as_unit("ns").asi8), (values_path, frame.to_numpy(dtype="float64"))):
+            with open(path, "wb") as f:
+                np.save(f, array)
+        self._save_meta(ticker, interval, meta)
+        self._remove_old_versions(ticker, interval, version)
+
+    def _save_meta(self, ticker, interval, meta):
+        """Met à jour les seules métadonnées (date de vérification...) sans réécrire les tableaux."""
+        meta_path = self._paths(ticker, interval)[3]
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _remove_old_versions(self, ticker, interval, current):
+        """Supprime les versions précédentes ; celles encore mappées (Windows) le seront à la prochaine écriture."""
+        folder = self._paths(ticker, interval)[0]
+        keep = {f"{interval}.{current}.index.npy", f"{interval}.{current}.values.npy"}
+        for path in glob.glob(os.path.join(glob.escape(folder), f"{interval}.*.npy")):
+            if os.path.basename(path) not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @instrumented("external", "yfinance.history")
+    def _download(self, ticker, interval, start=None, end=None):
+        stock = get_snapshot(ticker).stock
+        if start is None:
+            return stock.history(period="max", interval=interval)
+        return stock.history(start=start, end=end, interval=interval)
+
+    def _merge_and_save(self, ticker, interval, series, new_bars, meta):
+        if new_bars.empty:
+            if series is not None:
+                self._save_meta(ticker, interval, meta)
+            return
+        if series is not None and len(series.index):
+            stored = series.to_frame()
+            columns = list(dict.fromkeys(series.meta["columns"] + list(new_bars.columns)))
+            if stored.index.tz is not None and new_bars.index.tz is not None:
+                new_bars = new_bars.tz_convert(stored.index.tz)
+            frame = pd.concat([stored.reindex(columns=columns), new_bars.reindex(columns=columns)])
+            frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+        else:
+            frame = new_bars
+        tz = str(frame.index.tz) if frame.index.tz is not None else (series.meta.get("tz") if series else None)
+        frame = frame.astype("float64").fillna({c: 0.0 for c in ACTION_COLUMNS if c in frame})
+        self._save(ticker, interval, frame, {**meta, "tz": tz})
+
+    def get(self, ticker, period="1y", interval="1d"):
+        """Renvoie l'historique demandé en ne téléchargeant que ce qui manque localement."""
+        ticker = ticker.upper()
+        now = pd.Timestamp.now(tz="UTC")
+        start = period_start(period, now)
+
+        with self._lock_for(ticker, interval):
+            series = self._load(ticker, interval)
+            meta = dict(series.meta) if series else {}
+            covered_from = meta.get("covered_from")
+
+            # 1. Début de période non couvert : on télécharge uniquement la partie ancienne manquante
+            needs_backfill = series is None or (
+                covered_from is not None and (start is None or start.value < covered_from)
+            )
+            if needs_backfill:
+                end = pd.Timestamp(int(series.index[0]), tz="UTC") if series is not None and len(series.index) else None
+                bars = self._download(ticker, interval, start, end)
+                meta.update(covered_from=None if start is None else start.value, last_checked=time.time())
+                self._merge_and_save(ticker, interval, series, bars, meta)
+                series = self._load(ticker, interval)
+                if series is None:
+                    return pd.DataFrame()
+
+            # 2. Nouvelles barres depuis la dernière date stockée (la dernière barre est re-téléchargée : elle peut être partielle)
+            refresh_after = REFRESH_AFTER.get(interval, DEFAULT_REFRESH_AFTER)
+            if len(series.index) and time.time() - series.meta.get("last_checked", 0) > refresh_after:
+                last = pd.Timestamp(int(series.index[-1]), tz="UTC")
+                bars = self._download(ticker, interval, last)
+                meta = {**series.meta, "last_checked": time.time()}
+                if has_new_actions(series, bars):
+                    # Nouvelle base d'ajustement : la série entière est remplacée
+                    covered_from = meta.get("covered_from")
+                    bars = self._download(ticker, interval, None if covered_from is None else pd.Timestamp(covered_from, tz="UTC"))
+                    series = None
+                self._merge_and_save(ticker, interval, series, bars, meta)
+                series = self._load(ticker, interval)
+
+        return series.to_frame(start=start)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Magasin de prix unique du processus."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore()
+        return _store
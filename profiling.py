@@ -0,0 +1,105 @@
+# profiling.py
+# Profil de démarrage et des reruns de l'application Streamlit.
+#
+# - `phase` chronomètre un import ou une initialisation ; seule la première exécution dans
+#   le processus est retenue (les suivantes ne coûtent presque rien : le module est déjà chargé) ;
+# - `measure_run` (ou `start_run` / `finish_run`) encadre chaque exécution du script : la première
+#   du processus (démarrage à froid), la première de chaque session (premier affichage) et les
+#   reruns, ainsi que chaque exécution d'un fragment (chat, liste de suivi). Une exécution
+#   interrompue par st.stop, st.rerun ou une exception est aussi mesurée.
+# Les durées sont aussi transmises à instrumentation (types "startup" et "rerun").
+
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from instrumentation import record_call
+
+MAX_RUNS = 500
+
+PROCESS_START = time.perf_counter()
+_lock = threading.Lock()
+_phases = OrderedDict()
+_runs = deque(maxlen=MAX_RUNS)
+_cold_start = None
+
+
+@contextmanager
+def phase(name):
+    """Chronomètre un bloc d'import ou d'initialisation (mesuré une seule fois par processus)."""
+    if name in _phases:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            if name not in _phases:
+                _phases[name] = seconds
+                record_call("startup", name, seconds)
+
+
+def start_run():
+    return time.perf_counter()
+
+
+def finish_run(started, page, first_in_session=False, fragment=False):
+    """Enregistre la durée d'une exécution du script, ou d'un fragment si `fragment`."""
+    global _cold_start
+    finished = time.perf_counter()
+    seconds = finished - started
+    kind = "fragment" if fragment else "first_paint" if first_in_session else "rerun"
+    with _lock:
+        if _cold_start is None and not fragment:
+            # Du chargement de ce module à la fin de la première exécution du script
+            _cold_start = finished - PROCESS_START
+        _runs.append((kind, page, seconds))
+    if fragment:
+        record_call("rerun", f"fragment : {page}", seconds)
+    elif first_in_session:
+        record_call("startup", f"premier affichage : {page}", seconds)
+    else:
+        record_call("rerun", page, seconds)
+
+
+@contextmanager
+def measure_run(page, started=None, first_in_session=False, fragment=False):
+    """Mesure une exécution du script ou d'un fragment, même interrompue (st.stop, st.rerun, exception)."""
+    started = start_run() if started is None else started
+    try:
+        yield
+    finally:
+        finish_run(started, page, first_in_session, fragment)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def report():
+    """Démarrage à froid, durée de chaque import/initialisation et durées d'exécution par page."""
+    with _lock:
+        phases = [{"phase": name, "ms": seconds * 1000} for name, seconds in _phases.items()]
+        runs = list(_runs)
+        cold_start = _cold_start
+    pages = []
+    for kind in ("first_paint", "rerun", "fragment"):
+        for page in dict.fromkeys(p for k, p, _ in runs if k == kind):
+            samples = [s for k, p, s in runs if k == kind and p == page]
+            pages.append({
+                "type": kind,
+                "page": page,
+                "runs": len(samples),
+                "p50_ms": _percentile(samples, 0.5) * 1000,
+                "p95_ms": _percentile(samples, 0.95) * 1000,
+                "last_ms": samples[-1] * 1000,
+            })
+    return {
+        "cold_start_ms": cold_start * 1000 if cold_start is not None else None,
+        "phases": phases,
+        "runs": pages,
+    }
@@ -0,0 +1,422 @@
+# providers.py
+# Routeur multi-fournisseurs pour les métriques fondamentales (Alpha Vantage, yfinance, FMP).
+#
+# Chaque fournisseur renvoie un enregistrement au format de `get_advanced_metrics`.
+# Le routeur :
+#   - mesure la latence et le taux d'erreur observés de chaque fournisseur ;
+#   - interroge le premier fournisseur disponible, puis lance une requête de secours vers le
+#     suivant si la réponse tarde au-delà du 95e centile de latence habituel du premier ;
+#   - écarte temporairement (disjoncteur) un fournisseur qui échoue à répétition ;
+#   - fusionne les champs reçus, dans l'ordre de priorité des fournisseurs.
+# La latence d'un appel est donc celle de la source saine la plus rapide, pas de la plus lente.
+# Un fournisseur n'est qu'un objet avec `name`, `available()` et `fetch(ticker)` : des
+# substituts locaux suffisent pour exercer le routeur sans réseau.
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from alpha_vantage import get_client as get_alpha_vantage_client
+from instrumentation import record_call, track, track_session
+from statements_store import get_statements_store
+from ticker_snapshot import get_snapshot
+
+# Ordre de priorité : pour un même champ, la valeur du premier fournisseur l'emporte
+PROVIDER_ORDER = [p.strip() for p in os.getenv("DATA_PROVIDERS", "alpha_vantage,yfinance,fmp").split(",") if p.strip()]
+FMP_BASE_URL = "https://financialmodelingprep.com/stable"
+REQUEST_TIMEOUT = 10
+# Délai de secours tant qu'un fournisseur n'a pas assez de mesures pour estimer son p95,
+# et plafond de ce délai (un fournisseur à la traîne ne fait jamais attendre plus longtemps)
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.05
+MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+ERROR_WINDOW = 50
+# Disjoncteur : ouvert après FAILURE_THRESHOLD échecs consécutifs, ou un taux d'erreur
+# supérieur à ERROR_RATE_THRESHOLD sur les ERROR_WINDOW derniers appels
+FAILURE_THRESHOLD = 5
+ERROR_RATE_THRESHOLD = 0.5
+OPEN_SECONDS = 60
+MAX_OPEN_SECONDS = 900
+# Après la première réponse valide, attente maximale des autres requêtes déjà lancées pour compléter les champs
+MERGE_GRACE = 0.1
+ROUTER_TIMEOUT = 25
+
+
+class ProviderError(Exception):
+    """Réponse inexploitable d'un fournisseur (vide, quota atteint...)."""
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) else None
+
+
+# --- Fournisseurs ---
+
+class AlphaVantageProvider:
+    """OVERVIEW, BALANCE_SHEET et CASH_FLOW d'Alpha Vantage (quota et cache gérés par le client)."""
+
+    name = "alpha_vantage"
+
+    def available(self):
+        return bool(get_alpha_vantage_client().api_key)
+
+    def fetch(self, ticker):
+        client = get_alpha_vantage_client()
+        overview = client.query("OVERVIEW", ticker)
+        if not overview or "Symbol" not in overview:
+            raise ProviderError(f"OVERVIEW vide pour {ticker}")
+
+        net_income = _number(overview.get("NetIncomeTTM")) or 0
+        employees = _number(overview.get("FullTimeEmployees"))
+        data = {
+            "marketCap": _number(overview.get("MarketCapitalization")),
+            "ebitda": _number(overview.get("EBITDA")),
+            "peRatio": _number(overview.get("PERatio")),
+            "forwardPE": _number(overview.get("ForwardPE")),
+            "beta": _number(overview.get("Beta")),
+            "dividendYield": _number(overview.get("DividendYield")),
+            "revenue": _number(overview.get("RevenueTTM")),
+            "returnOnEquity": _number(overview.get("ReturnOnEquityTTM")),
+            "returnOnAssets": _number(overview.get("ReturnOnAssetsTTM")),
+            "revenueGrowth": _number(overview.get("QuarterlyRevenueGrowthYOY")),
+            "earningsGrowth": _number(overview.get("QuarterlyEarningsGrowthYOY")),
+            "priceToBook": _number(overview.get("PriceToBookRatio")),
+            "fullTimeEmployees": int(employees) if employees is not None else None,
+            "description": overview.get("Description"),
+            "sector": overview.get("Sector"),
+            "country": overview.get("Country"),
+        }
+
+        # Toutes les périodes sont conservées dans la base des états financiers, pas seulement la dernière
+        balance = client.query("BALANCE_SHEET", ticker)
+        get_statements_store().add_alpha_vantage(ticker, "BALANCE_SHEET", balance)
+        if balance and balance.get("annualReports"):
+            latest = balance["annualReports"][0]
+            total_debt = (_number(latest.get("longTermDebt")) or 0) + (_number(latest.get("shortTermDebt")) or 0)
+            equity = _number(latest.get("totalShareholderEquity")) or 0
+            data["totalDebt"] = total_debt
+            data["debtToEquity"] = total_debt / equity if equity else None
+            # ROI : résultat net rapporté aux capitaux investis (dette + capitaux propres)
+            invested = total_debt + equity
+            data["returnOnInvestment"] = net_income / invested if invested > 0 else None
+
+        cashflow = client.query("CASH_FLOW", ticker)
+        get_statements_store().add_alpha_vantage(ticker, "CASH_FLOW", cashflow)
+        if cashflow and cashflow.get("annualReports"):
+            latest = cashflow["annualReports"][0]
+            operating = _number(latest.get("operatingCashflow"))
+            data["operatingCashFlow"] = operating
+            if operating is not None:
+                data["freeCashFlow"] = operating - (_number(latest.get("capitalExpenditures")) or 0)
+        return data
+
+
+class YFinanceProvider:
+    """Dictionnaire `info` de yfinance, partagé avec le reste de l'application par ticker_snapshot."""
+
+    name = "yfinance"
+
+    def available(self):
+        return True
+
+    def fetch(self, ticker):
+        info = get_snapshot(ticker).info or {}
+        if not info.get("symbol") and not info.get("longName") and not info.get("shortName"):
+            raise ProviderError(f"info vide pour {ticker}")
+        dividend_yield = _number(info.get("dividendYield"))
+        debt_to_equity = _number(info.get("debtToEquity"))
+        return {
+            "marketCap": _number(info.get("marketCap")),
+            "ebitda": _number(info.get("ebitda")),
+            "peRatio": _number(info.get("trailingPE")),
+            "forwardPE": _number(info.get("forwardPE")),
+            "beta": _number(info.get("beta")),
+            # yfinance : rendement en pourcentage, dette/capitaux propres en pourcentage
+            "dividendYield": dividend_yield / 100 if dividend_yield is not None else None,
+            "revenue": _number(info.get("totalRevenue")),
+            "returnOnEquity": _number(info.get("returnOnEquity")),
+            "returnOnAssets": _number(info.get("returnOnAssets")),
+            "revenueGrowth": _number(info.get("revenueGrowth")),
+            "earningsGrowth": _number(info.get("earningsGrowth")),
+            "priceToBook": _number(info.get("priceToBook")),
+            "fullTimeEmployees": info.get("fullTimeEmployees"),
+            "description": info.get("longBusinessSummary"),
+            "sector": info.get("sector"),
+            "country": info.get("country"),
+            "totalDebt": _number(info.get("totalDebt")),
+            "debtToEquity": debt_to_equity / 100 if debt_to_equity is not None else None,
+            "operatingCashFlow": _number(info.get("operatingCashflow")),
+            "freeCashFlow": _number(info.get("freeCashflow")),
+        }
+
+
+class FMPProvider:
+    """Profil et ratios TTM de Financial Modeling Prep (désactivé sans FMP_API_KEY)."""
+
+    name = "fmp"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("FMP_API_KEY")
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def available(self):
+        return bool(self.api_key)
+
+    def _get(self, endpoint, ticker):
+        with self._session_lock:
+            if self._session is None:
+                self._session = track_session(requests.Session(), "fmp")
+                self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+        with track("external", "fmp"):
+            r = self._session.get(f"{FMP_BASE_URL}/{endpoint}", params={"symbol": ticker, "apikey": self.api_key}, timeout=REQUEST_TIMEOUT)
+            r.raise_for_status()
+            payload = r.json()
+        if not isinstance(payload, list) or not payload:
+            raise ProviderError(f"FMP {endpoint} vide pour {ticker}")
+        return payload[0]
+
+    def fetch(self, ticker):
+        profile = self._get("profile", ticker)
+        ratios = self._get("ratios-ttm", ticker)
+        employees = _number(profile.get("fullTimeEmployees"))
+        return {
+            "marketCap": _number(profile.get("marketCap")),
+            "peRatio": _number(ratios.get("priceToEarningsRatioTTM")),
+            "beta": _number(profile.get("beta")),
+            "dividendYield": _number(ratios.get("dividendYieldTTM")),
+            "priceToBook": _number(ratios.get("priceToBookRatioTTM")),
+            "debtToEquity": _number(ratios.get("debtToEquityRatioTTM")),
+            "fullTimeEmployees": int(employees) if employees is not None else None,
+            "description": profile.get("description"),
+            "sector": profile.get("sector"),
+            "country": profile.get("country"),
+        }
+
+
+# --- Statistiques et disjoncteur ---
+
+class ProviderHealth:
+    """Latences, erreurs et état du disjoncteur d'un fournisseur."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=ERROR_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.open_seconds = OPEN_SECONDS
+        self.probing = False
+
+    def record(self, seconds, error, probe=False):
+        """Résultat d'un appel ; seul celui de l'appel d'essai (`probe`) referme ou rouvre la coupure en cours."""
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(error)
+            if error:
+                self.errors += 1
+                self.consecutive_failures += 1
+                if probe or self.consecutive_failures >= FAILURE_THRESHOLD or self._error_rate() > ERROR_RATE_THRESHOLD:
+                    # Réouverture après un essai raté : la coupure suivante dure deux fois plus longtemps
+                    if probe:
+                        self.open_seconds = min(self.open_seconds * 2, MAX_OPEN_SECONDS)
+                    self.opened_until = time.monotonic() + self.open_seconds
+            else:
+                self.latencies.append(seconds)
+                self.consecutive_failures = 0
+                if probe:
+                    self.outcomes.clear()
+                    self.open_seconds = OPEN_SECONDS
+                    self.opened_until = 0.0
+            if probe:
+                self.probing = False
+
+    def _error_rate(self):
+        if len(self.outcomes) < MIN_SAMPLES:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def acquire(self):
+        """
+        Autorisation d'appeler le fournisseur : None si le disjoncteur est ouvert, "probe" pour
+        l'unique appel d'essai de fin de coupure, "call" sinon.
+        """
+        with self._lock:
+            if self.probing:
+                return None
+            if self.opened_until == 0.0:
+                return "call"
+            if time.monotonic() < self.opened_until:
+                return None
+            self.probing = True
+            self.opened_until = 0.0
+            return "probe"
+
+    def allow(self):
+        """Vrai si le fournisseur peut être appelé ; à la fin d'une coupure, un seul appel d'essai passe."""
+        return self.acquire() is not None
+
+    def hedge_delay(self):
+        """Délai avant la requête de secours : p95 des latences observées, borné."""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            return min(DEFAULT_HEDGE_DELAY, max(MIN_HEDGE_DELAY, float(np.percentile(self.latencies, 95))))
+
+    def state(self):
+        with self._lock:
+            if self.probing:
+                return "half-open"
+            return "open" if self.opened_until > time.monotonic() else "closed"
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self.latencies) if self.latencies else None
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "error_rate": sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0,
+                "p50_ms": float(np.percentile(latencies, 50)) * 1000 if latencies is not None else None,
+                "p95_ms": float(np.percentile(latencies, 95)) * 1000 if latencies is not None else None,
+            }
+
+
+# --- Routeur ---
+
+class ProviderRouter:
+    """Interroge les fournisseurs par ordre de priorité, avec requêtes de secours et disjoncteurs."""
+
+    def __init__(self, providers, timeout=ROUTER_TIMEOUT, merge_grace=MERGE_GRACE, max_workers=16):
+        self.providers = list(providers)
+        self.health = {p.name: ProviderHealth() for p in self.providers}
+        self.timeout = timeout
+        self.merge_grace = merge_grace
+        # Partagé par tous les appels : une requête abandonnée au profit d'une autre se termine en arrière-plan
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+
+    def _call(self, provider, ticker, probe=False):
+        started = time.perf_counter()
+        error = True
+        try:
+            result = provider.fetch(ticker)
+            if not result or all(v is None for v in result.values()):
+                raise ProviderError(f"{provider.name} : aucun champ pour {ticker}")
+            error = False
+            return result
+        finally:
+            seconds = time.perf_counter() - started
+            self.health[provider.name].record(seconds, error, probe)
+            record_call("provider", provider.name, seconds, error)
+
+    def fetch(self, ticker):
+        """
+        Enregistrement fusionné des fournisseurs pour `ticker` ({} si aucun n'a répondu).
+        Le premier fournisseur sain est interrogé ; le suivant l'est aussi dès que le premier
+        dépasse son p95 ou échoue. La première réponse valide (complétée par celles qui
+        arrivent dans les `merge_grace` secondes suivantes) est renvoyée.
+        """
+        ticker = ticker.upper()
+        queue = deque(p for p in self.providers if p.available())
+        deadline = time.monotonic() + self.timeout
+        pending = {}
+        results = {}
+
+        def launch():
+            # Le disjoncteur n'est consulté qu'au moment d'appeler (l'essai de fin de coupure est alors consommé)
+            while queue:
+                provider = queue.popleft()
+                admission = self.health[provider.name].acquire()
+                if admission is not None:
+                    pending[self._executor.submit(self._call, provider, ticker, admission == "probe")] = provider
+                    return time.monotonic() + self.health[provider.name].hedge_delay()
+            return None
+
+        hedge_at = launch()
+        if hedge_at is None:
+            print(f"[Fournisseurs] Aucun fournisseur disponible pour {ticker}")
+            return {}
+        merge_until = None
+        while pending:
+            now = time.monotonic()
+            limit = merge_until if merge_until is not None else min(deadline, hedge_at if queue else deadline)
+            done, _ = wait(pending, timeout=max(0.0, limit - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    results[provider.name] = future.result()
+                except Exception as e:
+                    print(f"[Fournisseurs] {provider.name} {ticker} : {e}")
+                    # Échec : on bascule tout de suite sur le fournisseur suivant
+                    if queue and merge_until is None:
+                        hedge_at = launch() or hedge_at
+            if results and merge_until is None:
+                merge_until = time.monotonic() + self.merge_grace
+            now = time.monotonic()
+            if merge_until is not None:
+                if now >= merge_until:
+                    break
+            elif now >= deadline:
+                print(f"[Fournisseurs] Délai dépassé pour {ticker}")
+                break
+            elif queue and now >= hedge_at:
+                # Le fournisseur en cours dépasse son p95 : requête de secours vers le suivant
+                hedge_at = launch() or deadline
+        return self.merge(results)
+
+    def merge(self, results):
+        """Un seul enregistrement : pour chaque champ, la première valeur renseignée dans l'ordre de priorité."""
+        merged = {}
+        for provider in self.providers:
+            for field, value in (results.get(provider.name) or {}).items():
+                if merged.get(field) is None and value is not None:
+                    merged[field] = value
+        if results:
+            merged["sources"] = [p.name for p in self.providers if p.name in results]
+        return merged
+
+    def is_complete(self, record):
+        """
+        Vrai si l'enregistrement contient la réponse du premier fournisseur activé et dont le disjoncteur
+        est fermé : une réponse de secours seule peut manquer de champs (ROI, dette...) et ne doit pas être
+        mise en cache. Un fournisseur sans clé ou écarté par son disjoncteur ne compte pas : sans lui, la
+        réponse des autres est la meilleure possible.
+        """
+        if not record:
+            return False
+        primary = next((p.name for p in self.providers if p.available() and self.health[p.name].state() == "closed"), None)
+        return primary is None or primary in record.get("sources", ())
+
+    def stats(self):
+        """Latences, erreurs et état du disjoncteur de chaque fournisseur."""
+        return [
+            {"provider": p.name, "enabled": p.available(), "state": self.health[p.name].state(), **self.health[p.name].summary()}
+            for p in self.providers
+        ]
+
+
+PROVIDERS = {"alpha_vantage": AlphaVantageProvider, "yfinance": YFinanceProvider, "fmp": FMPProvider}
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Routeur unique du processus (statistiques et disjoncteurs partagés par toutes les sessions)."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ProviderRouter([PROVIDERS[name]() for name in PROVIDER_ORDER if name in PROVIDERS])
+        return _router
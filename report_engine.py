@@ -0,0 +1,212 @@
+# report_engine.py
+# Moteur de rapports PDF : gabarit HTML (Jinja2) converti en PDF par WeasyPrint.
+#
+# - le gabarit est compilé une seule fois par processus ;
+# - la feuille de style, la configuration des polices et le cache d'images de WeasyPrint
+#   sont partagés entre tous les rendus ;
+# - les graphiques (cours, dividendes) sont dessinés en SVG une seule fois par version
+#   des données, puis réutilisés tels quels.
+# WeasyPrint dépend de bibliothèques système (Pango) : si elles sont absentes,
+# `get_report_engine` renvoie None et export.py produit le PDF simple avec FPDF.
+
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import jinja2
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(BASE_DIR, "report_template.html")
+STYLESHEET_PATH = os.path.join(BASE_DIR, "report_style.css")
+# Nombre de graphiques gardés en mémoire (les plus anciens sont évincés)
+CHART_CACHE_SIZE = 64
+# Au-delà, la courbe des cours est sous-échantillonnée (le PDF n'a pas besoin de plus de détail)
+MAX_CHART_POINTS = 400
+STATEMENT_TITLES = ("Compte de Résultat", "Bilan", "Flux de Trésorerie")
+
+
+def format_number(value, spec="{:.2f}", scale=1):
+    """Filtre Jinja2 : nombre mis à l'échelle et formaté, 'N/A' si la valeur est absente."""
+    if value is None or value != value:
+        return "N/A"
+    return spec.format(value * scale)
+
+
+# --- Graphiques SVG, mis en cache par version des données ---
+_charts = OrderedDict()
+_charts_lock = threading.Lock()
+
+
+def _data_version(data):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def _cached_chart(kind, data, draw, *args):
+    """URI data: du graphique ; dessiné seulement si cette version des données n'a jamais été vue."""
+    if data is None or data.empty:
+        return None
+    key = (kind, _data_version(data), args)
+    with _charts_lock:
+        if key in _charts:
+            _charts.move_to_end(key)
+            return _charts[key]
+    svg = draw(data, *args)
+    uri = "data:image/svg+xml;base64," + base64.b64encode(svg.encode("utf-8")).decode("ascii")
+    with _charts_lock:
+        _charts[key] = uri
+        while len(_charts) > CHART_CACHE_SIZE:
+            _charts.popitem(last=False)
+    return uri
+
+
+def _svg(width, height, body):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="Helvetica" font-size="10">{body}</svg>'
+    )
+
+
+def _price_svg(close, width=700, height=220):
+    margin_left, margin_bottom, margin_top = 50, 20, 10
+    values = close.to_numpy(dtype="float64")
+    dates = close.index
+    if len(values) > MAX_CHART_POINTS:
+        positions = np.linspace(0, len(values) - 1, MAX_CHART_POINTS).astype(int)
+        values, dates = values[positions], dates[positions]
+    low, high = np.nanmin(values), np.nanmax(values)
+    span = (high - low) or 1.0
+    plot_width, plot_height = width - margin_left - 5, height - margin_bottom - margin_top
+
+    x = margin_left + np.arange(len(values)) * plot_width / max(1, len(values) - 1)
+    y = margin_top + (high - values) / span * plot_height
+    points = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y) if b == b)
+    baseline = margin_top + plot_height
+
+    parts = []
+    for level in np.linspace(low, high, 5):
+        ly = margin_top + (high - level) / span * plot_height
+        parts.append(f'<line x1="{margin_left}" y1="{ly:.1f}" x2="{width - 5}" y2="{ly:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="{margin_left - 4}" y="{ly + 3:.1f}" text-anchor="end" fill="#666">{level:.2f}</text>')
+    parts.append(f'<polygon points="{x[0]:.1f},{baseline} {points} {x[-1]:.1f},{baseline}" fill="#4caf50" fill-opacity="0.12"/>')
+    parts.append(f'<polyline points="{points}" fill="none" stroke="#2e7d32" stroke-width="1.5"/>')
+    for position, anchor in ((0, "start"), (len(dates) // 2, "middle"), (len(dates) - 1, "end")):
+        parts.append(
+            f'<text x="{x[position]:.1f}" y="{height - 5}" text-anchor="{anchor}" fill="#666">'
+            f'{dates[position].strftime("%d/%m/%Y")}</text>'
+        )
+    return _svg(width, height, "".join(parts))
+
+
+def _dividend_svg(dividends, width=700, height=180):
+    margin_bottom, margin_top = 20, 15
+    values = dividends.to_numpy(dtype="float64")
+    labels = [str(getattr(i, "year", i)) for i in dividends.index]
+    top = np.nanmax(values) or 1.0
+    plot_height = height - margin_bottom - margin_top
+    slot = width / len(values)
+    bar_width = min(60, slot * 0.6)
+
+    parts = [f'<line x1="0" y1="{height - margin_bottom}" x2="{width}" y2="{height - margin_bottom}" stroke="#ccc"/>']
+    for i, (value, label) in enumerate(zip(values, labels)):
+        bar_height = (value if value == value else 0) / top * plot_height
+        bx = i * slot + (slot - bar_width) / 2
+        by = height - margin_bottom - bar_height
+        parts.append(f'<rect x="{bx:.1f}" y="{by:.1f}" width="{bar_width:.1f}" height="{bar_height:.1f}" fill="#4caf50"/>')
+        parts.append(f'<text x="{bx + bar_width / 2:.1f}" y="{by - 3:.1f}" text-anchor="middle" fill="#333">{value:.2f}</text>')
+        parts.append(f'<text x="{bx + bar_width / 2:.1f}" y="{height - 5}" text-anchor="middle" fill="#666">{label}</text>')
+    return _svg(width, height, "".join(parts))
+
+
+def price_chart(hist_data):
+    """Courbe des cours de clôture (URI data: SVG), ou None sans historique."""
+    if hist_data is None or "Close" not in hist_data:
+        return None
+    return _cached_chart("price", hist_data["Close"].dropna(), _price_svg)
+
+
+def dividend_chart(dividends):
+    """Histogramme des dividendes annuels (URI data: SVG), ou None sans dividende."""
+    if dividends is None:
+        return None
+    return _cached_chart("dividends", dividends[dividends > 0], _dividend_svg)
+
+
+def _statement_tables(statements):
+    tables = []
+    for title, statement in zip(STATEMENT_TITLES, statements or ()):
+        if statement is None or statement.empty:
+            continue
+        statement = statement.iloc[::-1]
+        tables.append({
+            "title": title,
+            "periods": [getattr(p, "year", p) for p in statement.columns],
+            "rows": list(zip(statement.index, statement.to_numpy(dtype="float64", na_value=np.nan).tolist())),
+        })
+    return tables
+
+
+class ReportEngine:
+    """Gabarit, feuille de style et polices préparés une fois, puis réutilisés pour chaque rapport."""
+
+    def __init__(self, template_path=TEMPLATE_PATH, stylesheet_path=STYLESHEET_PATH):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.path.dirname(template_path)),
+            autoescape=True,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        environment.filters["number"] = format_number
+        self.template = environment.get_template(os.path.basename(template_path))
+        self.base_url = os.path.dirname(template_path)
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(filename=stylesheet_path, font_config=self.font_config)
+        # Cache d'images de WeasyPrint (les graphiques d'une même version ne sont décodés qu'une fois)
+        self.image_cache = {}
+
+    def render_html(self, metrics, score, ai_summary, hist_data=None, dividends=None, statements=None):
+        return self.template.render(
+            data=metrics,
+            score=score,
+            ai_summary=ai_summary,
+            today=date.today().strftime("%d/%m/%Y"),
+            price_chart=price_chart(hist_data),
+            dividend_chart=dividend_chart(dividends),
+            statements=_statement_tables(statements),
+        )
+
+    def render_pdf(self, metrics, score, ai_summary, hist_data=None, dividends=None, statements=None):
+        from weasyprint import HTML
+
+        html = self.render_html(metrics, score, ai_summary, hist_data, dividends, statements)
+        return HTML(string=html, base_url=self.base_url).write_pdf(
+            stylesheets=[self.stylesheet],
+            font_config=self.font_config,
+            cache=self.image_cache,
+        )
+
+
+_engine = None
+_engine_unavailable = False
+_engine_lock = threading.Lock()
+
+
+def get_report_engine():
+    """Moteur partagé du processus, ou None si WeasyPrint est inutilisable sur cette machine."""
+    global _engine, _engine_unavailable
+    with _engine_lock:
+        if _engine is None and not _engine_unavailable:
+            try:
+                _engine = ReportEngine()
+            except (ImportError, OSError) as e:
+                _engine_unavailable = True
+                print(f"[Rapport PDF] WeasyPrint indisponible, repli sur le PDF simple : {e}")
+        return _engine
@@ -0,0 +1,58 @@
+# screener.py
+# Classement d'univers entiers de tickers (S&P 500, STOXX 600...) par score financier.
+
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis import SCORE_COLUMNS, TECHNICAL_COLUMNS, calculate_financial_scores
+from company_metrics import CompanyMetrics
+from data_fetching import get_stock_info
+
+# Colonnes du DataFrame de métriques (champs de CompanyMetrics)
+SCREENER_COLUMNS = SCORE_COLUMNS + ["name", "sector", "country", "marketCap"]
+
+
+def load_metrics(tickers, max_workers=16):
+    """Construit le DataFrame de métriques (une ligne par ticker) à partir de yfinance, en parallèle."""
+    def fetch(ticker):
+        try:
+            info = get_stock_info(ticker)
+        except Exception as e:
+            print(f"[Erreur screener] {ticker} : {e}")
+            info = {}
+        return CompanyMetrics.from_yfinance(ticker, info).to_dict(SCREENER_COLUMNS)
+
+    tickers = [t.upper() for t in tickers]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(fetch, tickers))
+    metrics = pd.DataFrame(rows, index=pd.Index(tickers, name="ticker"))
+    metrics[SCORE_COLUMNS] = metrics[SCORE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    return metrics
+
+
+def screen(metrics, min_score=None, filters=None, sort_by="score", ascending=False, limit=None, technical=False):
+    """
+    Calcule le score de chaque ligne puis filtre et trie l'univers (avec `technical=True`, les
+    indicateurs techniques de indicators.load_indicators entrent dans le score).
+    `filters` associe une colonne à un intervalle (min, max) — None pour une borne ouverte —
+    ou à une liste de valeurs autorisées.
+    """
+    result = metrics.assign(score=calculate_financial_scores(metrics, technical=technical))
+
+    mask = pd.Series(True, index=result.index)
+    if min_score is not None:
+        mask &= result["score"] >= min_score
+    for column, condition in (filters or {}).items():
+        if column not in result:
+            continue
+        if isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                mask &= result[column] >= low
+            if high is not None:
+                mask &= result[column] <= high
+        else:
+            mask &= result[column].isin(condition)
+
+    result = result[mask].sort_values(sort_by, ascending=ascending, na_position="last")
+    return result.head(limit) if limit else result
@@ -0,0 +1,288 @@
+# statements_store.py
+# Base locale des états financiers (compte de résultat, bilan, flux de trésorerie).
+#
+# Chaque poste de chaque exercice, annuel ou trimestriel, est conservé dans une seule table
+# au format long (ticker, fréquence, état, période, poste, valeur, source), indexée par ticker
+# et par poste. Un ticker n'est redemandé à yfinance que lorsqu'un nouvel exercice peut avoir
+# été publié (fin de la dernière période connue + durée de la période + délai de publication),
+# et au plus une fois par jour tant qu'il n'est pas paru. Un appel qui ne renvoie rien (erreur
+# passagère, limite de requêtes) est retenté après RETRY_INTERVAL seulement.
+# Seules les valeurs renseignées sont conservées : un poste vide sur toutes les périodes n'apparaît
+# pas dans StatementsStore.statement, contrairement au DataFrame de yfinance.
+# Les requêtes multi-sociétés (« free cash flow de ces 300 tickers sur 5 ans ») ne lisent que la base.
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from cache import CACHE_PATH
+from instrumentation import record_cache
+from ticker_snapshot import get_snapshot
+
+STATEMENTS_DB_PATH = os.path.join(os.path.dirname(CACHE_PATH), "statements.sqlite")
+STATEMENTS = ("income", "balance", "cashflow")
+FREQUENCIES = ("annual", "quarterly")
+# Ressources de ticker_snapshot correspondant à chaque état
+YFINANCE_RESOURCES = {
+    "annual": {"income": "financials", "balance": "balance_sheet", "cashflow": "cashflow"},
+    "quarterly": {"income": "quarterly_financials", "balance": "quarterly_balance_sheet", "cashflow": "quarterly_cashflow"},
+}
+ALPHA_VANTAGE_STATEMENTS = {"INCOME_STATEMENT": "income", "BALANCE_SHEET": "balance", "CASH_FLOW": "cashflow"}
+ALPHA_VANTAGE_REPORTS = {"annual": "annualReports", "quarterly": "quarterlyReports"}
+PERIOD_LENGTH = {"annual": pd.DateOffset(years=1), "quarterly": pd.DateOffset(months=3)}
+# Délai habituel entre la fin d'un exercice et la publication de ses comptes
+FILING_DELAY = {"annual": pd.Timedelta(days=75), "quarterly": pd.Timedelta(days=40)}
+# Intervalle minimal entre deux vérifications d'un ticker dont le nouvel exercice se fait attendre
+CHECK_INTERVAL = 86400
+# Délai avant de retenter un ticker dont le dernier téléchargement n'a renvoyé aucune ligne
+RETRY_INTERVAL = 900
+
+
+def _period_key(period):
+    return pd.Timestamp(period).strftime("%Y-%m-%d")
+
+
+def frame_rows(ticker, frequency, statement, frame, source="yfinance"):
+    """Lignes (format long) d'un état yfinance : postes en index, une colonne par période."""
+    rows = []
+    if frame is None or frame.empty:
+        return rows
+    for position, (item, values) in enumerate(frame.iterrows()):
+        for period, value in values.items():
+            if value is None or pd.isna(value):
+                continue
+            rows.append((ticker, frequency, statement, _period_key(period), str(item), float(value), source, position))
+    return rows
+
+
+def _alpha_vantage_value(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def alpha_vantage_rows(ticker, statement, payload):
+    """Lignes (format long) de toutes les périodes d'une réponse Alpha Vantage, annuelles et trimestrielles."""
+    rows = []
+    for frequency, key in ALPHA_VANTAGE_REPORTS.items():
+        for report in (payload or {}).get(key) or []:
+            period = report.get("fiscalDateEnding")
+            if not period:
+                continue
+            for position, (item, value) in enumerate(report.items()):
+                value = _alpha_vantage_value(value)
+                if value is not None:
+                    rows.append((ticker, frequency, statement, _period_key(period), item, value, "alpha_vantage", position))
+    return rows
+
+
+class StatementsStore:
+    """Base des états financiers au format long, interrogeable sans appel réseau."""
+
+    def __init__(self, path=STATEMENTS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS statement_items (
+                    ticker TEXT NOT NULL,
+                    frequency TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    source TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (ticker, frequency, statement, source, period, item)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_statement_items_item ON statement_items (item, frequency, period);
+                CREATE TABLE IF NOT EXISTS statement_checks (
+                    ticker TEXT NOT NULL,
+                    frequency TEXT NOT NULL,
+                    checked_at REAL NOT NULL,
+                    latest_period TEXT,
+                    PRIMARY KEY (ticker, frequency)
+                );
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_rows(self, rows):
+        """Enregistre des lignes au format long (une période republiée remplace l'ancienne). Renvoie leur nombre."""
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO statement_items "
+                "(ticker, frequency, statement, period, item, value, source, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def add_alpha_vantage(self, ticker, function, payload):
+        """Conserve toutes les périodes d'une réponse Alpha Vantage (BALANCE_SHEET, CASH_FLOW...)."""
+        statement = ALPHA_VANTAGE_STATEMENTS.get(function)
+        if statement is None:
+            return 0
+        return self.add_rows(alpha_vantage_rows(ticker.upper(), statement, payload))
+
+    # --- Rafraîchissement ---
+
+    def needs_refresh(self, ticker, frequency="annual", now=None):
+        """Vrai si un exercice plus récent que le dernier connu peut avoir été publié."""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT checked_at, latest_period FROM statement_checks WHERE ticker = ? AND frequency = ?",
+                (ticker.upper(), frequency),
+            ).fetchone()
+        if row is None:
+            return True
+        if now - row["checked_at"] < CHECK_INTERVAL:
+            return False
+        if row["latest_period"] is None:
+            return True
+        expected = pd.Timestamp(row["latest_period"]) + PERIOD_LENGTH[frequency] + FILING_DELAY[frequency]
+        return pd.Timestamp(now, unit="s") >= expected
+
+    def refresh(self, ticker, frequencies=("annual",), force=False):
+        """Télécharge les états du ticker pour chaque fréquence dont un nouvel exercice est attendu."""
+        ticker = ticker.upper()
+        refreshed = False
+        for frequency in frequencies:
+            if not force and not self.needs_refresh(ticker, frequency):
+                record_cache("statements", "hit")
+                continue
+            record_cache("statements", "miss")
+            snapshot = get_snapshot(ticker)
+            rows = []
+            for statement, resource in YFINANCE_RESOURCES[frequency].items():
+                rows += frame_rows(ticker, frequency, statement, snapshot.load(resource))
+            # Sans aucune ligne, la vérification est datée de sorte à être refaite après RETRY_INTERVAL
+            checked_at = time.time() if rows else time.time() - CHECK_INTERVAL + RETRY_INTERVAL
+            with self._lock:
+                self.add_rows(rows)
+                latest = max((row[3] for row in rows), default=None)
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT INTO statement_checks (ticker, frequency, checked_at, latest_period) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(ticker, frequency) DO UPDATE SET checked_at = excluded.checked_at, "
+                        "latest_period = COALESCE(MAX(latest_period, excluded.latest_period), latest_period, excluded.latest_period)",
+                        (ticker, frequency, checked_at, latest),
+                    )
+            refreshed = True
+        return refreshed
+
+    def refresh_many(self, tickers, frequencies=("annual",), max_workers=8):
+        """Met à jour plusieurs tickers en parallèle ; seuls ceux dont un exercice est attendu font un appel."""
+        def run(ticker):
+            try:
+                return self.refresh(ticker, frequencies)
+            except Exception as e:
+                print(f"[États financiers] {ticker} : {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(run, tickers))
+
+    # --- Lecture ---
+
+    def query(self, items=None, tickers=None, statements=None, frequency="annual", start=None, end=None, source="yfinance"):
+        """Lignes au format long (ticker, statement, period, item, value), filtrées ; aucun appel réseau."""
+        conditions, params = ["frequency = ?", "source = ?"], [frequency, source]
+        for column, values in (("item", items), ("ticker", tickers), ("statement", statements)):
+            if values:
+                values = [values] if isinstance(values, str) else list(values)
+                if column == "ticker":
+                    values = [v.upper() for v in values]
+                conditions.append(f"{column} IN ({','.join('?' * len(values))})")
+                params += values
+        if start is not None:
+            conditions.append("period >= ?")
+            params.append(_period_key(start))
+        if end is not None:
+            conditions.append("period <= ?")
+            params.append(_period_key(end))
+        sql = (
+            "SELECT ticker, statement, period, item, value FROM statement_items WHERE "
+            + " AND ".join(conditions) + " ORDER BY ticker, statement, position, period DESC"
+        )
+        with self._connect() as conn:
+            frame = pd.read_sql_query(sql, conn, params=params)
+        frame["period"] = pd.to_datetime(frame["period"])
+        return frame
+
+    def panel(self, item, tickers=None, frequency="annual", periods=5, source="yfinance"):
+        """
+        Un poste pour de nombreux tickers : une ligne par ticker, une colonne par exercice
+        (année de clôture, ou trimestre), limité aux `periods` derniers exercices de chaque ticker.
+        """
+        params = [item, frequency, source]
+        sql = (
+            "SELECT ticker, period, value FROM ("
+            " SELECT ticker, period, value, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY period DESC) AS rank"
+            " FROM statement_items WHERE item = ? AND frequency = ? AND source = ?"
+        )
+        if tickers:
+            tickers = [t.upper() for t in tickers]
+            sql += f" AND ticker IN ({','.join('?' * len(tickers))})"
+            params += tickers
+        sql += ") WHERE rank <= ?"
+        params.append(periods)
+        with self._connect() as conn:
+            frame = pd.read_sql_query(sql, conn, params=params)
+        periods_index = pd.to_datetime(frame["period"])
+        frame["period"] = periods_index.dt.year if frequency == "annual" else periods_index.dt.to_period("Q").astype(str)
+        table = frame.pivot_table(index="ticker", columns="period", values="value", aggfunc="last")
+        if tickers:
+            table = table.reindex(tickers)
+        return table
+
+    def statement(self, ticker, statement, frequency="annual", source="yfinance"):
+        """
+        État d'un ticker au format de yfinance : postes en index, périodes en colonnes (la plus récente d'abord).
+        Les postes sans aucune valeur renseignée ne sont pas stockés et n'y figurent donc pas.
+        """
+        with self._connect() as conn:
+            frame = pd.read_sql_query(
+                "SELECT item, period, value, position FROM statement_items "
+                "WHERE ticker = ? AND frequency = ? AND statement = ? AND source = ?",
+                conn, params=(ticker.upper(), frequency, statement, source),
+            )
+        if frame.empty:
+            return pd.DataFrame()
+        order = frame.groupby("item")["position"].min().sort_values().index
+        table = frame.pivot(index="item", columns="period", values="value").reindex(order)
+        table.columns = pd.to_datetime(table.columns)
+        table.index.name = None
+        table.columns.name = None
+        return table[sorted(table.columns, reverse=True)]
+
+    def statements(self, ticker, frequency="annual"):
+        """Compte de résultat, bilan et flux de trésorerie d'un ticker, mis à jour si un exercice est attendu."""
+        self.refresh(ticker, (frequency,))
+        return tuple(self.statement(ticker, statement, frequency) for statement in STATEMENTS)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_statements_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StatementsStore()
+        return _store
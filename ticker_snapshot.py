@@ -0,0 +1,99 @@
+# ticker_snapshot.py
+# Instantané partagé des données yfinance d'un ticker.
+# Chaque ressource (info, états financiers, actualités...) est téléchargée au plus
+# une fois, à la première demande, puis partagée par toutes les fonctions de
+# data_fetching.py pendant la durée de vie de l'instantané.
+
+import threading
+import time
+from collections import OrderedDict
+
+import yfinance as yf
+
+from instrumentation import track
+
+SNAPSHOT_TTL = 900
+MAX_SNAPSHOTS = 256
+
+# Ressource -> fonction de chargement à partir d'un yf.Ticker
+RESOURCES = {
+    "info": lambda stock: stock.info,
+    "last_day": lambda stock: stock.history(period="1d"),
+    "financials": lambda stock: stock.financials,
+    "balance_sheet": lambda stock: stock.balance_sheet,
+    "cashflow": lambda stock: stock.cashflow,
+    "quarterly_financials": lambda stock: stock.quarterly_financials,
+    "quarterly_balance_sheet": lambda stock: stock.quarterly_balance_sheet,
+    "quarterly_cashflow": lambda stock: stock.quarterly_cashflow,
+    "news": lambda stock: stock.news,
+}
+
+
+class TickerSnapshot:
+    """Accès paresseux aux ressources yfinance d'un ticker : chacune n'est chargée qu'une fois."""
+
+    def __init__(self, ticker):
+        self.ticker = ticker.upper()
+        self.stock = yf.Ticker(self.ticker)
+        self.created_at = time.time()
+        self._values = {}
+        self._locks = {name: threading.Lock() for name in RESOURCES}
+
+    def load(self, name):
+        # Deux threads qui demandent la même ressource attendent le même appel HTTP
+        if name not in self._values:
+            with self._locks[name]:
+                if name not in self._values:
+                    with track("external", f"yfinance.{name}"):
+                        self._values[name] = RESOURCES[name](self.stock)
+        return self._values[name]
+
+    def reload(self, name):
+        """Retélécharge une ressource (actualités sondées périodiquement...) et la partage comme `load`."""
+        with self._locks[name]:
+            # yf.Ticker garde certaines réponses (actualités) : un objet neuf force un nouvel appel
+            with track("external", f"yfinance.{name}"):
+                self._values[name] = RESOURCES[name](yf.Ticker(self.ticker))
+            return self._values[name]
+
+    @property
+    def info(self):
+        return self.load("info")
+
+    @property
+    def last_day(self):
+        return self.load("last_day")
+
+    @property
+    def financials(self):
+        return self.load("financials")
+
+    @property
+    def balance_sheet(self):
+        return self.load("balance_sheet")
+
+    @property
+    def cashflow(self):
+        return self.load("cashflow")
+
+    @property
+    def news(self):
+        return self.load("news")
+
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(ticker):
+    """Renvoie l'instantané courant du ticker, en le recréant s'il a expiré."""
+    ticker = ticker.upper()
+    with _snapshots_lock:
+        snapshot = _snapshots.get(ticker)
+        if snapshot is None or time.time() - snapshot.created_at > SNAPSHOT_TTL:
+            snapshot = TickerSnapshot(ticker)
+            _snapshots[ticker] = snapshot
+        _snapshots.move_to_end(ticker)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+        return snapshot
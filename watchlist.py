@@ -0,0 +1,160 @@
+# watchlist.py
+# Liste de suivi : cotations de quelques dizaines à quelques centaines de titres.
+#
+# Tous les titres sont chargés par un seul appel groupé à yf.download (au lieu d'un
+# yf.Ticker(...).history par titre) : un an d'historique à la création, puis seulement
+# les dernières séances à chaque rafraîchissement. Variation du jour et position dans le
+# range 52 semaines sont calculées en bloc sur la matrice dates x tickers.
+# Les listes sont partagées par le processus : plusieurs sessions ne multiplient pas les appels.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from instrumentation import track
+
+WATCHLIST_REFRESH_SECONDS = int(os.getenv("WATCHLIST_REFRESH_SECONDS", "60"))
+HISTORY_PERIOD = "1y"
+# Fenêtre redemandée à chaque rafraîchissement (couvre un week-end et un jour férié)
+REFRESH_PERIOD = "5d"
+PRICE_FIELDS = ("Close", "High", "Low")
+QUOTE_COLUMNS = ["price", "change", "changePct", "low52", "high52", "position52", "date"]
+MAX_WATCHLISTS = 16
+
+
+def download_prices(tickers, period=HISTORY_PERIOD, interval="1d"):
+    """Clôtures, plus hauts et plus bas (dates x tickers) de tous les titres en un seul appel yf.download."""
+    tickers = list(tickers)
+    with track("external", "yfinance.download"):
+        raw = yf.download(
+            tickers, period=period, interval=interval, group_by="column",
+            auto_adjust=False, progress=False, threads=True, multi_level_index=True,
+        )
+    if raw is None or raw.empty:
+        return {field: pd.DataFrame(columns=tickers, dtype="float64") for field in PRICE_FIELDS}
+
+    index = raw.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    prices = {}
+    for field in PRICE_FIELDS:
+        frame = raw[field].reindex(columns=tickers).astype("float64")
+        frame.index = index.normalize()
+        prices[field] = frame.groupby(level=0).last()
+    return prices
+
+
+def _last_valid_rows(mask):
+    """Par colonne : indice de la dernière ligne valide et de la précédente (-1 si aucune)."""
+    rows = np.arange(len(mask))[:, None]
+    last = np.where(mask, rows, -1).max(axis=0, initial=-1)
+    previous = np.where(mask & (rows < last), rows, -1).max(axis=0, initial=-1)
+    return last, previous
+
+
+def quote_table(prices):
+    """
+    Cotation de chaque titre : dernier cours, variation depuis la clôture précédente,
+    plus bas / plus haut sur 52 semaines et position du cours dans ce range (0 = plus bas, 1 = plus haut).
+    """
+    close = prices["Close"]
+    index = pd.Index(close.columns, name="ticker")
+    values = close.to_numpy(dtype="float64")
+    if not len(values):
+        return pd.DataFrame(np.nan, index=index, columns=QUOTE_COLUMNS)
+
+    last, previous = _last_valid_rows(~np.isnan(values))
+    columns = np.arange(values.shape[1])
+    price = np.where(last >= 0, values[np.maximum(last, 0), columns], np.nan)
+    previous_close = np.where(previous >= 0, values[np.maximum(previous, 0), columns], np.nan)
+
+    # Les plus hauts / plus bas intrajournaliers complètent les clôtures quand ils sont connus
+    high = np.fmax(prices["High"].reindex_like(close).to_numpy(dtype="float64"), values)
+    low = np.fmin(prices["Low"].reindex_like(close).to_numpy(dtype="float64"), values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        high = np.fmax(np.nanmax(np.where(np.isnan(high), -np.inf, high), axis=0), price)
+        low = np.fmin(np.nanmin(np.where(np.isnan(low), np.inf, low), axis=0), price)
+        high[np.isinf(high)] = np.nan
+        low[np.isinf(low)] = np.nan
+        change = price - previous_close
+        position = np.clip((price - low) / (high - low), 0.0, 1.0)
+        quotes = pd.DataFrame({
+            "price": price,
+            "change": change,
+            "changePct": change / previous_close,
+            "low52": low,
+            "high52": high,
+            "position52": position,
+            "date": close.index[np.maximum(last, 0)].where(last >= 0),
+        }, index=index)
+    return quotes
+
+
+class Watchlist:
+    """Cours d'un ensemble de tickers, complétés par un appel groupé à chaque rafraîchissement."""
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self._lock = threading.Lock()
+        self.prices = download_prices(self.tickers, HISTORY_PERIOD)
+        self.refreshed_at = time.time()
+        self.version = 0
+        self._quotes = None
+
+    def refresh(self, max_age=WATCHLIST_REFRESH_SECONDS, force=False):
+        """
+        Redemande les dernières séances de tous les titres (un seul appel) si les cours datent
+        de plus de `max_age` secondes, et remplace les lignes correspondantes. Renvoie True si mis à jour.
+        """
+        with self._lock:
+            # Marge d'une seconde : le minuteur du fragment Streamlit n'est pas exact
+            if not force and time.time() - self.refreshed_at < max_age - 1:
+                return False
+            self.refreshed_at = time.time()
+            recent = download_prices(self.tickers, REFRESH_PERIOD)
+            if recent["Close"].empty:
+                return False
+            start = recent["Close"].index[0]
+            for field in PRICE_FIELDS:
+                old = self.prices[field]
+                merged = pd.concat([old[old.index < start], recent[field]])
+                # On conserve 52 semaines glissantes
+                self.prices[field] = merged[merged.index > merged.index[-1] - pd.DateOffset(years=1)]
+            self.version += 1
+            self._quotes = None
+            return True
+
+    def quotes(self):
+        """Tableau des cotations (recalculé seulement après un rafraîchissement)."""
+        quotes = self._quotes
+        if quotes is None:
+            with self._lock:
+                quotes = self._quotes = quote_table(self.prices)
+        return quotes
+
+
+_watchlists = OrderedDict()
+_watchlists_lock = threading.Lock()
+
+
+def get_watchlist(tickers, max_age=WATCHLIST_REFRESH_SECONDS):
+    """Liste partagée pour cet ensemble de tickers, rafraîchie si ses cours datent de plus de `max_age` secondes."""
+    key = tuple(dict.fromkeys(t.upper() for t in tickers))
+    with _watchlists_lock:
+        watchlist = _watchlists.get(key)
+        if watchlist is not None:
+            _watchlists.move_to_end(key)
+    if watchlist is None:
+        watchlist = Watchlist(key)
+        with _watchlists_lock:
+            _watchlists[key] = watchlist
+            while len(_watchlists) > MAX_WATCHLISTS:
+                _watchlists.popitem(last=False)
+    else:
+        watchlist.refresh(max_age)
+    return watchlist
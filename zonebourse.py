@@ -0,0 +1,261 @@
+# zonebourse.py
+# Récupération du consensus des analystes sur Zone Bourse.
+#
+# - une session HTTP partagée (connexions réutilisées) ;
+# - des requêtes conditionnelles (ETag / If-Modified-Since) : une page inchangée
+#   n'est pas retéléchargée ;
+# - la page est lue en flux et la lecture s'arrête dès que l'élément du consensus
+#   est trouvé, sans construire l'arbre HTML complet ;
+# - un index ticker -> URL persistant, complété automatiquement via la recherche
+#   du site pour les tickers inconnus (seule une ligne de résultats portant le ticker
+#   ou l'ISIN est retenue) et revérifié périodiquement ;
+# - un scraping par lot à concurrence bornée pour les listes de suivi.
+
+import codecs
+import html
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import CACHE_PATH, get_default_backend, make_key
+from instrumentation import instrumented, record_bytes, track_session
+
+BASE_URL = "https://www.zonebourse.com"
+QUOTE_URL = BASE_URL + "/cours/action/{url_name}/"
+SEARCH_URL = BASE_URL + "/recherche/instruments/"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+REQUEST_TIMEOUT = 10
+# Un ticker introuvable n'est pas recherché de nouveau avant ce délai
+NEGATIVE_LOOKUP_TTL = 7 * 86400
+# Une correspondance trouvée par la recherche est revérifiée après ce délai
+POSITIVE_LOOKUP_TTL = 90 * 86400
+# Longueur maximale de l'élément du consensus : la recherche reprend au plus ce nombre d'octets en arrière
+RATING_OVERLAP = 4096
+
+INDEX_PATH = os.path.join(os.path.dirname(CACHE_PATH), "zonebourse_index.json")
+
+# Correspondances connues, utilisées pour initialiser l'index
+TICKER_TO_ZB_URL_NAME = {
+    "AAPL": "APPLE-INC-4849", "MSFT": "MICROSOFT-CORPORATION-4835",
+    "GOOGL": "ALPHABET-INC-62394", "META": "META-PLATFORMS-INC-10547341",
+    "LVMH": "LVMH-MOET-HENNESSY-LOUIS-4669",
+    "TTE": "TOTALENERGIES-SE-4716"
+}
+
+_RATING_RE = re.compile(
+    rb'<div[^>]*class="[^"]*c-face-instrument__rating-text[^"]*"[^>]*>(.*?)</div>', re.S
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+_HEADER_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+_QUOTE_LINK_RE = re.compile(r'href="/cours/action/([A-Za-z0-9-]+)/"')
+_RESULTS_TABLE_RE = re.compile(r"<table\b.*?</table>", re.S | re.I)
+_ROW_RE = re.compile(r"<tr\b.*?</tr>", re.S | re.I)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Session HTTP unique du processus, avec un pool de connexions keep-alive."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = track_session(requests.Session(), "zonebourse")
+            _session.headers.update(HEADERS)
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=1))
+        return _session
+
+
+class TickerIndex:
+    """Index ticker -> nom d'URL Zone Bourse, persisté dans un fichier JSON."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        now = time.time()
+        self._entries = {ticker: {"url_name": name, "checked_at": now} for ticker, name in TICKER_TO_ZB_URL_NAME.items()}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._entries.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[Zone Bourse] Index illisible, reconstruit : {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def resolve(self, ticker, isin=None):
+        """Renvoie le nom d'URL du ticker, en le cherchant sur le site s'il est inconnu ou à revérifier."""
+        ticker = ticker.upper()
+        with self._lock:
+            entry = self._entries.get(ticker)
+        if entry is not None:
+            ttl = POSITIVE_LOOKUP_TTL if entry.get("url_name") else NEGATIVE_LOOKUP_TTL
+            if time.time() - entry.get("checked_at", 0) < ttl:
+                return entry.get("url_name")
+        return self._lookup(ticker, isin)
+
+    def revalidate(self, ticker, isin=None):
+        """
+        Relance la recherche d'un ticker dont la page ne montre pas de consensus, si sa correspondance
+        n'a pas été vérifiée depuis NEGATIVE_LOOKUP_TTL. Renvoie le nouveau nom d'URL s'il a changé, sinon None.
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            entry = self._entries.get(ticker) or {}
+        if time.time() - entry.get("checked_at", 0) < NEGATIVE_LOOKUP_TTL:
+            return None
+        url_name = self._lookup(ticker, isin)
+        return url_name if url_name and url_name != entry.get("url_name") else None
+
+    def _lookup(self, ticker, isin=None):
+        url_name = search_url_name(ticker, isin)
+        with self._lock:
+            self._entries[ticker] = {"url_name": url_name, "checked_at": time.time()}
+            self._save()
+        return url_name
+
+
+def match_search_result(page, ticker, isin=None):
+    """
+    Nom d'URL du premier résultat action du tableau de résultats dont la ligne porte le ticker
+    (sans suffixe de place : « MC.PA » -> « MC ») ou l'ISIN. Les liens hors du tableau
+    (menus, titres à la une) sont ignorés.
+    """
+    symbols = {ticker.upper(), ticker.upper().split(".")[0]}
+    if isin:
+        symbols.add(isin.upper())
+    for table in _RESULTS_TABLE_RE.findall(page):
+        for row in _ROW_RE.findall(table):
+            link = _QUOTE_LINK_RE.search(row)
+            if not link:
+                continue
+            words = set(re.findall(r"[A-Z0-9.]+", html.unescape(_TAG_RE.sub(" ", row)).upper()))
+            if words & symbols:
+                return link.group(1)
+    return None
+
+
+@instrumented("external", "zonebourse.search")
+def search_url_name(ticker, isin=None):
+    """Cherche le ticker sur Zone Bourse et renvoie le nom d'URL du résultat action correspondant."""
+    try:
+        r = get_session().get(SEARCH_URL, params={"q": isin or ticker}, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+    except requests.RequestException as e:
+        print(f"[Zone Bourse] Recherche impossible pour {ticker} : {e}")
+        return None
+    return match_search_result(r.text, ticker, isin)
+
+
+def _page_encoding(response, head):
+    """
+    Encodage de la page : charset de l'en-tête Content-Type s'il est explicite, sinon celui de la
+    balise <meta>, sinon UTF-8. (Sans charset, requests suppose ISO-8859-1 pour du text/html,
+    ce qui abîme les consensus accentués comme « Alléger ».)
+    """
+    match = _HEADER_CHARSET_RE.search(response.headers.get("Content-Type") or "")
+    encoding = match.group(1) if match else None
+    if encoding is None:
+        match = _META_CHARSET_RE.search(head)
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return "utf-8"
+
+
+def _read_rating(response, chunk_size=16384):
+    """Lit la page en flux et s'arrête dès que l'élément du consensus est complet."""
+    buffer = bytearray()
+    start = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            buffer += chunk
+            # Seule la fin du tampon peut contenir un élément nouvellement complété
+            match = _RATING_RE.search(buffer, start)
+            if match:
+                text = _TAG_RE.sub("", match.group(1).decode(_page_encoding(response, bytes(buffer[:4096])), "replace"))
+                return html.unescape(text).strip() or None
+            start = max(start, len(buffer) - RATING_OVERLAP)
+        return None
+    finally:
+        # Octets réellement lus : la lecture s'arrête souvent bien avant la fin de la page
+        record_bytes("external", "zonebourse", len(buffer))
+
+
+@instrumented("external", "zonebourse")
+def fetch_consensus(url_name):
+    """Télécharge (ou revalide) la page d'une action et renvoie le texte du consensus."""
+    url = QUOTE_URL.format(url_name=url_name)
+    store = get_default_backend()
+    key = make_key("zonebourse", (url,), {})
+    cached = store.get(key)
+    validators = cached[0] if cached is not None else {}
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    with get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        if response.status_code == 304 and "consensus" in validators:
+            return validators["consensus"]
+        response.raise_for_status()
+        consensus = _read_rating(response) or "Non trouvé"
+        store.set(key, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "consensus": consensus,
+        }, "zonebourse")
+    return consensus
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TickerIndex()
+        return _index
+
+
+def get_consensus(ticker):
+    """Consensus Zone Bourse d'un ticker : 'N/A' si inconnu du site, 'Erreur' en cas d'échec."""
+    index = get_index()
+    url_name = index.resolve(ticker)
+    if not url_name:
+        return "N/A"
+    try:
+        consensus = fetch_consensus(url_name)
+        if consensus == "Non trouvé":
+            # La correspondance a pu devenir obsolète (changement de nom, radiation) : on la revérifie
+            url_name = index.revalidate(ticker)
+            if url_name:
+                consensus = fetch_consensus(url_name)
+        return consensus
+    except Exception as e:
+        print(f"[Zone Bourse] {ticker} : {e}")
+        return "Erreur"
+
+
+def get_consensus_batch(tickers, max_workers=8):
+    """Consensus de plusieurs tickers, avec au plus `max_workers` requêtes simultanées."""
+    tickers = [t.upper() for t in tickers]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(tickers, executor.map(get_consensus, tickers)))